@@ -1,7 +1,12 @@
 from flask import Flask, request
 from flask_cors import CORS
 from routes.memo import memo_bp
-from database import init_db, shutdown_session
+from database import init_db, shutdown_session, get_pool_stats, router
+from cert_store import cert_store
+from token_cache import token_cache
+from response_compression import ResponseCompressor
+from request_decompression import RequestDecompressor
+from json_provider import FastJSONProvider
 import os
 
 def create_app():
@@ -13,6 +18,9 @@ def create_app():
     app = Flask(__name__)
     app.url_map.strict_slashes = False
 
+    # jsonifyとrequest.get_jsonをorjsonで処理する（インストールされていない場合は標準のjson）
+    app.json = FastJSONProvider(app)
+
     # デバッグモードを環境変数から設定
     app.debug = os.getenv('DEBUG', 'false').lower() == 'true'
 
@@ -26,7 +34,7 @@ def create_app():
              "origins": allowed_origins_list,
              "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
              "allow_headers": ["Content-Type", "Authorization", "X-Requested-With", "*"],
-             "expose_headers": ["Content-Type"],
+             "expose_headers": ["Content-Type", "X-Next-Cursor", "ETag"],
              "max_age": 600,
              "supports_credentials": True
          }})
@@ -39,7 +47,7 @@ def create_app():
             headers = {
                 'Access-Control-Allow-Origin': request.headers.get('Origin', '*'),
                 'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Requested-With',
+                'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Requested-With, Content-Encoding',
                 'Access-Control-Max-Age': '600',
                 'Access-Control-Allow-Credentials': 'true'
             }
@@ -49,7 +57,7 @@ def create_app():
         origin = request.headers.get('Origin')
         if origin and origin in allowed_origins_list:
             response.headers.add('Access-Control-Allow-Origin', origin)
-            response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,X-Requested-With')
+            response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,X-Requested-With,Content-Encoding')
             response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
             response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
@@ -62,6 +70,13 @@ def create_app():
     # データベースの初期化
     init_db()
 
+    # 書き込んだユーザーの読み取りを一定時間プライマリに固定する
+    router.init_app(app)
+
+    # トークン検証用の署名証明書を事前取得し、バックグラウンド更新を開始
+    if cert_store is not None:
+        cert_store.start()
+
     # セッション管理の設定
     app.teardown_appcontext(shutdown_session)
 
@@ -72,6 +87,35 @@ def create_app():
     def health_check():
         return {'status': 'ok'}, 200
 
+    # コネクションプールの利用状況（ワーカー数とプールサイズの調整用）
+    @app.route('/health/db')
+    def db_pool_health():
+        return {'status': 'ok', 'pool': get_pool_stats()}, 200
+
+    # トークン検証のキャッシュと署名証明書の状態（キャッシュサイズとTTLの調整用）
+    @app.route('/health/auth')
+    def auth_health():
+        return {
+            'status': 'ok',
+            'token_cache': token_cache.stats(),
+            'cert_store': cert_store.stats() if cert_store is not None else None
+        }, 200
+
+    # 圧縮されたリクエストボディ（Content-Encoding: gzip/zstd）の展開
+    RequestDecompressor(app)
+
+    # レスポンスの圧縮（Accept-Encodingに応じてbrotli/gzip）
+    compressor = ResponseCompressor(app)
+
+    # エンドポイントごとのレスポンスの圧縮率
+    @app.route('/health/compression')
+    def compression_health():
+        return {
+            'status': 'ok',
+            'encodings': compressor.available_encodings(),
+            'endpoints': compressor.stats()
+        }, 200
+
     @app.errorhandler(500)
     def handle_500_error(error):
         return {'error': 'Internal Server Error'}, 500
@@ -5,6 +5,8 @@ import firebase_admin
 from firebase_admin import credentials, auth
 import os
 import json
+from token_cache import token_cache
+from cert_store import cert_store
 
 logger = logging.getLogger(__name__)
 
@@ -71,8 +73,8 @@ def require_auth(f):
             return jsonify({'error': '認証が必要です', 'code': 'auth/missing-token'}), 401
         
         try:
-            # トークンを検証
-            decoded_token = verify_firebase_token(token)
+            # トークンを検証（検証済みの場合はキャッシュから取得）
+            decoded_token = verify_token_cached(token)
             
             # トークンがリクエストに使用できるようにする
             request.firebase_token = decoded_token
@@ -101,12 +103,39 @@ def verify_firebase_token(id_token):
         ValueError: トークンが無効な場合
     """
     try:
+        if cert_store is not None:
+            # 事前取得済みの署名証明書で検証する
+            return cert_store.verify_id_token(id_token, firebase_admin.get_app().project_id)
         decoded_token = auth.verify_id_token(id_token)
         return decoded_token
     except Exception as e:
         logger.error(f"トークン検証エラー: {str(e)}")
         raise ValueError(f"トークンの検証に失敗しました: {str(e)}")
 
+def verify_token_cached(token):
+    """
+    キャッシュを利用してトークンを検証する関数
+
+    検証済みのトークンはtoken_cacheから返し、キャッシュにない場合のみ
+    Firebaseで検証して結果をキャッシュに保存します。
+
+    Args:
+        token (str): Firebaseの認証トークン
+
+    Returns:
+        dict: デコードされたトークンの情報
+
+    Raises:
+        ValueError: トークンが無効な場合
+    """
+    decoded_token = token_cache.get(token)
+    if decoded_token is not None:
+        return decoded_token
+
+    decoded_token = verify_firebase_token(token)
+    token_cache.put(token, decoded_token)
+    return decoded_token
+
 def check_resource_ownership(user_id):
     """
     リソースの所有権をチェックする関数
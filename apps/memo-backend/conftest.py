@@ -0,0 +1,65 @@
+"""
+テスト共通の設定
+
+テスト対象のモジュールはインポート時にデータベースへの接続とFirebase Admin SDKの
+初期化を行うため、テストモジュールの読み込み前（このファイルの読み込み時）に、
+環境変数に関係なく一時ディレクトリのSQLiteとテスト用のサービスアカウントを使うように設定します。
+開発・本番のMEMO_DATABASE_URLやリードレプリカにテストが書き込むことはありません。
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+def _test_service_account():
+    # Firebase Admin SDKの初期化にだけ使うサービスアカウント（トークンの検証はモックにする）
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_key = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    ).decode('utf-8')
+    return json.dumps({
+        'type': 'service_account',
+        'project_id': 'test-project',
+        'private_key_id': 'test-key',
+        'private_key': private_key,
+        'client_email': 'test@test-project.iam.gserviceaccount.com',
+        'client_id': '0',
+        'token_uri': 'https://oauth2.googleapis.com/token',
+    })
+
+TEST_DB_DIR = tempfile.mkdtemp()
+os.environ['MEMO_DATABASE_URL'] = f"sqlite:///{os.path.join(TEST_DB_DIR, 'test_memo.db')}"
+os.environ['MEMO_DATABASE_READ_URLS'] = ''
+os.environ['FIREBASE_SERVICE_ACCOUNT_KEY'] = _test_service_account()
+os.environ['CERT_STORE_ENABLED'] = 'false'
+
+# firebase_userでテストクラスにuidがない場合のユーザーID
+DEFAULT_TEST_UID = 'test-user'
+
+def pytest_unconfigure(config):
+    shutil.rmtree(TEST_DB_DIR, ignore_errors=True)
+
+@pytest.fixture
+def firebase_user(request):
+    """
+    Firebaseのトークン検証をモックに置き換えるフィクスチャ
+
+    テストクラスのuid属性のユーザーとして認証します。テストの途中でself.uidを
+    変更すると、以降のリクエストは別のユーザーとして扱われます。
+
+    Returns:
+        Mock: verify_token_cachedのモック
+    """
+    def verify(token):
+        return {'uid': getattr(request.instance, 'uid', DEFAULT_TEST_UID)}
+
+    with mock.patch('auth_middleware.verify_token_cached', side_effect=verify) as verify_mock:
+        yield verify_mock
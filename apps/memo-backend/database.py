@@ -1,13 +1,31 @@
-from sqlalchemy import create_engine
 from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from db_engine import create_db_engine, pool_stats, uses_sqlite_profile
+from db_routing import ReadWriteRouter, RoutingSession
 import os
 
+# データベースURLの設定（デフォルトはSQLite）
 database_file = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'memo.db')
-engine = create_engine(f'sqlite:///{database_file}', connect_args={
-    'check_same_thread': False,
-    'timeout': 30
-})
+DATABASE_URL = os.getenv('MEMO_DATABASE_URL', f'sqlite:///{database_file}')
+
+# エンジンの作成（プール設定はDB_*環境変数から読み込む）
+engine = create_db_engine(DATABASE_URL)
+
+# 読み取り用エンジンの作成
+# MEMO_DATABASE_READ_URLS（カンマ区切り）にレプリカを指定すると読み取りを振り分ける。
+# 指定がなくSQLiteの性能プロファイル（DB_SQLITE_PROFILE=true）の場合はWALを使い、
+# GETのハンドラーが書き込みの完了を待たないよう別のエンジンで読み取る
+DATABASE_READ_URLS = [url.strip() for url in os.getenv('MEMO_DATABASE_READ_URLS', '').split(',') if url.strip()]
+read_engines = [create_db_engine(url, read_only=True) for url in DATABASE_READ_URLS]
+if not read_engines and uses_sqlite_profile(DATABASE_URL):
+    read_engines = [create_db_engine(DATABASE_URL, read_only=True)]
+
+# 書き込み後に読み取りをプライマリに固定する秒数（レプリカの遅延を吸収する）
+router = ReadWriteRouter(
+    engine,
+    read_engines,
+    sticky_seconds=float(os.getenv('DB_READ_STICKY_SECONDS', '5'))
+)
 
 db_session = scoped_session(
     sessionmaker(
@@ -17,11 +35,35 @@ db_session = scoped_session(
     )
 )
 
+# 読み取り用のセッション
+# GETリクエストでは読み取り用エンジンを使い、
+# それ以外はプライマリを使う
+read_session = scoped_session(
+    sessionmaker(
+        class_=RoutingSession,
+        autocommit=False,
+        autoflush=False,
+        info={'router': router}
+    )
+)
+
 Base = declarative_base()
 Base.query = db_session.query_property()
 
 def init_db():
     Base.metadata.create_all(bind=engine)
 
+def get_pool_stats():
+    """
+    コネクションプールの利用状況を取得する関数
+    """
+    stats = pool_stats(engine)
+    if read_engines:
+        stats['read'] = [pool_stats(read_engine) for read_engine in read_engines]
+        stats['routing'] = router.stats()
+    return stats
+
 def shutdown_session(exception=None):
     db_session.remove()
+    read_session.remove()
+
@@ -0,0 +1,219 @@
+"""
+データベースエンジンの作成とコネクションプールの監視
+
+プールサイズ、オーバーフロー、接続の再作成間隔、接続前のping、
+ステートメントのタイムアウトを環境変数から設定したエンジンを作成します。
+プールの利用状況（使用中の接続数、待ち時間、タイムアウト回数）は
+pool_stats()で取得できます。
+
+SQLiteでは性能プロファイル（WAL、synchronous=NORMALなど）を
+接続ごとに適用でき、読み取り専用のエンジンを別に作成できます。
+外部キーのON DELETE CASCADEを使用するため、SQLiteの接続では常に外部キー制約を有効にします。
+"""
+import os
+import threading
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+def _env_bool(name, default):
+    return os.getenv(name, default).lower() == 'true'
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    @docs
+    接続の取得待ち時間とタイムアウト回数を記録するQueuePool
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def recreate(self):
+        # dispose()時などに作り直されても統計は引き継ぐ
+        new_pool = super().recreate()
+        new_pool.checkouts = self.checkouts
+        new_pool.timeouts = self.timeouts
+        new_pool.total_wait = self.total_wait
+        new_pool.max_wait = self.max_wait
+        return new_pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self.checkouts += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+
+def load_engine_config(prefix='DB_'):
+    """
+    環境変数からエンジンの設定を読み込む関数
+
+    DB_POOL_SIZE: 常時保持する接続数（デフォルト: 5）
+    DB_MAX_OVERFLOW: プールサイズを超えて作成できる接続数（デフォルト: 10）
+    DB_POOL_TIMEOUT: 接続の取得を待つ秒数（デフォルト: 30）
+    DB_POOL_RECYCLE: 接続を作り直すまでの秒数（デフォルト: 1800）
+    DB_POOL_PRE_PING: 'true'で使用前に接続を確認する（デフォルト: true）
+    DB_STATEMENT_TIMEOUT_MS: PostgreSQLのステートメントタイムアウト（ミリ秒、0で無効）
+    DB_SQLITE_TIMEOUT: SQLiteのロック待ち秒数（デフォルト: 30）
+    DB_SQLITE_PROFILE: 'true'でSQLiteの性能プロファイルを有効にする（デフォルト: false）
+    DB_SQLITE_MMAP_SIZE: mmap_sizeのバイト数（デフォルト: 256MB）
+    DB_SQLITE_CACHE_SIZE: cache_size（負の値はKiB単位、デフォルト: -65536 = 64MB）
+    DB_SQLITE_BUSY_TIMEOUT_MS: busy_timeoutのミリ秒数（デフォルト: 5000）
+
+    Args:
+        prefix (str): 環境変数名のプレフィックス
+
+    Returns:
+        dict: エンジンの設定
+    """
+    return {
+        'pool_size': int(os.getenv(f'{prefix}POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv(f'{prefix}MAX_OVERFLOW', '10')),
+        'pool_timeout': float(os.getenv(f'{prefix}POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv(f'{prefix}POOL_RECYCLE', '1800')),
+        'pool_pre_ping': _env_bool(f'{prefix}POOL_PRE_PING', 'true'),
+        'statement_timeout_ms': int(os.getenv(f'{prefix}STATEMENT_TIMEOUT_MS', '0')),
+        'sqlite_timeout': float(os.getenv(f'{prefix}SQLITE_TIMEOUT', '30')),
+        'sqlite_profile': _env_bool(f'{prefix}SQLITE_PROFILE', 'false'),
+        'sqlite_mmap_size': int(os.getenv(f'{prefix}SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+        'sqlite_cache_size': int(os.getenv(f'{prefix}SQLITE_CACHE_SIZE', '-65536')),
+        'sqlite_busy_timeout_ms': int(os.getenv(f'{prefix}SQLITE_BUSY_TIMEOUT_MS', '5000')),
+    }
+
+def normalize_database_url(url):
+    """
+    データベースURLをSQLAlchemyが扱える形式に変換する関数
+
+    Renderなどが発行する'postgres://'形式を'postgresql://'に置き換えます。
+    """
+    if url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def uses_sqlite_profile(url, config=None):
+    """
+    SQLiteの性能プロファイルを適用するかどうかを判定する関数
+
+    インメモリのデータベースは接続ごとに別のデータベースになるため対象外です。
+
+    Args:
+        url (str): データベースURL
+        config (dict): load_engine_config()の形式の設定
+
+    Returns:
+        bool: 適用する場合はTrue
+    """
+    config = config or load_engine_config()
+    if not url.startswith('sqlite') or not config['sqlite_profile']:
+        return False
+    return url not in ('sqlite://', 'sqlite:///:memory:')
+
+def _sqlite_profile_listener(config, read_only):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"PRAGMA busy_timeout = {config['sqlite_busy_timeout_ms']}")
+            if not read_only:
+                # WALはデータベースファイルに保存されるため書き込み側でのみ設定する
+                cursor.execute('PRAGMA journal_mode = WAL')
+                cursor.execute('PRAGMA synchronous = NORMAL')
+            cursor.execute(f"PRAGMA mmap_size = {config['sqlite_mmap_size']}")
+            cursor.execute(f"PRAGMA cache_size = {config['sqlite_cache_size']}")
+            if read_only:
+                cursor.execute('PRAGMA query_only = ON')
+        finally:
+            cursor.close()
+    return on_connect
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLiteの外部キー制約（ON DELETE CASCADEを含む）は接続ごとに有効にする必要がある
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute('PRAGMA foreign_keys = ON')
+    finally:
+        cursor.close()
+
+def create_db_engine(url, config=None, read_only=False, **engine_kwargs):
+    """
+    コネクションプールを設定したエンジンを作成する関数
+
+    Args:
+        url (str): データベースURL
+        config (dict): load_engine_config()の形式の設定（省略時は環境変数から読み込む）
+        read_only (bool): Trueの場合、SQLiteの性能プロファイルでquery_onlyの接続にする
+        **engine_kwargs: create_engineにそのまま渡す追加の引数
+
+    Returns:
+        Engine: 作成したエンジン
+    """
+    url = normalize_database_url(url)
+    config = config or load_engine_config()
+    connect_args = dict(engine_kwargs.pop('connect_args', {}))
+
+    if url.startswith('sqlite'):
+        connect_args.setdefault('check_same_thread', False)
+        connect_args.setdefault('timeout', config['sqlite_timeout'])
+    elif url.startswith('postgresql') and config['statement_timeout_ms'] > 0:
+        options = connect_args.get('options', '')
+        connect_args['options'] = f"{options} -c statement_timeout={config['statement_timeout_ms']}".strip()
+
+    engine = create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=config['pool_size'],
+        max_overflow=config['max_overflow'],
+        pool_timeout=config['pool_timeout'],
+        pool_recycle=config['pool_recycle'],
+        pool_pre_ping=config['pool_pre_ping'],
+        connect_args=connect_args,
+        **engine_kwargs
+    )
+
+    if url.startswith('sqlite'):
+        event.listen(engine, 'connect', _enable_sqlite_foreign_keys)
+    if uses_sqlite_profile(url, config):
+        event.listen(engine, 'connect', _sqlite_profile_listener(config, read_only))
+
+    return engine
+
+def pool_stats(engine):
+    """
+    コネクションプールの利用状況を取得する関数
+
+    Args:
+        engine (Engine): 対象のエンジン
+
+    Returns:
+        dict: プールの利用状況
+    """
+    pool = engine.pool
+    stats = {
+        'pool_size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'checked_in': pool.checkedin(),
+        'overflow': pool.overflow(),
+    }
+    if isinstance(pool, InstrumentedQueuePool):
+        with pool._stats_lock:
+            stats.update({
+                'checkouts': pool.checkouts,
+                'timeouts': pool.timeouts,
+                'total_wait_seconds': round(pool.total_wait, 6),
+                'max_wait_seconds': round(pool.max_wait, 6),
+                'avg_wait_seconds': round(pool.total_wait / pool.checkouts, 6) if pool.checkouts else 0.0,
+            })
+    return stats
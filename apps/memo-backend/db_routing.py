@@ -0,0 +1,168 @@
+"""
+読み取り/書き込みのエンジン振り分け
+
+プライマリのエンジンと1つ以上の読み取り用エンジン（レプリカ）を持ち、
+HTTPメソッドでリクエストごとに使うエンジンを決めます（GET・HEAD・OPTIONSは読み取り用）。
+書き込みを行ったユーザーの読み取りは、一定時間プライマリに固定します
+（read-your-writes）。
+
+この記録はワーカープロセスごとのメモリに保持するため、複数のワーカーで動かす場合は
+書き込みと別のワーカーが受けた読み取りには効きません。ワーカー間で固定するには
+同じユーザーのリクエストを同じワーカーに振り分けるか、ワーカーを1つにしてください。
+"""
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from flask import g, has_request_context, request
+from sqlalchemy.orm import Session as BaseSession
+
+# 読み取りとして扱うHTTPメソッド
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+class ReadWriteRouter:
+    """
+    @docs
+    プライマリと読み取り用エンジンの振り分けを管理するクラス
+
+    Attributes:
+        primary (Engine): 書き込み用のエンジン
+        replicas (list): 読み取り用のエンジン（空の場合は常にプライマリ）
+        sticky_seconds (float): 書き込み後に読み取りをプライマリに固定する秒数
+    """
+
+    def __init__(self, primary, replicas=None, sticky_seconds=5.0, max_tracked_users=10000,
+                 clock=time.monotonic):
+        self.primary = primary
+        self.replicas = list(replicas or [])
+        self.sticky_seconds = sticky_seconds
+        self.max_tracked_users = max_tracked_users
+        self._clock = clock
+        self._cycle = itertools.cycle(self.replicas) if self.replicas else None
+        self._last_writes = OrderedDict()
+        self._lock = threading.Lock()
+        self.primary_reads = 0
+        self.replica_reads = 0
+
+    def mark_write(self, user_id):
+        """
+        ユーザーが書き込みを行ったことを記録する
+
+        Args:
+            user_id (str): 書き込みを行ったユーザーID
+        """
+        if not user_id or not self.replicas or self.sticky_seconds <= 0:
+            return
+        with self._lock:
+            self._last_writes[user_id] = self._clock()
+            self._last_writes.move_to_end(user_id)
+            while len(self._last_writes) > self.max_tracked_users:
+                self._last_writes.popitem(last=False)
+
+    def is_sticky(self, user_id):
+        """
+        ユーザーの読み取りをプライマリに固定する期間中かどうかを判定する
+
+        Args:
+            user_id (str): ユーザーID
+
+        Returns:
+            bool: 固定期間中の場合はTrue
+        """
+        if not user_id:
+            return False
+        with self._lock:
+            last_write = self._last_writes.get(user_id)
+        return last_write is not None and self._clock() - last_write < self.sticky_seconds
+
+    def choose_read_engine(self, user_id=None):
+        """
+        読み取りに使うエンジンを選ぶ
+
+        Args:
+            user_id (str): リクエストしたユーザーID
+
+        Returns:
+            Engine: 読み取りに使うエンジン
+        """
+        if not self.replicas or self.is_sticky(user_id):
+            with self._lock:
+                self.primary_reads += 1
+            return self.primary
+        with self._lock:
+            self.replica_reads += 1
+            return next(self._cycle)
+
+    def init_app(self, app):
+        """
+        書き込みリクエストの完了時にユーザーを記録するフックを登録する
+
+        Args:
+            app (Flask): 対象のアプリケーション
+        """
+        @app.after_request
+        def record_write(response):
+            if request.method not in READ_METHODS and response.status_code < 400:
+                self.mark_write(_current_user_id())
+            return response
+
+    def stats(self):
+        """
+        振り分けの統計情報を取得する
+
+        Returns:
+            dict: レプリカ数と読み取りの振り分け回数
+        """
+        with self._lock:
+            return {
+                'replicas': len(self.replicas),
+                'primary_reads': self.primary_reads,
+                'replica_reads': self.replica_reads,
+                'sticky_users': len(self._last_writes)
+            }
+
+def _current_user_id():
+    token = getattr(request, 'firebase_token', None) or {}
+    return token.get('uid')
+
+def is_read_request():
+    """
+    現在のリクエストを読み取りとして扱うかどうかを判定する関数
+
+    Returns:
+        bool: 読み取りとして扱う場合はTrue
+    """
+    if not has_request_context():
+        return False
+    return request.method in READ_METHODS
+
+def engine_for_request(router):
+    """
+    現在のリクエストで読み取りに使うエンジンを返す関数
+
+    同じリクエスト内では同じエンジンを使い続けます。
+
+    Args:
+        router (ReadWriteRouter): 振り分けを管理するルーター
+
+    Returns:
+        Engine: 使用するエンジン
+    """
+    if not is_read_request():
+        return router.primary
+    engine = g.get('db_read_engine')
+    if engine is None:
+        engine = router.choose_read_engine(_current_user_id())
+        g.db_read_engine = engine
+    return engine
+
+class RoutingSession(BaseSession):
+    """
+    @docs
+    リクエストに応じてプライマリと読み取り用エンジンを選ぶセッション
+
+    sessionmakerの`info={'router': router}`でルーターを渡します。
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        return engine_for_request(self.info['router'])
@@ -0,0 +1,129 @@
+"""
+高速なJSONプロバイダー
+
+FlaskのJSONプロバイダー（jsonify、request.get_json、json_streamが使用）を
+orjsonで置き換えます。orjsonがインストールされていない場合は標準のjsonモジュールを使い、
+どちらの場合も同じ形式で出力します。
+
+- datetimeはISO 8601形式。タイムゾーンのない値はUTCとして+00:00を付ける
+  （モデルの日時はdatetime.utcnowで保存しているため）
+- dateはISO 8601形式、DecimalとUUIDは文字列
+- 非ASCII文字はエスケープせずUTF-8のまま出力する
+"""
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date, datetime, timezone
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def json_default(o):
+    """
+    標準のJSONエンコーダーが扱えない値を変換する関数
+
+    orjsonの場合もdatetime以外の未対応の型の変換に使用します。
+
+    Args:
+        o: 変換する値
+
+    Returns:
+        JSONで表現できる値
+    """
+    if isinstance(o, datetime):
+        if o.tzinfo is None:
+            o = o.replace(tzinfo=timezone.utc)
+        return o.isoformat()
+    if isinstance(o, date):
+        return o.isoformat()
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    @docs
+    orjsonを使用するJSONプロバイダー
+
+    使い方:
+        app.json = FastJSONProvider(app)
+    """
+
+    ensure_ascii = False
+
+    def _orjson_options(self, indent=False, sort_keys=None):
+        options = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys if sort_keys is None else sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj, indent=False, sort_keys=None):
+        """
+        値をUTF-8のJSONにエンコードする
+
+        orjsonで扱えない値（64ビットを超える整数など）は標準のjsonモジュールでエンコードします。
+
+        Args:
+            obj: エンコードする値
+            indent (bool): Trueの場合はインデントして出力する
+            sort_keys (bool): キーを並べ替えるかどうか（Noneの場合はsort_keys属性に従う）
+
+        Returns:
+            bytes: JSON
+        """
+        if orjson is not None:
+            try:
+                return orjson.dumps(obj, default=json_default, option=self._orjson_options(indent, sort_keys))
+            except orjson.JSONEncodeError:
+                pass
+        return json.dumps(
+            obj,
+            default=json_default,
+            ensure_ascii=False,
+            sort_keys=self.sort_keys if sort_keys is None else sort_keys,
+            indent=2 if indent else None,
+            separators=(',', ': ') if indent else (',', ':')
+        ).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        """
+        値をJSONの文字列にエンコードする
+
+        indentとsort_keys以外の引数が指定された場合は標準のjsonモジュールを使用します。
+        """
+        if set(kwargs) - {'indent', 'sort_keys'}:
+            kwargs.setdefault('default', json_default)
+            kwargs.setdefault('ensure_ascii', False)
+            kwargs.setdefault('sort_keys', self.sort_keys)
+            return json.dumps(obj, **kwargs)
+        return self.dumps_bytes(obj, bool(kwargs.get('indent')), kwargs.get('sort_keys')).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        """
+        JSONをデコードする
+
+        orjsonのJSONDecodeErrorは標準のjson.JSONDecodeErrorのサブクラスです。
+        """
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        """
+        JSONのレスポンスを作成する（jsonifyから呼ばれる）
+
+        文字列を経由せずにエンコードしたバイト列をそのまま本文にします。
+        """
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,47 @@
+"""
+カテゴリごとのメモ数を集計するmemo_category_summariesテーブルを作成するマイグレーションスクリプト
+
+既存のメモをユーザー・カテゴリごとに集計して登録します（未設定のカテゴリは空文字）。
+以降はメモの作成・更新・削除と同じトランザクションで更新されます（category_summary.py）。
+
+使い方:
+    python migrations/add_memo_category_summaries.py
+"""
+import os
+import sys
+
+# モデルをインポートするためにパスを追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlalchemy as sa
+from sqlalchemy import func, insert, select
+from database import engine
+from models import CategorySummary, Memo
+
+def upgrade():
+    """
+    アップグレード処理: memo_category_summariesテーブルを作成して既存のメモを集計
+    """
+    try:
+        if sa.inspect(engine).has_table(CategorySummary.__tablename__):
+            print("memo_category_summaries テーブルはすでに存在します")
+            return
+
+        main_category = func.coalesce(Memo.main_category, '')
+        sub_category = func.coalesce(Memo.sub_category, '')
+        with engine.begin() as conn:
+            CategorySummary.__table__.create(conn)
+            result = conn.execute(insert(CategorySummary.__table__).from_select(
+                ['user_id', 'main_category', 'sub_category', 'item_count', 'last_updated_at'],
+                select(
+                    Memo.user_id, main_category, sub_category, func.count(),
+                    func.max(func.coalesce(Memo.updated_at, Memo.created_at))
+                ).where(Memo.user_id.isnot(None)).group_by(Memo.user_id, main_category, sub_category)
+            ))
+        print(f"memo_category_summaries テーブルを作成し、{result.rowcount}件のカテゴリを登録しました")
+    except Exception as e:
+        print(f"マイグレーションエラー: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    upgrade()
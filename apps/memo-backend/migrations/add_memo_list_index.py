@@ -0,0 +1,70 @@
+"""
+memosテーブルに一覧取得用のインデックスを追加するマイグレーションスクリプト
+
+書き込みを止めずにインデックスを作成します。
+- PostgreSQL: CREATE INDEX CONCURRENTLY（トランザクション外で実行）
+- SQLite: CREATE INDEX IF NOT EXISTS
+
+使い方:
+    python migrations/add_memo_list_index.py
+    python migrations/add_memo_list_index.py --downgrade
+"""
+import os
+import sys
+
+# モデルをインポートするためにパスを追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex, DropIndex
+from database import engine
+from models.memo import Memo
+
+INDEX_NAME = 'idx_memos_user_created'
+
+def _get_index():
+    for index in Memo.__table__.indexes:
+        if index.name == INDEX_NAME:
+            return index
+    raise KeyError(INDEX_NAME)
+
+def upgrade():
+    """
+    アップグレード処理: インデックスを作成
+    """
+    try:
+        index = _get_index()
+        if engine.dialect.name == 'postgresql':
+            with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                index.dialect_kwargs['postgresql_concurrently'] = True
+                conn.execute(CreateIndex(index, if_not_exists=True))
+        else:
+            with engine.begin() as conn:
+                conn.execute(text('PRAGMA busy_timeout = 30000'))
+                conn.execute(CreateIndex(index, if_not_exists=True))
+        print(f"memos テーブルに {INDEX_NAME} を作成しました")
+    except Exception as e:
+        print(f"マイグレーションエラー: {str(e)}")
+        raise
+
+def downgrade():
+    """
+    ダウングレード処理: インデックスを削除
+    """
+    try:
+        if engine.dialect.name == 'postgresql':
+            with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}'))
+        else:
+            with engine.begin() as conn:
+                conn.execute(DropIndex(_get_index(), if_exists=True))
+        print(f"memos テーブルから {INDEX_NAME} を削除しました")
+    except Exception as e:
+        print(f"ダウングレードエラー: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    if '--downgrade' in sys.argv:
+        downgrade()
+    else:
+        upgrade()
@@ -0,0 +1,44 @@
+"""
+memosテーブルにpage_countカラム（ページ数）を追加するマイグレーションスクリプト
+
+ページを追加する際、ページ数を数えてから挿入するのではなく、
+page_countをUPDATE ... RETURNINGで増やしてページ番号を割り当てるようになります。
+既存のメモは現在のページ数から始まります。
+
+使い方:
+    python migrations/add_memo_page_count.py
+"""
+import os
+import sys
+
+# モデルをインポートするためにパスを追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlalchemy as sa
+from sqlalchemy import text
+from database import engine
+
+def upgrade():
+    """
+    アップグレード処理: page_countカラムを追加して既存のページ数を設定
+    """
+    try:
+        inspector = sa.inspect(engine)
+        columns = [c['name'] for c in inspector.get_columns('memos')]
+        if 'page_count' in columns:
+            print("memos テーブルの page_count カラムはすでに存在します")
+            return
+
+        with engine.begin() as conn:
+            conn.execute(text('ALTER TABLE memos ADD COLUMN page_count INTEGER NOT NULL DEFAULT 0'))
+            conn.execute(text(
+                'UPDATE memos SET page_count = '
+                '(SELECT COUNT(*) FROM memo_pages WHERE memo_pages.memo_id = memos.id)'
+            ))
+        print("memos テーブルに page_count カラムを追加しました")
+    except Exception as e:
+        print(f"マイグレーションエラー: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    upgrade()
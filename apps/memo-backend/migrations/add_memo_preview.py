@@ -0,0 +1,67 @@
+"""
+memosテーブルに一覧表示用のpreview, content_lengthカラムを追加するマイグレーションスクリプト
+
+カラムを追加した後、既存のメモのプレビューと文字数をIDの順に
+少しずつ（BATCH_SIZE件ずつ）埋めます。途中で止めても再実行できます。
+
+使い方:
+    python migrations/add_memo_preview.py
+"""
+import os
+import sys
+
+# モデルをインポートするためにパスを追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlalchemy as sa
+from sqlalchemy import text
+from database import engine
+from models.memo import MEMO_PREVIEW_LENGTH, make_preview
+
+# 1回のトランザクションで更新する件数
+BATCH_SIZE = 500
+
+def upgrade():
+    """
+    アップグレード処理: カラムを追加し、既存のメモを埋める
+    """
+    try:
+        columns = [c['name'] for c in sa.inspect(engine).get_columns('memos')]
+        with engine.begin() as conn:
+            if 'preview' not in columns:
+                conn.execute(text(
+                    f"ALTER TABLE memos ADD COLUMN preview VARCHAR({MEMO_PREVIEW_LENGTH}) NOT NULL DEFAULT ''"
+                ))
+                print("memos テーブルに preview カラムを追加しました")
+            if 'content_length' not in columns:
+                conn.execute(text(
+                    'ALTER TABLE memos ADD COLUMN content_length INTEGER NOT NULL DEFAULT 0'
+                ))
+                print("memos テーブルに content_length カラムを追加しました")
+
+        last_id = 0
+        updated = 0
+        while True:
+            with engine.begin() as conn:
+                rows = conn.execute(text(
+                    'SELECT id, content FROM memos WHERE id > :last_id ORDER BY id LIMIT :limit'
+                ), {'last_id': last_id, 'limit': BATCH_SIZE}).fetchall()
+                if not rows:
+                    break
+                conn.execute(text(
+                    'UPDATE memos SET preview = :preview, content_length = :content_length WHERE id = :id'
+                ), [{
+                    'id': row.id,
+                    'preview': make_preview(row.content),
+                    'content_length': len(row.content or '')
+                } for row in rows])
+            last_id = rows[-1].id
+            updated += len(rows)
+            print(f"{updated} 件のメモを更新しました")
+
+    except Exception as e:
+        print(f"マイグレーションエラー: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    upgrade()
@@ -0,0 +1,82 @@
+"""
+全文検索用のmemo_search_documentsテーブルを作成し、既存のメモとページを登録するマイグレーションスクリプト
+
+テーブルの作成時に全文検索インデックス（SQLiteはFTS5のテーブルとトリガー、
+PostgreSQLはGINインデックス）も作成されます（text_search.attach_search_index）。
+メモのページの本文は圧縮して保存されているため、モデルを通して展開したテキストから登録します。
+
+使い方:
+    python migrations/add_memo_search_index.py
+"""
+import os
+import sys
+
+# モデルをインポートするためにパスを追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlalchemy as sa
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+from database import engine
+from models import Memo, MemoPage, SearchDocument
+from search_index import MAX_TEXT_LENGTH
+from text_search import index_tokens
+
+BATCH_SIZE = 500
+
+def _insert_batches(db, rows):
+    batch = []
+    count = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            db.execute(insert(SearchDocument.__table__), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        db.execute(insert(SearchDocument.__table__), batch)
+        count += len(batch)
+    return count
+
+def upgrade():
+    """
+    アップグレード処理: memo_search_documentsテーブルを作成して既存のメモとページを登録
+    """
+    try:
+        if sa.inspect(engine).has_table(SearchDocument.__tablename__):
+            print("memo_search_documents テーブルはすでに存在します")
+            return
+        SearchDocument.__table__.create(engine)
+        print("memo_search_documents テーブルと全文検索インデックスを作成しました")
+
+        db = sessionmaker(bind=engine)()
+        try:
+            memos = db.query(Memo.id, Memo.user_id, Memo.title, Memo.main_category, Memo.sub_category, Memo.content)
+            count = _insert_batches(db, ({
+                'user_id': user_id,
+                'memo_id': memo_id,
+                'memo_page_id': None,
+                'tokens': index_tokens(title, main_category, sub_category, (content or '')[:MAX_TEXT_LENGTH]),
+            } for memo_id, user_id, title, main_category, sub_category, content in memos.yield_per(BATCH_SIZE)))
+            print(f"{count}件のメモを登録しました")
+
+            pages = db.query(MemoPage.id, MemoPage.memo_id, Memo.user_id, MemoPage.content).join(
+                Memo, Memo.id == MemoPage.memo_id
+            )
+            count = _insert_batches(db, ({
+                'user_id': user_id,
+                'memo_id': memo_id,
+                'memo_page_id': page_id,
+                'tokens': index_tokens((content or '')[:MAX_TEXT_LENGTH]),
+            } for page_id, memo_id, user_id, content in pages.yield_per(BATCH_SIZE)))
+            print(f"{count}件のページを登録しました")
+            db.commit()
+        finally:
+            db.close()
+
+    except Exception as e:
+        print(f"マイグレーションエラー: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    upgrade()
@@ -0,0 +1,158 @@
+"""
+memo_pagesテーブルの既存の本文を圧縮形式に変換するバックフィルスクリプト
+
+圧縮されていない行をIDの順にBATCH_SIZE件ずつ変換します。
+途中で止めても再実行でき、変換済みの行は読み飛ばします。
+
+実行前後にデータベースのサイズとページ読み込みの時間を計測して表示します。
+SQLiteでは変換後にVACUUMを実行して空き領域をファイルから解放します。
+
+使い方:
+    python migrations/compress_memo_page_content.py              # 計測して変換
+    python migrations/compress_memo_page_content.py --benchmark  # 計測のみ
+    python migrations/compress_memo_page_content.py --decompress # 圧縮前の形式に戻す
+"""
+import os
+import random
+import sys
+import time
+
+# モデルをインポートするためにパスを追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+from database import engine
+from models import MemoPage
+from content_codec import decode_content, encode_content, is_encoded
+
+TABLE_NAME = 'memo_pages'
+
+# 1回のトランザクションで変換する件数
+BATCH_SIZE = 200
+
+# 読み込み時間の計測で読むページ数
+BENCHMARK_READS = 200
+
+def database_size():
+    """
+    データベース（またはテーブル）のサイズをバイト数で取得する
+
+    Returns:
+        int: サイズ（取得できない場合はNone）
+    """
+    with engine.connect() as conn:
+        if engine.dialect.name == 'postgresql':
+            return conn.execute(text('SELECT pg_total_relation_size(:table)'), {'table': TABLE_NAME}).scalar()
+        if engine.dialect.name == 'sqlite':
+            page_count = conn.execute(text('PRAGMA page_count')).scalar()
+            page_size = conn.execute(text('PRAGMA page_size')).scalar()
+            return page_count * page_size
+    return None
+
+def benchmark(label):
+    """
+    データベースのサイズとページ読み込みの時間を計測して表示する
+
+    ページをランダムに選び、ORM経由で本文を読み込む（展開を含む）時間を計測します。
+
+    Args:
+        label (str): 表示用のラベル
+    """
+    with engine.connect() as conn:
+        ids = [row[0] for row in conn.execute(text(f'SELECT id FROM {TABLE_NAME}'))]
+        stored_bytes = conn.execute(text(f'SELECT SUM(LENGTH(content)) FROM {TABLE_NAME}')).scalar() or 0
+
+    timings = []
+    if ids:
+        session = sessionmaker(bind=engine)()
+        try:
+            for page_id in random.choices(ids, k=BENCHMARK_READS):
+                started = time.perf_counter()
+                session.query(MemoPage.content).filter(MemoPage.id == page_id).scalar()
+                timings.append(time.perf_counter() - started)
+        finally:
+            session.close()
+    timings.sort()
+
+    print(f"=== {label} ===")
+    print(f"ページ数: {len(ids)}")
+    print(f"本文の保存サイズ合計: {stored_bytes} 文字")
+    print(f"データベースサイズ: {database_size()} バイト")
+    if timings:
+        print(f"読み込み時間 平均: {sum(timings) / len(timings) * 1000:.3f} ms, "
+              f"p95: {timings[int(len(timings) * 0.95) - 1] * 1000:.3f} ms")
+    print()
+
+def backfill(convert):
+    """
+    本文をIDの順に少しずつ変換する
+
+    Args:
+        convert (callable): 保存されている値を受け取り、新しい値を返す関数
+
+    Returns:
+        int: 変換した行数
+    """
+    last_id = 0
+    converted = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(text(
+                f'SELECT id, content FROM {TABLE_NAME} WHERE id > :last_id ORDER BY id LIMIT :limit'
+            ), {'last_id': last_id, 'limit': BATCH_SIZE}).fetchall()
+            if not rows:
+                break
+            updates = []
+            for row in rows:
+                new_value = convert(row.content)
+                if new_value != row.content:
+                    updates.append({'id': row.id, 'content': new_value})
+            if updates:
+                # versionは変えない（本文の内容は変わらないためETagも変えない）
+                conn.execute(text(f'UPDATE {TABLE_NAME} SET content = :content WHERE id = :id'), updates)
+        last_id = rows[-1].id
+        converted += len(updates)
+        print(f"ID {last_id} まで確認しました（変換 {converted} 件）")
+    return converted
+
+def compress(value):
+    return value if is_encoded(value) else encode_content(value)
+
+def upgrade():
+    """
+    アップグレード処理: 既存の本文を圧縮形式に変換
+    """
+    try:
+        converted = backfill(compress)
+        print(f"{TABLE_NAME} テーブルの {converted} 件の本文を圧縮しました")
+        if engine.dialect.name == 'sqlite':
+            with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                conn.execute(text('VACUUM'))
+    except Exception as e:
+        print(f"マイグレーションエラー: {str(e)}")
+        raise
+
+def downgrade():
+    """
+    ダウングレード処理: 本文を圧縮前の形式に戻す
+    """
+    try:
+        converted = backfill(decode_content)
+        print(f"{TABLE_NAME} テーブルの {converted} 件の本文を展開しました")
+    except Exception as e:
+        print(f"ダウングレードエラー: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    if '--decompress' in sys.argv:
+        downgrade()
+        sys.exit(0)
+
+    benchmark('変換前')
+
+    if '--benchmark' in sys.argv:
+        sys.exit(0)
+
+    upgrade()
+    benchmark('変換後')
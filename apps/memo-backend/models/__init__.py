@@ -1,2 +1,4 @@
 from models.memo import Memo
 from models.memopage import MemoPage
+from models.search_document import SearchDocument
+from models.category_summary import CategorySummary
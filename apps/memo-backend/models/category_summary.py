@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from database import Base
+
+class CategorySummary(Base):
+    """
+    @docs
+    ユーザーのカテゴリごとのメモ数を表すモデル
+
+    メモの作成・更新・削除と同じトランザクションでcategory_summary.pyにより増減し、
+    カテゴリ一覧（GET /api/memo/categories）はこのテーブルだけを読みます。
+    メモのカテゴリは未設定（None）にできるため、未設定は空文字で保存します。
+    """
+    __tablename__ = 'memo_category_summaries'
+
+    user_id = Column(String(128), primary_key=True)
+    main_category = Column(String(50), primary_key=True)
+    sub_category = Column(String(50), primary_key=True)
+    item_count = Column(Integer, nullable=False, default=0)  # カテゴリのメモ数
+    # カテゴリ内で最後にメモを作成・更新した日時
+    last_updated_at = Column(DateTime(timezone=True), nullable=True)
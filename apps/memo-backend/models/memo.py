@@ -1,8 +1,28 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime
-from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from sqlalchemy.sql import func, literal_column
+from sqlalchemy.orm import relationship, validates
 from database import Base
 
+# 一覧表示用に保存するプレビューの最大文字数
+MEMO_PREVIEW_LENGTH = 100
+
+# 1つのメモに作成できる最大ページ数
+MAX_MEMO_PAGES = 10
+
+def make_preview(content):
+    """
+    メモ本文から一覧表示用のプレビューを作成する関数
+
+    改行や連続する空白を1つの空白にまとめ、先頭から最大文字数までを返します。
+
+    Args:
+        content (str): メモ本文
+
+    Returns:
+        str: プレビュー
+    """
+    return ' '.join((content or '').split())[:MEMO_PREVIEW_LENGTH]
+
 class Memo(Base):
     """
     @docs
@@ -13,11 +33,32 @@ class Memo(Base):
     id = Column(Integer, primary_key=True)
     title = Column(String(100), nullable=False, default='無題')
     content = Column(Text, nullable=True)
+    # 一覧表示用の本文の先頭部分と本文の文字数（contentの更新時に自動で設定）
+    preview = Column(String(MEMO_PREVIEW_LENGTH), nullable=False, default='')
+    content_length = Column(Integer, nullable=False, default=0)
+    # ページ数（ページの追加・削除と同じトランザクションでUPDATE ... RETURNINGにより増減）
+    page_count = Column(Integer, nullable=False, default=0, server_default='0')
     main_category = Column(String(50), nullable=True)
+    # 更新ごとに1ずつ増えるバージョン（ETag用、一括更新でも増える）
+    version = Column(Integer, nullable=False, default=1, server_default='1',
+                     onupdate=literal_column('version', Integer) + 1)
     sub_category = Column(String(50), nullable=True)
     user_id = Column(String(128), nullable=True)  # Firebaseユーザーのuidを保存
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
     
     # リレーションシップ
-    pages = relationship("MemoPage", back_populates="memo", cascade="all, delete-orphan", order_by="MemoPage.page_number")
+    # 削除はデータベースのON DELETE CASCADEに任せ、ページを読み込まずにメモの行だけを削除する
+    pages = relationship("MemoPage", back_populates="memo", cascade="all, delete-orphan", passive_deletes=True,
+                         order_by="MemoPage.page_number")
+
+    @validates('content')
+    def _update_summary(self, key, content):
+        self.preview = make_preview(content)
+        self.content_length = len(content or '')
+        return content
+
+    # ユーザーごとのメモ一覧（作成日時の降順）用のインデックス
+    __table_args__ = (
+        Index('idx_memos_user_created', user_id, created_at.desc()),
+    )
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey, Index, UniqueConstraint
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, literal_column
 from database import Base
+from content_codec import CompressedText
 
 class MemoPage(Base):
     """
@@ -20,7 +21,10 @@ class MemoPage(Base):
     id = Column(Integer, primary_key=True)
     memo_id = Column(Integer, ForeignKey('memos.id', ondelete='CASCADE'), nullable=False)
     page_number = Column(Integer, nullable=False, default=1)
-    content = Column(Text, nullable=True)
+    content = Column(CompressedText, nullable=True)  # 保存時に圧縮
+    # 更新ごとに1ずつ増えるバージョン（ETag用、一括更新でも増える）
+    version = Column(Integer, nullable=False, default=1, server_default='1',
+                     onupdate=literal_column('version', Integer) + 1)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
 
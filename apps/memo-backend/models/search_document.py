@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Index
+from database import Base
+from text_search import attach_search_index
+
+class SearchDocument(Base):
+    """
+    @docs
+    全文検索の対象（メモのタイトル・カテゴリ・本文、メモのページの本文）を表すモデル
+
+    メモとページの保存時にsearch_index.pyで更新し、削除時は外部キーのON DELETE CASCADEで削除されます。
+    tokens列にはtext_search.index_tokens()で分割したトークンを保存し、
+    全文検索インデックス（SQLiteはFTS5、PostgreSQLはGIN）はtext_search.attach_search_index()で作成します。
+    """
+    __tablename__ = 'memo_search_documents'
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String(128), nullable=True)  # メモの所有者（検索結果の絞り込み用）
+    memo_id = Column(Integer, ForeignKey('memos.id', ondelete='CASCADE'), nullable=False)
+    # メモ自体の文書の場合はNone
+    memo_page_id = Column(Integer, ForeignKey('memo_pages.id', ondelete='CASCADE'), nullable=True)
+    tokens = Column(Text, nullable=False, default='')  # スペース区切りの検索用トークン
+
+    __table_args__ = (
+        Index('idx_memo_search_documents_memo_page', 'memo_id', 'memo_page_id'),
+        Index('idx_memo_search_documents_page', 'memo_page_id'),
+    )
+
+attach_search_index(SearchDocument.__table__)
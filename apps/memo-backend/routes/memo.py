@@ -1,16 +1,149 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, make_response
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import func
-from models.memo import Memo
+from sqlalchemy import select, update
+from models.memo import MAX_MEMO_PAGES, Memo
 from models.memopage import MemoPage
-from database import db_session
+from models.search_document import SearchDocument
+from models.category_summary import CategorySummary
+from database import db_session, read_session
+from db_routing import is_read_request
+from pagination import (
+    NEXT_CURSOR_HEADER, PaginationError, apply_keyset, encode_cursor, encode_offset_cursor,
+    fetch_page, parse_fields, parse_offset_params, parse_page_params
+)
+from json_stream import iter_json_array, json_stream_response, stream_rows
+from search_index import index_memo, index_memo_pages
+from text_search import apply_search, parse_query
+from category_summary import add_to_category, move_category, remove_from_categories
+from datetime import datetime, timezone
 import traceback
-from auth_middleware import require_auth, check_resource_ownership
+from auth_middleware import require_auth
 import logging
 
 logger = logging.getLogger(__name__)
 memo_bp = Blueprint('memo', __name__)
 
+def session_for_request():
+    """
+    リクエストに応じたセッションを返す関数
+    GETリクエストでは読み取り用のセッションを返す
+    """
+    return read_session if is_read_request() else db_session
+
+def allocate_page_number(session, memo_id):
+    """
+    メモに追加するページのページ番号を割り当てる関数
+
+    メモのページ数を1つのUPDATE ... RETURNING文で上限未満の場合だけ増やすため、
+    同じメモに同時にページを追加しても同じページ番号は割り当てられません。
+    ページ数はページを追加したトランザクションの終了までロックされます。
+
+    Args:
+        session: 使用するセッション
+        memo_id: メモID
+
+    Returns:
+        int: 新しいページのページ番号（上限に達している場合はNone）
+    """
+    memos = Memo.__table__
+    statement = update(memos).where(
+        memos.c.id == memo_id,
+        memos.c.page_count < MAX_MEMO_PAGES
+    ).values(
+        page_count=memos.c.page_count + 1,
+        version=memos.c.version,  # ページの追加ではメモのバージョンと更新日時は変えない
+        updated_at=memos.c.updated_at
+    )
+    if session.get_bind().dialect.update_returning:
+        return session.execute(statement.returning(memos.c.page_count)).scalar()
+
+    # RETURNINGに対応していないデータベースでは、書き込みロックを取得した同じトランザクション内で読み直す
+    if session.execute(statement).rowcount == 0:
+        return None
+    return session.execute(select(memos.c.page_count).where(memos.c.id == memo_id)).scalar()
+
+def not_modified_response(etag):
+    """
+    If-None-MatchがETagと一致する場合に304のレスポンスを返す関数
+
+    ETagはバージョンから作るためレスポンスのバイト列（圧縮の有無）を区別しない。
+    200と304のどちらのレスポンスでも弱いETagとして返します。
+
+    Args:
+        etag (str): 現在のETag
+
+    Returns:
+        Response: 一致する場合は304のレスポンス、それ以外はNone
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = make_response('', 304)
+    response.set_etag(etag, weak=True)
+    return response
+
+def memo_etag(memo_id, version):
+    """メモのETagを作成する関数"""
+    return f'memo-{memo_id}-{version}'
+
+def memo_page_etag(page_id, version):
+    """メモページのETagを作成する関数"""
+    return f'memopage-{page_id}-{version}'
+
+# 一覧で返すフィールドと列の対応（fieldsパラメータで絞り込める）
+# 本文全体はGET /memos/<id>でのみ返し、一覧ではプレビューと文字数を返す
+MEMO_LIST_FIELDS = {
+    'id': Memo.id,
+    'title': Memo.title,
+    'preview': Memo.preview,
+    'contentLength': Memo.content_length,
+    'mainCategory': Memo.main_category,
+    'subCategory': Memo.sub_category,
+    'createdAt': Memo.created_at,
+    'updatedAt': Memo.updated_at,
+}
+
+def list_memos(user_id):
+    """
+    ユーザーのメモ一覧のレスポンスを作成する関数
+
+    クエリパラメータ:
+        limit: 1ページの件数（指定した場合はページネーションする）
+        cursor: 前のページのレスポンスのX-Next-Cursorヘッダーの値
+        fields: 返すフィールド（カンマ区切り、省略時は全フィールド）
+
+    Args:
+        user_id (str): ログインユーザーのID
+
+    Returns:
+        Response: メモ一覧のレスポンス
+    """
+    try:
+        limit, cursor = parse_page_params(request.args)
+        fields = parse_fields(request.args.get('fields'), MEMO_LIST_FIELDS)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        # 指定されたフィールドの列のみ取得（カーソル用にidとcreatedAtは常に取得）
+        columns = [Memo.id, Memo.created_at] + [
+            MEMO_LIST_FIELDS[name] for name in fields if name not in ('id', 'createdAt')
+        ]
+        query = read_session.query(*columns).filter(Memo.user_id == user_id)
+        rows, has_more = fetch_page(apply_keyset(query, Memo.created_at, Memo.id, cursor), limit)
+
+        response = jsonify([
+            {name: row._mapping[MEMO_LIST_FIELDS[name]] for name in fields}
+            for row in rows
+        ])
+        if has_more:
+            last = rows[-1]
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
+        return response
+    except SQLAlchemyError as e:
+        read_session.rollback()
+        logger.error(f"メモ一覧取得エラー: {str(e)}")
+        return jsonify({'error': 'データベースエラー'}), 500
+
 @memo_bp.route('/memos', methods=['GET', 'POST', 'OPTIONS'])
 @require_auth
 def create_memo():
@@ -24,22 +157,7 @@ def create_memo():
         return jsonify({'error': '認証エラー'}), 401
     
     if request.method == 'GET':
-        try:
-            # 現在のユーザーが所有するメモのみ取得
-            memos = Memo.query.filter_by(user_id=user_id).order_by(Memo.created_at.desc()).all()
-            return jsonify([{
-                'id': memo.id,
-                'title': memo.title,
-                'content': memo.content,
-                'mainCategory': memo.main_category,
-                'subCategory': memo.sub_category,
-                'createdAt': memo.created_at,
-                'updatedAt': memo.updated_at
-            } for memo in memos])
-        except SQLAlchemyError as e:
-            db_session.rollback()
-            logger.error(f"メモ一覧取得エラー: {str(e)}")
-            return jsonify({'error': 'データベースエラー'}), 500
+        return list_memos(user_id)
     
     try:
         data = request.get_json()
@@ -48,9 +166,12 @@ def create_memo():
             content=data.get('content', ''),
             main_category=data.get('main_category'),
             sub_category=data.get('sub_category'),
-            user_id=user_id  # ユーザーIDを設定
+            user_id=user_id,  # ユーザーIDを設定
+            page_count=1
         )
         db_session.add(memo)
+        add_to_category(db_session, CategorySummary.__table__, user_id,
+                        memo.main_category, memo.sub_category, datetime.now(timezone.utc))
         db_session.commit()
         
         # メモ作成時に自動的に最初のページ（ページ番号1）を作成
@@ -61,6 +182,9 @@ def create_memo():
                 content=data.get('content', '')
             )
             db_session.add(first_page)
+            db_session.flush()
+            index_memo(db_session, memo)
+            index_memo_pages(db_session, memo, [(first_page.id, first_page.content)])
             db_session.commit()
             logger.info(f"Initial page created for memo {memo.id}: page_number=1")
             
@@ -117,22 +241,101 @@ def get_memos():
         logger.error("ユーザーIDが取得できません")
         return jsonify({'error': '認証エラー'}), 401
     
+    return list_memos(user_id)
+
+@memo_bp.route('/search', methods=['GET', 'OPTIONS'])
+@require_auth
+def search_memos():
+    """
+    @docs
+    ログインユーザーのメモとメモのページを全文検索するAPI
+
+    クエリパラメータ:
+        q: 検索文字列（空白区切りの語をすべて含むものを検索）
+        limit: 1ページの件数
+        cursor: 前のページのレスポンスのX-Next-Cursorヘッダーの値
+
+    メモのタイトル・カテゴリ・本文に一致した場合はpageIdとpageNumberがNoneになります。
+    結果は関連度の高い順に返します。
+    """
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    user_id = request.firebase_token.get('uid')
+    if not user_id:
+        logger.error("ユーザーIDが取得できません")
+        return jsonify({'error': '認証エラー'}), 401
+
+    terms = parse_query(request.args.get('q', ''))
+    if not terms:
+        return jsonify({'error': 'qに検索文字列を指定してください'}), 400
     try:
-        # 現在のユーザーが所有するメモのみ取得
-        memos = Memo.query.filter_by(user_id=user_id).all()
-        return jsonify([{
-            'id': memo.id,
-            'title': memo.title,
-            'content': memo.content,
-            'mainCategory': memo.main_category,
-            'subCategory': memo.sub_category,
-            'createdAt': memo.created_at,
-            'updatedAt': memo.updated_at
-        } for memo in memos])
-    except Exception as e:
-        logger.error(f"Error getting memos: {str(e)}")
-        logger.error(traceback.format_exc())
-        return jsonify({'error': '取得に失敗しました'}), 500
+        limit, offset = parse_offset_params(request.args)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        query = read_session.query(
+            SearchDocument.memo_id, SearchDocument.memo_page_id, MemoPage.page_number,
+            Memo.title, Memo.main_category, Memo.sub_category
+        ).join(Memo, Memo.id == SearchDocument.memo_id).outerjoin(
+            MemoPage, MemoPage.id == SearchDocument.memo_page_id
+        ).filter(SearchDocument.user_id == user_id)
+        query = apply_search(query, SearchDocument.__table__, terms, read_session.get_bind().dialect.name)
+        rows = query.offset(offset).limit(limit + 1).all()
+    except SQLAlchemyError as e:
+        read_session.rollback()
+        logger.error(f"メモ検索エラー: {str(e)}")
+        return jsonify({'error': 'データベースエラー'}), 500
+
+    response = jsonify([{
+        'memoId': memo_id,
+        'pageId': page_id,
+        'pageNumber': page_number,
+        'title': title,
+        'mainCategory': main_category,
+        'subCategory': sub_category
+    } for memo_id, page_id, page_number, title, main_category, sub_category in rows[:limit]])
+    if len(rows) > limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_offset_cursor(offset + limit)
+    return response
+
+@memo_bp.route('/categories', methods=['GET', 'OPTIONS'])
+@require_auth
+def get_memo_categories():
+    """
+    @docs
+    ログインユーザーのカテゴリごとのメモ数を取得するAPI
+
+    メモの一覧は読まず、集計テーブル（CategorySummary）だけを読みます。
+    結果はメインカテゴリ・サブカテゴリの順に並び、未設定のカテゴリはNoneになります。
+    """
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    user_id = request.firebase_token.get('uid')
+    if not user_id:
+        logger.error("ユーザーIDが取得できません")
+        return jsonify({'error': '認証エラー'}), 401
+
+    try:
+        rows = read_session.query(
+            CategorySummary.main_category, CategorySummary.sub_category,
+            CategorySummary.item_count, CategorySummary.last_updated_at
+        ).filter(CategorySummary.user_id == user_id).order_by(
+            CategorySummary.main_category, CategorySummary.sub_category
+        ).all()
+    except SQLAlchemyError as e:
+        read_session.rollback()
+        logger.error(f"カテゴリ一覧取得エラー: {str(e)}")
+        return jsonify({'error': 'データベースエラー'}), 500
+
+    return jsonify([{
+        'mainCategory': main_category or None,
+        'subCategory': sub_category or None,
+        'count': item_count,
+        'lastUpdatedAt': last_updated_at
+    } for main_category, sub_category, item_count, last_updated_at in rows])
 
 @memo_bp.route('/memos/<int:memo_id>', methods=['GET', 'OPTIONS'])
 @require_auth
@@ -147,7 +350,17 @@ def get_memo(memo_id):
         return jsonify({'error': '認証エラー'}), 401
     
     try:
-        memo = Memo.query.get(memo_id)
+        # If-None-Matchがある場合は本文を読まずにバージョンだけで比較する
+        if request.if_none_match:
+            version = read_session.query(Memo.version).filter(
+                Memo.id == memo_id, Memo.user_id == user_id
+            ).scalar()
+            if version is not None:
+                response = not_modified_response(memo_etag(memo_id, version))
+                if response is not None:
+                    return response
+
+        memo = read_session.query(Memo).get(memo_id)
         if not memo:
             return jsonify({'error': 'メモが見つかりません'}), 404
         
@@ -156,7 +369,7 @@ def get_memo(memo_id):
             logger.warning(f"メモアクセス権限なし: memo_id={memo_id}, user_id={user_id}")
             return jsonify({'error': 'このメモへのアクセス権限がありません'}), 403
 
-        return jsonify({
+        response = jsonify({
             'id': memo.id,
             'title': memo.title,
             'content': memo.content,
@@ -165,6 +378,8 @@ def get_memo(memo_id):
             'createdAt': memo.created_at,
             'updatedAt': memo.updated_at
         })
+        response.set_etag(memo_etag(memo.id, memo.version), weak=True)
+        return response
     except Exception as e:
         logger.error(f"Error getting memo {memo_id}: {str(e)}")
         logger.error(traceback.format_exc())
@@ -193,6 +408,7 @@ def update_memo(memo_id):
             return jsonify({'error': 'このメモへのアクセス権限がありません'}), 403
 
         data = request.get_json()
+        old_category = (memo.main_category, memo.sub_category)
         if 'title' in data:
             memo.title = data['title']
         if 'content' in data:
@@ -201,6 +417,10 @@ def update_memo(memo_id):
             memo.main_category = data['main_category']
         if 'sub_category' in data:
             memo.sub_category = data['sub_category']
+        if {'title', 'content', 'main_category', 'sub_category'} & data.keys():
+            index_memo(db_session, memo)
+        move_category(db_session, CategorySummary.__table__, user_id, old_category,
+                      (memo.main_category, memo.sub_category), datetime.now(timezone.utc))
 
         db_session.commit()
         return jsonify({
@@ -240,7 +460,10 @@ def delete_memo(memo_id):
             logger.warning(f"メモアクセス権限なし: memo_id={memo_id}, user_id={user_id}")
             return jsonify({'error': 'このメモへのアクセス権限がありません'}), 403
 
-        db_session.delete(memo)
+        # ページはデータベースのON DELETE CASCADEで削除されるため、メモの行だけを削除する
+        db_session.query(Memo).filter(Memo.id == memo_id).delete(synchronize_session=False)
+        remove_from_categories(db_session, CategorySummary.__table__, user_id,
+                               [(memo.main_category, memo.sub_category)])
         db_session.commit()
         return '', 204
     except Exception as e:
@@ -267,7 +490,8 @@ def memo_pages(memo_id):
         logger.error("ユーザーIDが取得できません")
         return jsonify({'error': '認証エラー'}), 401
     
-    memo = Memo.query.get(memo_id)
+    session = session_for_request()
+    memo = session.query(Memo).get(memo_id)
     if not memo:
         return jsonify({'error': '指定されたメモが存在しません'}), 404
     
@@ -276,37 +500,34 @@ def memo_pages(memo_id):
         logger.warning(f"メモアクセス権限なし: memo_id={memo_id}, user_id={user_id}")
         return jsonify({'error': 'このメモへのアクセス権限がありません'}), 403
 
-    # GET: メモのすべてのページを取得
+    # GET: メモのすべてのページを取得（1ページずつ取得して書き出す）
     if request.method == 'GET':
-        try:
-            pages = MemoPage.query.filter_by(memo_id=memo_id).order_by(MemoPage.page_number).all()
-            return jsonify([{
+        def page_query(stream_session):
+            return stream_session.query(MemoPage).filter_by(memo_id=memo_id).order_by(MemoPage.page_number)
+
+        def serialize(page):
+            return {
                 'id': page.id,
                 'memoId': page.memo_id,
                 'pageNumber': page.page_number,
                 'content': page.content,
                 'createdAt': page.created_at,
                 'updatedAt': page.updated_at
-            } for page in pages])
-        except SQLAlchemyError as e:
-            db_session.rollback()
-            logger.error(f"ページ一覧取得エラー: {str(e)}")
-            return jsonify({'error': 'データベースエラー'}), 500
+            }
+
+        pages = stream_rows(read_session.session_factory, page_query, serialize)
+        return json_stream_response(iter_json_array(pages))
     
     # POST: 新しいページを追加
     try:
         data = request.get_json()
         
-        # 既存のページ数をカウント
-        page_count = MemoPage.query.filter_by(memo_id=memo_id).count()
-        
-        # 10ページ以上は作成できない
-        if page_count >= 10:
-            return jsonify({'error': 'ページ数の上限に達しました'}), 400
-        
-        # 次のページ番号を取得（フロントエンドとの整合性を考慮）
+        # 次のページ番号を割り当てる（上限のMAX_MEMO_PAGESページに達している場合はNone）
         # フロントエンドからのページ番号は0ベース、バックエンドでは1ベースで扱う
-        next_page_number = page_count + 1
+        next_page_number = allocate_page_number(db_session, memo_id)
+        if next_page_number is None:
+            db_session.rollback()
+            return jsonify({'error': 'ページ数の上限に達しました'}), 400
         print(f"Creating new page with number: {next_page_number} for memo {memo_id}")
         
         memo_page = MemoPage(
@@ -316,6 +537,8 @@ def memo_pages(memo_id):
         )
         
         db_session.add(memo_page)
+        db_session.flush()
+        index_memo_pages(db_session, memo, [(memo_page.id, memo_page.content)])
         db_session.commit()
         
         return jsonify({
@@ -351,9 +574,24 @@ def memo_page(memo_id, page_number):
     
     try:
         logger.info(f"Received request for memo {memo_id}, page {page_number}")
+
+        # GETでIf-None-Matchがある場合は本文を読まずにバージョンだけで比較する
+        if request.method == 'GET' and request.if_none_match:
+            row = read_session.query(MemoPage.id, MemoPage.version).join(
+                Memo, Memo.id == MemoPage.memo_id
+            ).filter(
+                MemoPage.memo_id == memo_id,
+                MemoPage.page_number == page_number,
+                Memo.user_id == user_id
+            ).first()
+            if row:
+                response = not_modified_response(memo_page_etag(row.id, row.version))
+                if response is not None:
+                    return response
         
         # まずメモの存在確認
-        memo = Memo.query.get(memo_id)
+        session = session_for_request()
+        memo = session.query(Memo).get(memo_id)
         if not memo:
             logger.warning(f"Memo {memo_id} not found")
             return jsonify({'error': '指定されたメモが存在しません'}), 404
@@ -363,19 +601,17 @@ def memo_page(memo_id, page_number):
             logger.warning(f"メモアクセス権限なし: memo_id={memo_id}, user_id={user_id}")
             return jsonify({'error': 'このメモへのアクセス権限がありません'}), 403
         
-        # このメモの全ページを取得して詳細なデバッグ情報を出力
-        all_pages = MemoPage.query.filter_by(memo_id=memo_id).all()
-        page_numbers = [p.page_number for p in all_pages]
-        logger.info(f"All pages for memo {memo_id}: {page_numbers}")
+        # ページ数はメモの列から出力する（全ページの本文を読み込まない）
+        logger.info(f"Memo {memo_id} has {memo.page_count} pages")
         
         # ページ番号でページを取得
-        memo_page = MemoPage.query.filter_by(page_number=page_number, memo_id=memo_id).first()
+        memo_page = session.query(MemoPage).filter_by(page_number=page_number, memo_id=memo_id).first()
         logger.info(f"Page query result for page {page_number}: {memo_page}")
         
         # ページが見つからない場合は、ID検索も試みる（移行期の互換性のため）
         if not memo_page and page_number > 0:
             logger.info(f"Trying fallback: looking for page by ID {page_number}")
-            memo_page = MemoPage.query.filter_by(id=page_number, memo_id=memo_id).first()
+            memo_page = session.query(MemoPage).filter_by(id=page_number, memo_id=memo_id).first()
             logger.info(f"Fallback query result: {memo_page}")
     except Exception as e:
         logger.error(f"Error processing request: {str(e)}")
@@ -386,7 +622,7 @@ def memo_page(memo_id, page_number):
     
     # GET: 特定のページを取得
     if request.method == 'GET':
-        return jsonify({
+        response = jsonify({
             'id': memo_page.id,
             'memoId': memo_page.memo_id,
             'pageNumber': memo_page.page_number,
@@ -394,6 +630,8 @@ def memo_page(memo_id, page_number):
             'createdAt': memo_page.created_at,
             'updatedAt': memo_page.updated_at
         })
+        response.set_etag(memo_page_etag(memo_page.id, memo_page.version), weak=True)
+        return response
     
     # PUT: ページを更新
     if request.method == 'PUT':
@@ -401,6 +639,7 @@ def memo_page(memo_id, page_number):
             data = request.get_json()
             
             memo_page.content = data.get('content', memo_page.content)
+            index_memo_pages(db_session, memo, [(memo_page.id, memo_page.content)])
             db_session.commit()
             
             return jsonify({
@@ -418,17 +657,29 @@ def memo_page(memo_id, page_number):
     # DELETE: ページを削除
     if request.method == 'DELETE':
         try:
-            # このページより後のページの番号を一つづつ減らす
-            later_pages = MemoPage.query.filter(
-                MemoPage.memo_id == memo_id,
-                MemoPage.page_number > memo_page.page_number
-            ).order_by(MemoPage.page_number).all()
-            
-            for later_page in later_pages:
-                later_page.page_number -= 1
-            
+            deleted_number = memo_page.page_number
+
             # 指定されたページを削除
             db_session.delete(memo_page)
+            db_session.flush()
+
+            # このページより後のページの番号を一つずつ減らす
+            # (memo_id, page_number)の一意制約に行ごとに衝突しないよう、
+            # 一度負の値に退避してから正の値に戻す（メモは最大10ページのため番号を保存したままにする）
+            db_session.query(MemoPage).filter(
+                MemoPage.memo_id == memo_id,
+                MemoPage.page_number > deleted_number
+            ).update({MemoPage.page_number: 1 - MemoPage.page_number}, synchronize_session=False)
+            db_session.query(MemoPage).filter(
+                MemoPage.memo_id == memo_id,
+                MemoPage.page_number < 0
+            ).update({MemoPage.page_number: -MemoPage.page_number}, synchronize_session=False)
+            memos = Memo.__table__
+            db_session.execute(update(memos).where(memos.c.id == memo_id).values(
+                page_count=memos.c.page_count - 1,
+                version=memos.c.version,
+                updated_at=memos.c.updated_at
+            ))
             db_session.commit()
             
             return jsonify({'message': 'ページが削除されました'})
@@ -0,0 +1,67 @@
+"""
+メモとメモのページの全文検索インデックスの更新
+
+メモのタイトル・カテゴリ・本文と、メモのページの本文をSearchDocumentのtokens列に保存します。
+メモとページを保存するトランザクションの中で呼び出すため、検索結果は保存した内容と常に一致します。
+メモとページの削除時は外部キーのON DELETE CASCADEで削除されます。
+"""
+from sqlalchemy import bindparam, insert, or_, update
+from models.search_document import SearchDocument
+from text_search import index_tokens
+
+# 1件の文書から索引に登録する最大の文字数
+MAX_TEXT_LENGTH = 20000
+
+def _save(session, memo_id, user_id, documents):
+    # documents: {memo_page_id（メモ自体はNone）: tokens}
+    conditions = []
+    page_ids = [page_id for page_id in documents if page_id is not None]
+    if page_ids:
+        conditions.append(SearchDocument.memo_page_id.in_(page_ids))
+    if None in documents:
+        conditions.append(SearchDocument.memo_page_id.is_(None))
+    existing = dict(
+        session.query(SearchDocument.memo_page_id, SearchDocument.id)
+        .filter(SearchDocument.memo_id == memo_id, or_(*conditions))
+    )
+    table = SearchDocument.__table__
+    updates = [{'document_id': existing[page_id], 'new_tokens': tokens}
+               for page_id, tokens in documents.items() if page_id in existing]
+    inserts = [{'user_id': user_id, 'memo_id': memo_id, 'memo_page_id': page_id, 'tokens': tokens}
+               for page_id, tokens in documents.items() if page_id not in existing]
+    if updates:
+        session.execute(
+            update(table).where(table.c.id == bindparam('document_id')).values(tokens=bindparam('new_tokens')),
+            updates
+        )
+    if inserts:
+        session.execute(insert(table), inserts)
+
+def index_memo(session, memo):
+    """
+    メモのタイトル・カテゴリ・本文を検索インデックスに保存する関数
+
+    コミットは呼び出し側で行います。
+
+    Args:
+        session: 使用するセッション
+        memo (Memo): メモ（IDが確定していること）
+    """
+    tokens = index_tokens(memo.title, memo.main_category, memo.sub_category,
+                          (memo.content or '')[:MAX_TEXT_LENGTH])
+    _save(session, memo.id, memo.user_id, {None: tokens})
+
+def index_memo_pages(session, memo, pages):
+    """
+    メモのページの本文を検索インデックスに保存する関数
+
+    コミットは呼び出し側で行います。
+
+    Args:
+        session: 使用するセッション
+        memo (Memo): ページのメモ
+        pages (iterable): (ページID, 本文)の組
+    """
+    documents = {page_id: index_tokens((content or '')[:MAX_TEXT_LENGTH]) for page_id, content in pages}
+    if documents:
+        _save(session, memo.id, memo.user_id, documents)
@@ -0,0 +1,149 @@
+"""
+メモAPIのテストスクリプト
+
+一時ファイルのSQLiteデータベースを使用し（conftest.py）、Firebaseのトークン検証は
+モックに置き換えてエンドポイントを呼び出します。
+"""
+
+import importlib.util
+import os
+import unittest
+
+import pytest
+from sqlalchemy import text
+
+from app import create_app
+from database import db_session, engine
+from models import CategorySummary, Memo
+from models.memo import MEMO_PREVIEW_LENGTH
+from routes.memo import MEMO_LIST_FIELDS
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+def load_migration(name):
+    """migrationsディレクトリのマイグレーションスクリプトを読み込む"""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(MIGRATIONS_DIR, f'{name}.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def delete_user_memos(*user_ids):
+    """ユーザーのメモと集計を削除する（ページと検索の文書はON DELETE CASCADEで削除される）"""
+    db_session.query(Memo).filter(Memo.user_id.in_(user_ids)).delete(synchronize_session=False)
+    db_session.query(CategorySummary).filter(CategorySummary.user_id.in_(user_ids)).delete(synchronize_session=False)
+    db_session.commit()
+    db_session.remove()
+
+class TestMemoPreview(unittest.TestCase):
+    """contentの更新時にpreviewとcontent_lengthを設定することのテストクラス"""
+
+    def test_preview_follows_content(self):
+        """改行と連続する空白を1つにまとめたプレビューと文字数を設定することのテスト"""
+        memo = Memo(content='一行目\n\n  二行目\t三行目')
+        self.assertEqual(memo.preview, '一行目 二行目 三行目')
+        self.assertEqual(memo.content_length, len('一行目\n\n  二行目\t三行目'))
+
+        memo.content = 'あ' * (MEMO_PREVIEW_LENGTH + 50)
+        self.assertEqual(memo.preview, 'あ' * MEMO_PREVIEW_LENGTH)
+        self.assertEqual(memo.content_length, MEMO_PREVIEW_LENGTH + 50)
+
+        memo.content = None
+        self.assertEqual((memo.preview, memo.content_length), ('', 0))
+
+class TestMemoPreviewMigration(unittest.TestCase):
+    """既存のメモのプレビューを埋めるマイグレーションのテストクラス"""
+
+    @classmethod
+    def setUpClass(cls):
+        create_app()
+
+    def setUp(self):
+        delete_user_memos('migrated')
+        with engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO memos (title, content, main_category, sub_category, user_id, preview, content_length) "
+                "VALUES ('a', :long, '数学', NULL, 'migrated', '', 0), ('b', NULL, '数学', NULL, 'migrated', '', 0), "
+                "('c', '英単語\n一覧', NULL, NULL, 'migrated', '', 0)"
+            ), {'long': 'x' * 300})
+
+    def tearDown(self):
+        delete_user_memos('migrated')
+
+    def test_preview_backfill(self):
+        """既存のメモのプレビューと文字数を埋めることのテスト"""
+        load_migration('add_memo_preview').upgrade()
+        with engine.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT title, preview, content_length FROM memos WHERE user_id = 'migrated' ORDER BY title"
+            )).all()
+        self.assertEqual([tuple(row) for row in rows], [
+            ('a', 'x' * MEMO_PREVIEW_LENGTH, 300), ('b', '', 0), ('c', '英単語 一覧', 6)
+        ])
+
+@pytest.mark.usefixtures('firebase_user')
+class MemoApiTestCase(unittest.TestCase):
+    """
+    メモのエンドポイントのテストの基底クラス
+
+    memo-userとして認証し、テストの前後にmemo-userとmemo-otherのメモを削除します。
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app()
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.uid = 'memo-user'
+        delete_user_memos('memo-user', 'memo-other')
+
+    def tearDown(self):
+        delete_user_memos('memo-user', 'memo-other')
+
+    def call(self, method, path, etag=None, **kwargs):
+        headers = {'Authorization': 'Bearer test-token'}
+        if etag:
+            headers['If-None-Match'] = etag
+        return getattr(self.client, method)(f'/api/memo{path}', headers=headers, **kwargs)
+
+    def create_memo(self, **data):
+        response = self.call('post', '/memos', json=dict({'title': 'メモ', 'content': ''}, **data))
+        self.assertEqual(response.status_code, 201)
+        return response.get_json()['id']
+
+    def add_page(self, memo_id, content):
+        return self.call('post', f'/memos/{memo_id}/pages', json={'content': content})
+
+    def page_contents(self, memo_id):
+        response = self.call('get', f'/memos/{memo_id}/pages')
+        pages = response.get_json()
+        # ストリーミングのレスポンスは本文を読み終えてから閉じる
+        response.close()
+        return [(page['pageNumber'], page['content']) for page in pages]
+
+class TestMemoList(MemoApiTestCase):
+    """メモの一覧のテストクラス"""
+
+    def test_list_returns_preview_instead_of_content(self):
+        """一覧は本文の代わりにプレビューと文字数を返し、fieldsで絞り込めることのテスト"""
+        self.create_memo(content='本文' * 100)
+        memos = self.call('get', '/memos').get_json()
+        self.assertEqual(len(memos), 1)
+        self.assertEqual(set(memos[0]), set(MEMO_LIST_FIELDS))
+        self.assertEqual(memos[0]['preview'], ('本文' * 100)[:MEMO_PREVIEW_LENGTH])
+        self.assertEqual(memos[0]['contentLength'], 200)
+
+        memos = self.call('get', '/memos', query_string={'fields': 'id,title'}).get_json()
+        self.assertEqual(set(memos[0]), {'id', 'title'})
+
+class TestHealth(unittest.TestCase):
+    """ヘルスチェックのエンドポイントのテストクラス"""
+
+    def test_auth_health_reports_cache_counters(self):
+        """トークン検証のキャッシュのカウンタを返すことのテスト"""
+        response = create_app().test_client().get('/health/auth')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(set(data['token_cache']), {'enabled', 'size', 'max_size', 'hits', 'misses', 'evictions'})
+        # conftest.pyでCERT_STORE_ENABLEDをfalseにしている
+        self.assertIsNone(data['cert_store'])
@@ -0,0 +1,62 @@
+"""
+メモのカテゴリごとの件数のテストスクリプト
+"""
+
+import unittest
+
+from sqlalchemy import text
+
+from app import create_app
+from database import engine
+from models import CategorySummary
+from test_memo import MemoApiTestCase, delete_user_memos, load_migration
+
+class TestCategorySummaryMigration(unittest.TestCase):
+    """既存のメモをカテゴリごとに集計するマイグレーションのテストクラス"""
+
+    @classmethod
+    def setUpClass(cls):
+        create_app()
+
+    def setUp(self):
+        delete_user_memos('migrated')
+        with engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO memos (title, main_category, sub_category, user_id, preview, content_length) "
+                "VALUES ('a', '数学', NULL, 'migrated', '', 0), ('b', '数学', NULL, 'migrated', '', 0), "
+                "('c', NULL, NULL, 'migrated', '', 0)"
+            ))
+
+    def tearDown(self):
+        delete_user_memos('migrated')
+
+    def test_category_summary_backfill(self):
+        """既存のメモをカテゴリごとに集計することのテスト"""
+        CategorySummary.__table__.drop(engine)
+        load_migration('add_memo_category_summaries').upgrade()
+        with engine.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT main_category, sub_category, item_count FROM memo_category_summaries "
+                "WHERE user_id = 'migrated' ORDER BY main_category"
+            )).all()
+        self.assertEqual([tuple(row) for row in rows], [('', '', 1), ('数学', '', 2)])
+
+class TestMemoCategories(MemoApiTestCase):
+    """GET /api/memo/categoriesのテストクラス"""
+
+    def test_category_counts(self):
+        """作成・カテゴリの変更・削除でカテゴリごとの件数が更新されることのテスト"""
+        first = self.create_memo(main_category='数学', sub_category='微分')
+        second = self.create_memo(main_category='数学', sub_category='微分')
+        third = self.create_memo()
+
+        def counts():
+            return [(row['mainCategory'], row['subCategory'], row['count'])
+                    for row in self.call('get', '/categories').get_json()]
+
+        self.assertEqual(counts(), [(None, None, 1), ('数学', '微分', 2)])
+        self.call('put', f'/memos/{second}', json={'sub_category': '積分'})
+        self.assertEqual(counts(), [(None, None, 1), ('数学', '微分', 1), ('数学', '積分', 1)])
+        self.call('delete', f'/memos/{first}')
+        self.call('delete', f'/memos/{third}')
+        self.assertEqual(counts(), [('数学', '積分', 1)])
@@ -0,0 +1,31 @@
+"""
+メモAPIのレスポンスの圧縮のテストスクリプト
+"""
+
+import gzip
+import json
+
+from test_memo import MemoApiTestCase
+
+class TestMemoCompression(MemoApiTestCase):
+    """メモAPIのレスポンスの圧縮のテストクラス"""
+
+    def test_compressed_page_and_conditional_get(self):
+        """大きいページを圧縮して返し、そのETagで条件付き取得すると304を返すことのテスト"""
+        content = json.dumps({'objects': [{'type': 'path', 'x': i} for i in range(300)]})
+        memo_id = self.create_memo()
+        self.call('put', f'/memos/{memo_id}/pages/1', json={'content': content})
+
+        path = f'/api/memo/memos/{memo_id}/pages/1'
+        headers = {'Authorization': 'Bearer test-token', 'Accept-Encoding': 'gzip'}
+        response = self.client.get(path, headers=headers)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.data))['content'], content)
+        etag = response.headers['ETag']
+        self.assertTrue(etag.startswith('W/'))
+        # 圧縮しないレスポンスも同じ弱いETagを返す
+        self.assertEqual(self.call('get', f'/memos/{memo_id}/pages/1').headers['ETag'], etag)
+
+        response = self.client.get(path, headers=dict(headers, **{'If-None-Match': etag}))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
@@ -0,0 +1,38 @@
+"""
+メモページの本文の圧縮保存のテストスクリプト
+"""
+
+import json
+
+from sqlalchemy import text
+
+from content_codec import ZLIB_MARKER, is_encoded
+from database import engine
+from test_memo import MemoApiTestCase
+
+class TestMemoPageContent(MemoApiTestCase):
+    """メモページの本文を圧縮して保存し、展開して返すことのテストクラス"""
+
+    def stored_content(self, memo_id, page_number):
+        with engine.connect() as conn:
+            return conn.execute(text(
+                'SELECT content FROM memo_pages WHERE memo_id = :memo_id AND page_number = :page_number'
+            ), {'memo_id': memo_id, 'page_number': page_number}).scalar()
+
+    def test_large_content_stored_compressed(self):
+        """大きい本文は圧縮して保存し、取得時には元の本文を返すことのテスト"""
+        content = json.dumps({'objects': [{'type': 'path', 'x': i % 10} for i in range(500)]})
+        memo_id = self.create_memo()
+        self.call('put', f'/memos/{memo_id}/pages/1', json={'content': content})
+
+        self.assertTrue(self.stored_content(memo_id, 1).startswith(ZLIB_MARKER))
+        self.assertEqual(self.call('get', f'/memos/{memo_id}/pages/1').get_json()['content'], content)
+
+    def test_content_starting_with_marker(self):
+        """マーカーで始まる本文も保存した内容のまま返すことのテスト"""
+        memo_id = self.create_memo()
+        self.call('put', f'/memos/{memo_id}/pages/1', json={'content': ZLIB_MARKER + 'abc'})
+        self.add_page(memo_id, '\x1f')
+
+        self.assertTrue(is_encoded(self.stored_content(memo_id, 1)))
+        self.assertEqual(self.page_contents(memo_id), [(1, ZLIB_MARKER + 'abc'), (2, '\x1f')])
@@ -0,0 +1,21 @@
+"""
+メモの削除のテストスクリプト
+"""
+
+from database import db_session
+from models import MemoPage, SearchDocument
+from test_memo import MemoApiTestCase
+
+class TestMemoDelete(MemoApiTestCase):
+    """メモの削除のテストクラス"""
+
+    def test_delete_memo_cascades(self):
+        """メモの削除でページと検索の文書も削除されることのテスト"""
+        memo_id = self.create_memo(content='削除するメモ')
+        self.add_page(memo_id, '二枚目')
+        self.assertEqual(self.call('delete', f'/memos/{memo_id}').status_code, 204)
+
+        self.assertEqual(db_session.query(MemoPage).filter(MemoPage.memo_id == memo_id).count(), 0)
+        self.assertEqual(db_session.query(SearchDocument).filter(SearchDocument.memo_id == memo_id).count(), 0)
+        db_session.remove()
+        self.assertEqual(self.call('get', f'/memos/{memo_id}').status_code, 404)
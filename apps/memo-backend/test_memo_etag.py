@@ -0,0 +1,26 @@
+"""
+メモとメモページの条件付き取得（ETag）のテストスクリプト
+"""
+
+from test_memo import MemoApiTestCase
+
+class TestMemoEtag(MemoApiTestCase):
+    """メモとメモページのETagのテストクラス"""
+
+    def test_etags(self):
+        """メモとページのETagが一致する場合は304を返し、更新で変わることのテスト"""
+        memo_id = self.create_memo(content='最初')
+        etag = self.call('get', f'/memos/{memo_id}').headers['ETag']
+        self.assertEqual(self.call('get', f'/memos/{memo_id}', etag=etag).status_code, 304)
+        self.call('put', f'/memos/{memo_id}', json={'content': '更新'})
+        response = self.call('get', f'/memos/{memo_id}', etag=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+        etag = self.call('get', f'/memos/{memo_id}/pages/1').headers['ETag']
+        self.assertEqual(self.call('get', f'/memos/{memo_id}/pages/1', etag=etag).status_code, 304)
+        self.call('put', f'/memos/{memo_id}/pages/1', json={'content': '更新'})
+        self.assertEqual(self.call('get', f'/memos/{memo_id}/pages/1', etag=etag).status_code, 200)
+
+        self.uid = 'memo-other'
+        self.assertEqual(self.call('get', f'/memos/{memo_id}', etag=etag).status_code, 403)
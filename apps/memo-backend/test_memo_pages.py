@@ -0,0 +1,31 @@
+"""
+メモページの番号の割り当てと詰め直しのテストスクリプト
+"""
+
+from database import db_session
+from models import Memo
+from models.memo import MAX_MEMO_PAGES
+from test_memo import MemoApiTestCase
+
+class TestMemoPageNumbers(MemoApiTestCase):
+    """メモページのページ番号のテストクラス"""
+
+    def test_page_numbers_allocated_up_to_limit(self):
+        """ページ番号を順に割り当て、上限を超えるページは作成しないことのテスト"""
+        memo_id = self.create_memo()
+        numbers = [self.add_page(memo_id, str(n)).get_json()['pageNumber'] for n in range(2, MAX_MEMO_PAGES + 1)]
+        self.assertEqual(numbers, list(range(2, MAX_MEMO_PAGES + 1)))
+        self.assertEqual(self.add_page(memo_id, 'over').status_code, 400)
+        self.assertEqual(db_session.get(Memo, memo_id).page_count, MAX_MEMO_PAGES)
+        db_session.remove()
+
+    def test_delete_page_renumbers(self):
+        """ページの削除で後ろのページ番号を詰め、次のページ番号も戻ることのテスト"""
+        memo_id = self.create_memo()
+        self.call('put', f'/memos/{memo_id}/pages/1', json={'content': 'a'})
+        self.add_page(memo_id, 'b')
+        self.add_page(memo_id, 'c')
+
+        self.assertEqual(self.call('delete', f'/memos/{memo_id}/pages/2').status_code, 200)
+        self.assertEqual(self.page_contents(memo_id), [(1, 'a'), (2, 'c')])
+        self.assertEqual(self.add_page(memo_id, 'd').get_json()['pageNumber'], 3)
@@ -0,0 +1,28 @@
+"""
+メモの全文検索のテストスクリプト
+"""
+
+from test_memo import MemoApiTestCase
+
+class TestMemoSearch(MemoApiTestCase):
+    """GET /api/memo/searchのテストクラス"""
+
+    def test_search(self):
+        """メモとページを検索し、他のユーザーのメモは返さないことのテスト"""
+        memo_id = self.create_memo(title='微分積分の復習')
+        self.add_page(memo_id, 'テイラー展開')
+        self.uid = 'memo-other'
+        self.create_memo(title='微分積分')
+        self.uid = 'memo-user'
+
+        def hits(q):
+            response = self.call('get', '/search', query_string={'q': q})
+            self.assertEqual(response.status_code, 200)
+            return [(hit['memoId'], hit['pageNumber']) for hit in response.get_json()]
+
+        self.assertEqual(hits('微分'), [(memo_id, None)])
+        self.assertEqual(hits('展開'), [(memo_id, 2)])
+        self.call('put', f'/memos/{memo_id}/pages/2', json={'content': '級数'})
+        self.assertEqual(hits('展開'), [])
+        self.assertEqual(hits('級数'), [(memo_id, 2)])
+        self.assertEqual(self.call('get', '/search', query_string={'q': ' '}).status_code, 400)
@@ -1,6 +1,6 @@
 from flask import Flask, jsonify, request, make_response
 from flask_cors import CORS
-from database import init_db, get_db
+from database import init_db, get_db, get_pool_stats, router, init_session_lifecycle
 from models import Note
 import os
 from dotenv import load_dotenv
@@ -9,6 +9,11 @@ import logging
 import json
 from datetime import datetime
 from auth_middleware import require_auth
+from cert_store import cert_store
+from token_cache import token_cache
+from response_compression import ResponseCompressor
+from request_decompression import RequestDecompressor
+from json_provider import FastJSONProvider
 
 # Firebase Adminの初期化（インポートするだけで初期化される）
 import firebase_admin
@@ -40,6 +45,9 @@ def create_app():
             raise
 
     app = Flask(__name__)
+
+    # jsonifyとrequest.get_jsonをorjsonで処理する（インストールされていない場合は標準のjson）
+    app.json = FastJSONProvider(app)
     
     # デバッグモードを環境変数から設定
     app.debug = os.getenv('APP_DEBUG', 'false').lower() == 'true'
@@ -53,9 +61,9 @@ def create_app():
          resources={
              r"/api/*": {
                  "origins": allowed_origins_list,
-                 "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+                 "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
                  "allow_headers": ["Content-Type", "Authorization", "X-Requested-With", "*"],
-                 "expose_headers": ["Content-Type"],
+                 "expose_headers": ["Content-Type", "X-Next-Cursor", "ETag"],
                  "max_age": 600,
                  "supports_credentials": True
              }
@@ -67,8 +75,8 @@ def create_app():
         origin = request.headers.get('Origin')
         if origin and origin in allowed_origins_list:
             response.headers.add('Access-Control-Allow-Origin', origin)
-            response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,X-Requested-With')
-            response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+            response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,X-Requested-With,Content-Encoding')
+            response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,PATCH,POST,DELETE,OPTIONS')
         return response
 
     # ログ設定
@@ -92,6 +100,16 @@ def create_app():
     # データベースの初期化
     init_db()
 
+    # 書き込んだユーザーの読み取りを一定時間プライマリに固定する
+    router.init_app(app)
+
+    # リクエスト終了時にセッションを破棄し、閉じ忘れを記録する
+    init_session_lifecycle(app)
+
+    # トークン検証用の署名証明書を事前取得し、バックグラウンド更新を開始
+    if cert_store is not None:
+        cert_store.start()
+
     # ルートエンドポイント（動作確認用）
     @app.route('/')
     def index():
@@ -109,6 +127,41 @@ def create_app():
             "timestamp": datetime.now().isoformat()
         })
 
+    # コネクションプールの利用状況（ワーカー数とプールサイズの調整用）
+    @app.route('/health/db')
+    def db_pool_health():
+        return jsonify({
+            "status": "healthy",
+            "pool": get_pool_stats(),
+            "timestamp": datetime.now().isoformat()
+        })
+
+    # トークン検証のキャッシュと署名証明書の状態（キャッシュサイズとTTLの調整用）
+    @app.route('/health/auth')
+    def auth_health():
+        return jsonify({
+            "status": "healthy",
+            "token_cache": token_cache.stats(),
+            "cert_store": cert_store.stats() if cert_store is not None else None,
+            "timestamp": datetime.now().isoformat()
+        })
+
+    # 圧縮されたリクエストボディ（Content-Encoding: gzip/zstd）の展開
+    RequestDecompressor(app)
+
+    # レスポンスの圧縮（Accept-Encodingに応じてbrotli/gzip）
+    compressor = ResponseCompressor(app)
+
+    # エンドポイントごとのレスポンスの圧縮率
+    @app.route('/health/compression')
+    def compression_health():
+        return jsonify({
+            "status": "healthy",
+            "encodings": compressor.available_encodings(),
+            "endpoints": compressor.stats(),
+            "timestamp": datetime.now().isoformat()
+        })
+
     # Firebase認証状態チェック用エンドポイント
     @app.route('/api/auth/check', methods=['GET'])
     def auth_check():
@@ -2,6 +2,7 @@ from functools import wraps
 from flask import request, jsonify
 import logging
 from firebase_service import verify_firebase_token
+from token_cache import token_cache
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +23,30 @@ def extract_token_from_request():
     
     return parts[1]
 
+def verify_token_cached(token):
+    """
+    キャッシュを利用してトークンを検証する関数
+
+    検証済みのトークンはtoken_cacheから返し、キャッシュにない場合のみ
+    Firebaseで検証して結果をキャッシュに保存します。
+
+    Args:
+        token (str): Firebaseの認証トークン
+
+    Returns:
+        dict: デコードされたトークンの情報
+
+    Raises:
+        ValueError: トークンが無効な場合
+    """
+    decoded_token = token_cache.get(token)
+    if decoded_token is not None:
+        return decoded_token
+
+    decoded_token = verify_firebase_token(token)
+    token_cache.put(token, decoded_token)
+    return decoded_token
+
 def require_auth(f):
     """
     認証を必要とするエンドポイントのためのデコレータ
@@ -47,8 +72,8 @@ def require_auth(f):
             return jsonify({'error': '認証が必要です', 'code': 'auth/missing-token'}), 401
         
         try:
-            # トークンを検証
-            decoded_token = verify_firebase_token(token)
+            # トークンを検証（検証済みの場合はキャッシュから取得）
+            decoded_token = verify_token_cached(token)
             
             # トークンがリクエストに使用できるようにする
             request.firebase_token = decoded_token
@@ -0,0 +1,129 @@
+"""
+JSONプロバイダーのマイクロベンチマーク
+
+Flaskの標準のJSONプロバイダーとFastJSONProviderで、
+キャンバスデータを含むノートのレスポンスのエンコードとリクエストボディのデコードの時間を比較します。
+
+キャンバスデータはfabric.jsのtoJSON形式を模したもので、
+手書きのパス（座標の配列）とテキストのオブジェクトを含みます。
+
+使い方:
+    python benchmarks/json_provider_benchmark.py
+    python benchmarks/json_provider_benchmark.py --pages 50 --objects 300 --repeat 20
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+# アプリケーションのモジュールをインポートするためにパスを追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+import json_provider
+from json_provider import FastJSONProvider
+
+def make_canvas(objects, rng):
+    """
+    キャンバスデータを作成する
+
+    Args:
+        objects (int): オブジェクトの数
+        rng (Random): 乱数生成器
+
+    Returns:
+        dict: fabric.jsのtoJSON形式のキャンバスデータ
+    """
+    items = []
+    for i in range(objects):
+        if i % 10 == 0:
+            items.append({
+                'type': 'textbox', 'id': f'obj-{i}', 'left': rng.uniform(0, 800), 'top': rng.uniform(0, 1100),
+                'text': '手書きのメモ ' * rng.randint(1, 5), 'fontSize': 16, 'fill': '#333333',
+            })
+            continue
+        x, y = rng.uniform(0, 800), rng.uniform(0, 1100)
+        path = [['M', x, y]]
+        for _ in range(rng.randint(20, 60)):
+            x, y = x + rng.uniform(-5, 5), y + rng.uniform(-5, 5)
+            path.append(['Q', x, y, x + rng.uniform(-2, 2), y + rng.uniform(-2, 2)])
+        items.append({
+            'type': 'path', 'id': f'obj-{i}', 'stroke': '#000000', 'strokeWidth': 2,
+            'fill': None, 'strokeLineCap': 'round', 'path': path,
+        })
+    return {'version': '5.3.0', 'objects': items, 'background': '#ffffff'}
+
+def make_note(pages, objects, seed=0):
+    """
+    ページを含むノートのレスポンスを作成する（本文は保存時と同じJSON文字列）
+
+    Args:
+        pages (int): ページ数
+        objects (int): 1ページあたりのオブジェクトの数
+        seed (int): 乱数のシード
+
+    Returns:
+        dict: get_noteのレスポンスと同じ形のデータ
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    return {
+        'id': 1, 'title': 'ベンチマーク', 'main_category': 'その他', 'sub_category': '',
+        'created_at': now, 'updated_at': now, 'user_id': 'benchmark', 'version': 1, 'page_count': pages,
+        'pages': [{
+            'id': number, 'page_number': number, 'version': 1,
+            'layout_settings': {'grid': True, 'paper': 'A4', 'margin': [20, 20, 20, 20]},
+            'content': json.dumps(make_canvas(objects, rng), ensure_ascii=False),
+        } for number in range(1, pages + 1)],
+    }
+
+def measure(func, repeat):
+    """
+    関数の実行時間の中央値をミリ秒で返す
+
+    Args:
+        func (callable): 計測する関数
+        repeat (int): 実行回数
+
+    Returns:
+        float: 中央値（ミリ秒）
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return times[len(times) // 2]
+
+def main():
+    parser = argparse.ArgumentParser(description='JSONプロバイダーのマイクロベンチマーク')
+    parser.add_argument('--pages', type=int, default=20, help='ノートのページ数')
+    parser.add_argument('--objects', type=int, default=200, help='1ページあたりのオブジェクトの数')
+    parser.add_argument('--repeat', type=int, default=30, help='計測の回数')
+    args = parser.parse_args()
+
+    note = make_note(args.pages, args.objects)
+    # PUT /notes/<id>/pages/<n>のリクエストボディ
+    body = json.dumps({'content': note['pages'][0]['content'], 'layout_settings': {}}).encode('utf-8')
+
+    app = Flask(__name__)
+    providers = [('Flask標準', DefaultJSONProvider(app)), ('FastJSONProvider', FastJSONProvider(app))]
+    if json_provider.orjson is None:
+        print('orjsonがインストールされていないため、FastJSONProviderは標準のjsonで計測します')
+
+    print(f'ページ数={args.pages}, オブジェクト数={args.objects}, 計測回数={args.repeat}')
+    with app.app_context():
+        for name, provider in providers:
+            size = len(provider.response(note).get_data())
+            encode = measure(lambda: provider.response(note), args.repeat)
+            decode = measure(lambda: provider.loads(body), args.repeat)
+            print(f'{name:<18} レスポンス {size / 1024:9.1f}KB  エンコード {encode:8.2f}ms  '
+                  f'リクエストのデコード {decode:7.3f}ms')
+
+if __name__ == '__main__':
+    main()
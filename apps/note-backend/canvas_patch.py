@@ -0,0 +1,196 @@
+"""
+ページのキャンバスデータへの差分の適用
+
+PATCHリクエストで送られた差分をキャンバスのJSON（fabric.jsのtoJSON形式）に適用します。
+差分は次のどちらかの形式で指定します。
+
+- キャンバス操作のリスト:
+    {"op": "append_objects", "objects": [...]}   objectsの末尾に追加
+    {"op": "remove_objects", "ids": [...]}       idが一致するオブジェクトを削除
+- RFC 6902 JSON Patch:
+    add, remove, replace, move, copy, test
+"""
+import copy
+import json
+
+class PatchError(Exception):
+    """差分を適用できない場合の例外クラス"""
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def load_canvas(content):
+    """
+    保存されているページの本文をキャンバスのJSONとして読み込む関数
+
+    空のページは空のキャンバスとして扱います。
+
+    Args:
+        content (str): ページの本文
+
+    Returns:
+        dict: キャンバスのJSON
+    """
+    if not content:
+        return {'objects': []}
+    try:
+        return json.loads(content)
+    except ValueError:
+        raise PatchError('ページの内容がJSONではないため差分を適用できません', 409)
+
+def _objects(document):
+    if not isinstance(document, dict):
+        raise PatchError('キャンバスの形式が不正です')
+    objects = document.setdefault('objects', [])
+    if not isinstance(objects, list):
+        raise PatchError('キャンバスのobjectsが配列ではありません')
+    return objects
+
+def apply_canvas_operations(document, operations):
+    """
+    キャンバス操作のリストを適用する関数
+
+    Args:
+        document (dict): キャンバスのJSON
+        operations (list): キャンバス操作のリスト
+
+    Returns:
+        dict: 適用後のキャンバスのJSON
+    """
+    document = copy.deepcopy(document)
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise PatchError('操作の形式が不正です')
+        op = operation.get('op')
+        if op == 'append_objects':
+            new_objects = operation.get('objects')
+            if not isinstance(new_objects, list):
+                raise PatchError('append_objectsにはobjectsの配列が必要です')
+            _objects(document).extend(new_objects)
+        elif op == 'remove_objects':
+            ids = operation.get('ids')
+            if not isinstance(ids, list):
+                raise PatchError('remove_objectsにはidsの配列が必要です')
+            removed = set(ids)
+            document['objects'] = [
+                obj for obj in _objects(document)
+                if not (isinstance(obj, dict) and obj.get('id') in removed)
+            ]
+        else:
+            raise PatchError(f'不明な操作です: {op}')
+    return document
+
+def _parse_pointer(pointer):
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith('/')):
+        raise PatchError(f'JSON Pointerの形式が不正です: {pointer}')
+    if pointer == '':
+        return []
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+def _array_index(container, token, allow_end=False):
+    if allow_end and token == '-':
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith('0')):
+        raise PatchError(f'配列のインデックスが不正です: {token}')
+    index = int(token)
+    limit = len(container) if allow_end else len(container) - 1
+    if index > limit:
+        raise PatchError(f'配列のインデックスが範囲外です: {token}')
+    return index
+
+def _resolve_parent(document, tokens):
+    parent = document
+    for token in tokens[:-1]:
+        if isinstance(parent, list):
+            parent = parent[_array_index(parent, token)]
+        elif isinstance(parent, dict) and token in parent:
+            parent = parent[token]
+        else:
+            raise PatchError(f'パスが存在しません: /{"/".join(tokens)}')
+    return parent
+
+def _get(document, tokens):
+    if not tokens:
+        return document
+    parent = _resolve_parent(document, tokens)
+    key = tokens[-1]
+    if isinstance(parent, list):
+        return parent[_array_index(parent, key)]
+    if isinstance(parent, dict) and key in parent:
+        return parent[key]
+    raise PatchError(f'パスが存在しません: /{"/".join(tokens)}')
+
+def _add(document, tokens, value):
+    if not tokens:
+        return value
+    parent = _resolve_parent(document, tokens)
+    key = tokens[-1]
+    if isinstance(parent, list):
+        parent.insert(_array_index(parent, key, allow_end=True), value)
+    elif isinstance(parent, dict):
+        parent[key] = value
+    else:
+        raise PatchError(f'値を追加できないパスです: /{"/".join(tokens)}')
+    return document
+
+def _remove(document, tokens):
+    if not tokens:
+        raise PatchError('ドキュメント全体は削除できません')
+    parent = _resolve_parent(document, tokens)
+    key = tokens[-1]
+    if isinstance(parent, list):
+        return parent.pop(_array_index(parent, key))
+    if isinstance(parent, dict) and key in parent:
+        return parent.pop(key)
+    raise PatchError(f'パスが存在しません: /{"/".join(tokens)}')
+
+def apply_json_patch(document, patch):
+    """
+    RFC 6902 JSON Patchを適用する関数
+
+    いずれかの操作が失敗した場合は何も適用しません。
+    test操作が一致しない場合は409として扱います。
+
+    Args:
+        document (dict): キャンバスのJSON
+        patch (list): JSON Patchの操作のリスト
+
+    Returns:
+        dict: 適用後のキャンバスのJSON
+    """
+    if not isinstance(patch, list):
+        raise PatchError('JSON Patchは配列で指定してください')
+    document = copy.deepcopy(document)
+    for operation in patch:
+        if not isinstance(operation, dict) or 'path' not in operation:
+            raise PatchError('JSON Patchの操作の形式が不正です')
+        op = operation.get('op')
+        tokens = _parse_pointer(operation['path'])
+        if op in ('add', 'replace', 'test') and 'value' not in operation:
+            raise PatchError(f'{op}操作にはvalueが必要です')
+
+        if op == 'add':
+            document = _add(document, tokens, copy.deepcopy(operation['value']))
+        elif op == 'remove':
+            _remove(document, tokens)
+        elif op == 'replace':
+            if not tokens:
+                document = copy.deepcopy(operation['value'])
+                continue
+            _remove(document, tokens)
+            document = _add(document, tokens, copy.deepcopy(operation['value']))
+        elif op in ('move', 'copy'):
+            from_tokens = _parse_pointer(operation.get('from'))
+            if op == 'move':
+                if tokens[:len(from_tokens)] == from_tokens and tokens != from_tokens:
+                    raise PatchError('自身の子孫には移動できません')
+                value = _remove(document, from_tokens)
+            else:
+                value = copy.deepcopy(_get(document, from_tokens))
+            document = _add(document, tokens, value)
+        elif op == 'test':
+            if _get(document, tokens) != operation['value']:
+                raise PatchError(f'test操作が一致しません: {operation["path"]}', 409)
+        else:
+            raise PatchError(f'不明なJSON Patchの操作です: {op}')
+    return document
@@ -0,0 +1,126 @@
+"""
+カテゴリごとの件数の集計テーブルの更新
+
+ノート（メモ）の作成・更新・削除と同じトランザクションで、ユーザー・メインカテゴリ・
+サブカテゴリごとの件数と最終更新日時を増減します。サイドバーのカテゴリ一覧は
+一覧を読まずに集計テーブルへの1回のSELECTで作成できます。
+
+集計テーブルの列:
+    user_id, main_category, sub_category: 複合主キー（カテゴリ未設定は空文字で保存）
+    item_count: 件数（0になった行は削除）
+    last_updated_at: カテゴリ内で最後に作成・更新した日時（削除では戻さない）
+"""
+from collections import Counter
+from sqlalchemy import and_, bindparam, delete, or_, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+# ON CONFLICTを使うためのデータベースごとのINSERT
+_INSERTS = {'postgresql': postgresql_insert, 'sqlite': sqlite_insert}
+
+def category_key(main_category, sub_category):
+    """
+    集計テーブルのカテゴリのキーを返す関数
+
+    Args:
+        main_category (str): メインカテゴリ（未設定はNone）
+        sub_category (str): サブカテゴリ（未設定はNone）
+
+    Returns:
+        tuple: (メインカテゴリ, サブカテゴリ)。未設定は空文字
+    """
+    return (main_category or '', sub_category or '')
+
+def add_to_category(session, table, user_id, main_category, sub_category, updated_at):
+    """
+    カテゴリの件数を1増やし、最終更新日時を更新する関数
+
+    行がない場合はINSERT ... ON CONFLICTで作成するため、同時に作成しても件数は失われません。
+    コミットは呼び出し側で行います。
+
+    Args:
+        session: 使用するセッション
+        table (Table): 集計テーブル
+        user_id (str): 所有者のユーザーID
+        main_category (str): メインカテゴリ
+        sub_category (str): サブカテゴリ
+        updated_at (datetime): 作成・更新した日時
+    """
+    main_category, sub_category = category_key(main_category, sub_category)
+    insert = _INSERTS[session.get_bind().dialect.name]
+    statement = insert(table).values(
+        user_id=user_id, main_category=main_category, sub_category=sub_category,
+        item_count=1, last_updated_at=updated_at
+    )
+    session.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.main_category, table.c.sub_category],
+        set_={'item_count': table.c.item_count + 1, 'last_updated_at': statement.excluded.last_updated_at}
+    ))
+
+def touch_category(session, table, user_id, main_category, sub_category, updated_at):
+    """
+    カテゴリの最終更新日時だけを更新する関数（カテゴリを変えずに更新した場合）
+
+    Args:
+        session: 使用するセッション
+        table (Table): 集計テーブル
+        user_id (str): 所有者のユーザーID
+        main_category (str): メインカテゴリ
+        sub_category (str): サブカテゴリ
+        updated_at (datetime): 更新した日時
+    """
+    main_category, sub_category = category_key(main_category, sub_category)
+    session.execute(update(table).where(
+        table.c.user_id == user_id,
+        table.c.main_category == main_category,
+        table.c.sub_category == sub_category
+    ).values(last_updated_at=updated_at))
+
+def remove_from_categories(session, table, user_id, categories):
+    """
+    削除した件数をカテゴリごとに減らし、0件になったカテゴリの行を削除する関数
+
+    カテゴリごとの減算は1つのUPDATE文（executemany）で行います。
+
+    Args:
+        session: 使用するセッション
+        table (Table): 集計テーブル
+        user_id (str): 所有者のユーザーID
+        categories (iterable): 削除した各行の(メインカテゴリ, サブカテゴリ)
+    """
+    counts = Counter(category_key(main_category, sub_category) for main_category, sub_category in categories)
+    if not counts:
+        return
+    # 同時に更新するトランザクションとのデッドロックを避けるため、キーの順に更新する
+    session.execute(update(table).where(
+        table.c.user_id == bindparam('owner'),
+        table.c.main_category == bindparam('main'),
+        table.c.sub_category == bindparam('sub')
+    ).values(item_count=table.c.item_count - bindparam('removed')), [
+        {'owner': user_id, 'main': main_category, 'sub': sub_category, 'removed': removed}
+        for (main_category, sub_category), removed in sorted(counts.items())
+    ])
+    session.execute(delete(table).where(
+        table.c.user_id == user_id,
+        table.c.item_count <= 0,
+        or_(*(and_(table.c.main_category == main_category, table.c.sub_category == sub_category)
+              for main_category, sub_category in counts))
+    ))
+
+def move_category(session, table, user_id, old, new, updated_at):
+    """
+    更新前後のカテゴリに合わせて件数と最終更新日時を更新する関数
+
+    Args:
+        session: 使用するセッション
+        table (Table): 集計テーブル
+        user_id (str): 所有者のユーザーID
+        old (tuple): 更新前の(メインカテゴリ, サブカテゴリ)
+        new (tuple): 更新後の(メインカテゴリ, サブカテゴリ)
+        updated_at (datetime): 更新した日時
+    """
+    if category_key(*old) == category_key(*new):
+        touch_category(session, table, user_id, *new, updated_at)
+        return
+    remove_from_categories(session, table, user_id, [old])
+    add_to_category(session, table, user_id, *new, updated_at)
@@ -0,0 +1,366 @@
+"""
+Firebase IDトークン検証用の署名証明書ストア
+
+Googleの公開証明書を起動時に事前取得し、有効期限前にバックグラウンドで
+更新します。取得した証明書はローカルファイル経由でgunicornの各ワーカーと
+共有し、更新中や更新失敗時は直前の証明書を返し続けます。
+
+共有ファイルの証明書はトークンの検証に使うため、ファイルは明示的に指定した場合だけ使い、
+自分のユーザーが所有し他のユーザーが読み書きできない（0600）ファイルだけを信頼します。
+ファイルの有効期限は更新日時からCache-Controlのmax-age（最大MAX_CERT_AGE秒）までに制限します。
+"""
+import fcntl
+import json
+import logging
+import os
+import re
+import threading
+import time
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+# Firebase IDトークンの署名証明書のエンドポイント
+FIREBASE_CERTS_URL = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+
+# Firebase IDトークンの発行者のプレフィックス
+FIREBASE_ISSUER_PREFIX = 'https://securetoken.google.com/'
+
+# Cache-Controlにmax-ageがない場合の有効期間（秒）
+DEFAULT_CERT_AGE = 3600
+
+# 証明書を有効とみなす最大の期間（秒）
+MAX_CERT_AGE = 24 * 60 * 60
+
+class _CertResponse:
+    """google.auth.transport.Responseと互換のレスポンス"""
+
+    def __init__(self, data):
+        self.status = 200
+        self.headers = {'content-type': 'application/json'}
+        self.data = data
+
+class CertificateStore:
+    """
+    @docs
+    署名証明書を保持し、期限前に更新するストア
+
+    Attributes:
+        cert_url (str): 証明書のエンドポイント
+        cache_file (str): ワーカー間で共有する証明書ファイルのパス（Noneで共有しない）
+        refresh_margin (int): 有効期限の何秒前に更新するか
+        retry_interval (int): 更新失敗時や強制更新の最小間隔（秒）
+        timeout (int): 証明書取得のタイムアウト（秒）
+        max_cert_age (int): max-ageに関係なく証明書を有効とみなす最大の期間（秒）
+    """
+
+    def __init__(self, cert_url=FIREBASE_CERTS_URL, cache_file=None, refresh_margin=300,
+                 retry_interval=30, timeout=10, clock=time.time, max_cert_age=MAX_CERT_AGE):
+        self.cert_url = cert_url
+        self.cache_file = cache_file
+        self.refresh_margin = refresh_margin
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        self.max_cert_age = max_cert_age
+        self._clock = clock
+        self._certs = None
+        self._expires_at = 0.0
+        self._last_attempt = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        self.fetch_count = 0
+
+    def start(self):
+        """
+        証明書を事前取得し、バックグラウンド更新スレッドを開始する
+
+        事前取得に失敗してもスレッドは開始し、再試行を続けます。
+        """
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"署名証明書の事前取得に失敗しました: {str(e)}")
+        self._ensure_thread()
+
+    def stop(self):
+        """バックグラウンド更新スレッドを停止する"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.timeout)
+        self._thread = None
+
+    def get_certs(self):
+        """
+        現在の証明書を取得する
+
+        証明書が期限切れ間近の場合は更新をバックグラウンドに任せ、
+        手元の証明書をそのまま返します。証明書を一度も取得できていない
+        場合のみ同期的に取得します。
+
+        Returns:
+            dict: キーIDとX.509証明書の対応
+        """
+        with self._lock:
+            certs = self._certs
+            expires_at = self._expires_at
+
+        if certs is None:
+            return self.refresh()
+
+        if self._clock() >= expires_at - self.refresh_margin:
+            self._ensure_thread()
+        return certs
+
+    def refresh(self, force=False):
+        """
+        証明書を更新する
+
+        同時に複数のスレッドから呼ばれても取得は1回だけ行います。
+        共有ファイルに有効な証明書があればエンドポイントには問い合わせません。
+
+        Args:
+            force (bool): Trueの場合は有効期限内でもエンドポイントから取得する
+
+        Returns:
+            dict: 更新後の証明書
+        """
+        with self._refresh_lock:
+            now = self._clock()
+            if force and now - self._last_attempt < self.retry_interval:
+                force = False
+            if not force and self._certs is not None and now < self._expires_at - self.refresh_margin:
+                return self._certs
+
+            if not force:
+                shared = self._read_cache_file()
+                if shared is not None and now < shared[1] - self.refresh_margin:
+                    self._set(*shared)
+                    return shared[0]
+
+            self._last_attempt = now
+            with self._file_lock():
+                # 他のワーカーがロック待ちの間に更新した場合はそれを使う
+                shared = None if force else self._read_cache_file()
+                if shared is not None and now < shared[1] - self.refresh_margin:
+                    certs, expires_at = shared
+                else:
+                    certs, expires_at = self._fetch()
+                    self._write_cache_file(certs, expires_at)
+
+            self._set(certs, expires_at)
+            return certs
+
+    def transport_request(self):
+        """
+        google.auth.transport.Requestとして使える呼び出し可能オブジェクトを返す
+
+        証明書エンドポイントへのリクエストにはストアの証明書を返します。
+
+        Returns:
+            callable: リクエスト関数
+        """
+        def request(url, method='GET', body=None, headers=None, timeout=None, **kwargs):
+            if url != self.cert_url or method != 'GET':
+                raise ValueError(f"証明書ストアで扱えないリクエストです: {method} {url}")
+            return _CertResponse(json.dumps(self.get_certs()).encode('utf-8'))
+        return request
+
+    def verify_id_token(self, id_token, project_id, clock_skew_seconds=0):
+        """
+        ストアの証明書でFirebase IDトークンを検証する関数
+
+        トークンのキーIDが手元の証明書にない場合（証明書のローテーション直後）は
+        一度だけ強制更新して再検証します。
+
+        Args:
+            id_token (str): Firebaseの認証トークン
+            project_id (str): FirebaseプロジェクトID
+            clock_skew_seconds (int): 許容する時刻のずれ（秒）
+
+        Returns:
+            dict: デコードされたトークンの情報
+
+        Raises:
+            ValueError: トークンが無効な場合
+        """
+        from google.oauth2 import id_token as google_id_token
+
+        def verify():
+            return google_id_token.verify_token(
+                id_token,
+                request=self.transport_request(),
+                audience=project_id,
+                certs_url=self.cert_url,
+                clock_skew_in_seconds=clock_skew_seconds
+            )
+
+        try:
+            claims = verify()
+        except ValueError as e:
+            if 'Certificate for key id' not in str(e):
+                raise
+            self.refresh(force=True)
+            claims = verify()
+
+        if claims.get('iss') != FIREBASE_ISSUER_PREFIX + project_id:
+            raise ValueError(f"発行者(iss)が正しくありません: {claims.get('iss')}")
+        subject = claims.get('sub')
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise ValueError("サブジェクト(sub)が正しくありません")
+
+        claims['uid'] = subject
+        return claims
+
+    def stats(self):
+        """
+        ストアの状態を取得する
+
+        Returns:
+            dict: 証明書数、有効期限、取得回数
+        """
+        with self._lock:
+            return {
+                'cert_count': len(self._certs or {}),
+                'expires_at': self._expires_at,
+                'fetch_count': self.fetch_count
+            }
+
+    def _set(self, certs, expires_at):
+        with self._lock:
+            self._certs = certs
+            self._expires_at = expires_at
+
+    def _fetch(self):
+        logger.info(f"署名証明書を取得します: {self.cert_url}")
+        with urllib.request.urlopen(self.cert_url, timeout=self.timeout) as response:
+            body = response.read()
+            cache_control = response.headers.get('Cache-Control', '')
+        self.fetch_count += 1
+
+        certs = json.loads(body.decode('utf-8'))
+        if not _valid_certs(certs):
+            raise ValueError("署名証明書の形式が正しくありません")
+        match = re.search(r'max-age=(\d+)', cache_control)
+        max_age = min(int(match.group(1)) if match else DEFAULT_CERT_AGE, self.max_cert_age)
+        return certs, self._clock() + max_age
+
+    def _read_cache_file(self):
+        if not self.cache_file:
+            return None
+        try:
+            fd = os.open(self.cache_file, os.O_RDONLY | getattr(os, 'O_NOFOLLOW', 0))
+        except OSError:
+            return None
+        try:
+            with os.fdopen(fd, 'r') as f:
+                info = os.fstat(f.fileno())
+                # 他のユーザーが作成・変更できるファイルの証明書は信頼しない
+                if info.st_uid != os.geteuid() or info.st_mode & 0o077:
+                    logger.warning(f"署名証明書ファイルの所有者または権限が正しくないため使用しません: {self.cache_file}")
+                    return None
+                data = json.load(f)
+            certs = data['certs']
+            max_age = min(float(data['max_age']), self.max_cert_age)
+            expires_at = min(float(data['expires_at']), info.st_mtime + max_age)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if not _valid_certs(certs):
+            logger.warning(f"署名証明書ファイルの形式が正しくないため使用しません: {self.cache_file}")
+            return None
+        return certs, expires_at
+
+    def _write_cache_file(self, certs, expires_at):
+        if not self.cache_file:
+            return
+        temp_path = f"{self.cache_file}.{os.getpid()}.tmp"
+        try:
+            if os.path.lexists(temp_path):
+                os.unlink(temp_path)
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'certs': certs, 'expires_at': expires_at,
+                           'max_age': max(expires_at - self._clock(), 0)}, f)
+            os.replace(temp_path, self.cache_file)
+        except OSError as e:
+            logger.warning(f"署名証明書ファイルの書き込みに失敗しました: {str(e)}")
+
+    def _file_lock(self):
+        return _FileLock(f"{self.cache_file}.lock" if self.cache_file else None)
+
+    def _ensure_thread(self):
+        # fork後の子プロセスには親のスレッドが引き継がれないため、PIDで判定する
+        if self._thread is not None and self._thread.is_alive() and self._thread_pid == os.getpid():
+            return
+        self._stop_event.clear()
+        self._thread_pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='cert-store-refresh', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            with self._lock:
+                wait = self._expires_at - self.refresh_margin - self._clock()
+            if wait > 0:
+                self._stop_event.wait(wait)
+                continue
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"署名証明書の更新に失敗しました: {str(e)}")
+            self._stop_event.wait(self.retry_interval)
+
+def _valid_certs(certs):
+    # キーIDとPEM形式の証明書の対応であること
+    return isinstance(certs, dict) and bool(certs) and all(
+        isinstance(kid, str) and isinstance(cert, str) and cert.startswith('-----BEGIN CERTIFICATE-----')
+        for kid, cert in certs.items()
+    )
+
+class _FileLock:
+    """ワーカー間で証明書の取得を1回にするためのファイルロック"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        if self.path:
+            self._file = os.fdopen(os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600), 'a')
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+def create_cert_store_from_env():
+    """
+    環境変数の設定からCertificateStoreを作成する関数
+
+    CERT_STORE_ENABLED: 'false'でストアを使わずfirebase_adminで検証（デフォルト: true）
+    CERT_STORE_URL: 証明書のエンドポイント
+    CERT_STORE_CACHE_FILE: ワーカー間で共有する証明書ファイル（デフォルト: 共有しない）。
+        アプリ専用のディレクトリを指定してください（ファイルは0600で作成します）
+    CERT_STORE_REFRESH_MARGIN: 有効期限の何秒前に更新するか（デフォルト: 300）
+
+    Returns:
+        CertificateStore: 設定済みのストア、無効化されている場合はNone
+    """
+    if os.getenv('CERT_STORE_ENABLED', 'true').lower() != 'true':
+        return None
+    # エミュレータのトークンは署名されていないため、ストアは使わない
+    if os.getenv('FIREBASE_AUTH_EMULATOR_HOST'):
+        return None
+    return CertificateStore(
+        cert_url=os.getenv('CERT_STORE_URL', FIREBASE_CERTS_URL),
+        cache_file=os.getenv('CERT_STORE_CACHE_FILE') or None,
+        refresh_margin=int(os.getenv('CERT_STORE_REFRESH_MARGIN', '300'))
+    )
+
+# アプリケーション全体で共有するストア
+cert_store = create_cert_store_from_env()
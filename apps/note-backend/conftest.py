@@ -0,0 +1,41 @@
+"""
+テスト共通の設定
+
+テスト対象のモジュールはインポート時にデータベースに接続するため、テストモジュールの
+読み込み前（このファイルの読み込み時）に、環境変数に関係なく一時ディレクトリのSQLiteを
+使うように設定します。開発・本番のDATABASE_URLやリードレプリカにテストが書き込むことはありません。
+"""
+
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import pytest
+
+TEST_DB_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(TEST_DB_DIR, 'test_notes.db')}"
+os.environ['DATABASE_READ_URLS'] = ''
+
+# firebase_userでテストクラスにuidがない場合のユーザーID
+DEFAULT_TEST_UID = 'test-user'
+
+def pytest_unconfigure(config):
+    shutil.rmtree(TEST_DB_DIR, ignore_errors=True)
+
+@pytest.fixture
+def firebase_user(request):
+    """
+    Firebaseのトークン検証をモックに置き換えるフィクスチャ
+
+    テストクラスのuid属性のユーザーとして認証します。テストの途中でself.uidを
+    変更すると、以降のリクエストは別のユーザーとして扱われます。
+
+    Returns:
+        Mock: verify_token_cachedのモック
+    """
+    def verify(token):
+        return {'uid': getattr(request.instance, 'uid', DEFAULT_TEST_UID)}
+
+    with mock.patch('auth_middleware.verify_token_cached', side_effect=verify) as verify_mock:
+        yield verify_mock
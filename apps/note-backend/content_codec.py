@@ -0,0 +1,118 @@
+"""
+ページ本文の保存用コーデック
+
+キャンバスのJSONは繰り返しが多く大きいため、保存時に圧縮し、
+読み込み時に展開するカラム型を提供します。圧縮した値には
+コーデックを示すマーカーを先頭に付けるため、圧縮前に保存された
+既存の行もそのまま読み込めます。
+
+保存形式（Textカラムに保存）:
+    '\\x1fzlib:' + base64(zlib圧縮したUTF-8)
+    '\\x1fraw:' + 本文（マーカーの文字で始まる本文を圧縮せずに保存する場合）
+    マーカーのない値は圧縮されていない本文としてそのまま扱う
+
+クライアントから送られた本文がマーカーで始まっていても、圧縮するか
+'\\x1fraw:'を付けて保存するため、読み込み時に別の形式と取り違えません。
+"""
+import base64
+import os
+import zlib
+from sqlalchemy.types import Text, TypeDecorator
+
+# 圧縮した値の先頭に付けるマーカー（本文に現れない制御文字で始める）
+MARKER_PREFIX = '\x1f'
+ZLIB_MARKER = MARKER_PREFIX + 'zlib:'
+# マーカーの文字で始まる本文を圧縮せずに保存するときに付けるマーカー
+RAW_MARKER = MARKER_PREFIX + 'raw:'
+
+def _load_codec_config():
+    """
+    環境変数からコーデックの設定を読み込む関数
+
+    CONTENT_COMPRESSION: 'zlib'で圧縮する、'none'で圧縮しない（デフォルト: zlib）
+    CONTENT_COMPRESSION_LEVEL: zlibの圧縮レベル1〜9（デフォルト: 6）
+    CONTENT_COMPRESSION_MIN_BYTES: これより小さい本文は圧縮しない（デフォルト: 1024）
+    """
+    return {
+        'codec': os.getenv('CONTENT_COMPRESSION', 'zlib').lower(),
+        'level': int(os.getenv('CONTENT_COMPRESSION_LEVEL', '6')),
+        'min_bytes': int(os.getenv('CONTENT_COMPRESSION_MIN_BYTES', '1024')),
+    }
+
+codec_config = _load_codec_config()
+
+def is_encoded(value):
+    """
+    値が保存用の形式に変換済みかどうかを判定する関数
+
+    既存の行を変換するマイグレーションで、変換済みの行を読み飛ばすために使います。
+    クライアントから受け取った本文の判定には使わないでください。
+
+    Args:
+        value (str): 保存されている値
+
+    Returns:
+        bool: 圧縮された形式またはマーカーを付けた形式の場合はTrue
+    """
+    return isinstance(value, str) and value.startswith((ZLIB_MARKER, RAW_MARKER))
+
+def encode_content(value, config=None):
+    """
+    本文を保存用の形式に変換する関数
+
+    圧縮が無効な場合、本文が小さい場合、圧縮しても小さくならない場合は
+    そのまま返します。本文がマーカーの文字で始まる場合は、圧縮しないときに
+    RAW_MARKERを付けて返します（変換済みの値として読み飛ばすことはしません）。
+
+    Args:
+        value (str): 本文
+        config (dict): コーデックの設定（省略時は環境変数の設定）
+
+    Returns:
+        str: 保存用の値
+    """
+    config = config or codec_config
+    if value is None:
+        return value
+    plain = RAW_MARKER + value if value.startswith(MARKER_PREFIX) else value
+    if config['codec'] != 'zlib':
+        return plain
+    raw = value.encode('utf-8')
+    if len(raw) < config['min_bytes']:
+        return plain
+    encoded = ZLIB_MARKER + base64.b64encode(zlib.compress(raw, config['level'])).decode('ascii')
+    return encoded if len(encoded) < len(plain) else plain
+
+def decode_content(value):
+    """
+    保存されている値を本文に戻す関数
+
+    Args:
+        value (str): 保存されている値
+
+    Returns:
+        str: 本文
+    """
+    if not isinstance(value, str):
+        return value
+    if value.startswith(ZLIB_MARKER):
+        return zlib.decompress(base64.b64decode(value[len(ZLIB_MARKER):])).decode('utf-8')
+    if value.startswith(RAW_MARKER):
+        return value[len(RAW_MARKER):]
+    return value
+
+class CompressedText(TypeDecorator):
+    """
+    @docs
+    保存時に圧縮し、読み込み時に展開するTextカラム型
+
+    データベース上の型はTextのままなので、カラムの型変更は不要です。
+    """
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return encode_content(value)
+
+    def process_result_value(self, value, dialect):
+        return decode_content(value)
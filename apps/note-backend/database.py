@@ -1,6 +1,11 @@
-from sqlalchemy import create_engine
+from collections import Counter
+import threading
+from flask import g, request
 from sqlalchemy.orm import sessionmaker, scoped_session
 from models import Base
+from logger import logger
+from db_engine import create_db_engine, pool_stats, uses_sqlite_profile
+from db_routing import ReadWriteRouter, RoutingSession
 import os
 from dotenv import load_dotenv
 
@@ -10,13 +15,34 @@ load_dotenv()
 # データベースURLの設定（デフォルトはSQLite）
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///./notes.db')
 
-# エンジンの作成
-engine = create_engine(DATABASE_URL)
+# エンジンの作成（プール設定はDB_*環境変数から読み込む）
+engine = create_db_engine(DATABASE_URL)
+
+# 読み取り用エンジンの作成
+# DATABASE_READ_URLS（カンマ区切り）にレプリカを指定すると読み取りを振り分ける。
+# 指定がなくSQLiteの性能プロファイル（DB_SQLITE_PROFILE=true）の場合はWALを使い、
+# GETのハンドラーが書き込みの完了を待たないよう別のエンジンで読み取る
+DATABASE_READ_URLS = [url.strip() for url in os.getenv('DATABASE_READ_URLS', '').split(',') if url.strip()]
+read_engines = [create_db_engine(url, read_only=True) for url in DATABASE_READ_URLS]
+if not read_engines and uses_sqlite_profile(DATABASE_URL):
+    read_engines = [create_db_engine(DATABASE_URL, read_only=True)]
+
+# 書き込み後に読み取りをプライマリに固定する秒数（レプリカの遅延を吸収する）
+router = ReadWriteRouter(
+    engine,
+    read_engines,
+    sticky_seconds=float(os.getenv('DB_READ_STICKY_SECONDS', '5'))
+)
 
 # セッションファクトリの作成
 session_factory = sessionmaker(bind=engine)
 Session = scoped_session(session_factory)
 
+# 読み取り用のセッション
+# GETリクエストでは読み取り用エンジンを使い、
+# それ以外はプライマリを使う
+ReadSession = scoped_session(sessionmaker(class_=RoutingSession, info={'router': router}))
+
 def init_db():
     """
     データベースの初期化を行う関数
@@ -24,13 +50,60 @@ def init_db():
     """
     Base.metadata.create_all(engine)
 
+def get_pool_stats():
+    """
+    コネクションプールの利用状況を取得する関数
+    """
+    stats = pool_stats(engine)
+    if read_engines:
+        stats['read'] = [pool_stats(read_engine) for read_engine in read_engines]
+        stats['routing'] = router.stats()
+    with _leak_lock:
+        stats['leaked_sessions'] = dict(leaked_sessions)
+    return stats
+
 def get_db():
     """
     データベースセッションを取得する関数
+
+    同じスレッド（リクエスト）内では同じセッションを返します。
+    セッションはリクエストの終了時にremove_sessionsで破棄されます。
+    """
+    return Session()
+
+# リクエスト終了時に開いたままだったセッションの件数（エンドポイントごと）
+leaked_sessions = Counter()
+_leak_lock = threading.Lock()
+
+def _record_endpoint():
+    # teardown_appcontextではrequestを参照できないためgに保存しておく
+    g.db_endpoint = request.endpoint
+
+def remove_sessions(exception=None):
+    """
+    @docs
+    リクエストの終了時にセッションを破棄し、接続をプールに返す関数
+
+    トランザクションが開いたままのセッションが残っていた場合は、
+    リクエスト元のエンドポイントとともにログに記録して件数を数えます。
+
+    Args:
+        exception (Exception): リクエスト中に発生した例外
+    """
+    endpoint = g.get('db_endpoint') or 'unknown'
+    for name, scoped in (('Session', Session), ('ReadSession', ReadSession)):
+        if scoped.registry.has() and scoped().in_transaction():
+            with _leak_lock:
+                leaked_sessions[endpoint] += 1
+            logger.warning(f"閉じられていないセッションを検出しました: {name}, エンドポイント={endpoint}")
+        scoped.remove()
+
+def init_session_lifecycle(app):
+    """
+    リクエスト単位のセッション管理をアプリケーションに登録する関数
+
+    Args:
+        app (Flask): 対象のアプリケーション
     """
-    db = Session()
-    try:
-        return db
-    except Exception as e:
-        db.rollback()
-        raise e
+    app.before_request(_record_endpoint)
+    app.teardown_appcontext(remove_sessions)
@@ -3,6 +3,7 @@ import json
 import firebase_admin
 from firebase_admin import credentials, auth
 import logging
+from cert_store import cert_store
 
 logger = logging.getLogger(__name__)
 
@@ -54,6 +55,9 @@ def verify_firebase_token(id_token):
         ValueError: トークンが無効な場合
     """
     try:
+        if cert_store is not None:
+            # 事前取得済みの署名証明書で検証する
+            return cert_store.verify_id_token(id_token, firebase_admin.get_app().project_id)
         decoded_token = auth.verify_id_token(id_token)
         return decoded_token
     except Exception as e:
@@ -0,0 +1,83 @@
+"""
+JSONレスポンスのストリーミング
+
+ページの本文を含む大きなレスポンスを、辞書全体を組み立ててからjsonifyする代わりに
+1行ずつJSONの断片として書き出します。
+
+- 行はサーバーサイドカーソル（yield_per）で少しずつ取得するため、
+  1リクエストあたりのメモリ使用量はページ数に関係なく一定に収まる
+- 各行のシリアライズはアプリケーションのJSONプロバイダーを使うため、jsonifyと同じ形式になる
+- レスポンスを返した後にリクエストのセッションは破棄されるため、
+  行の取得にはストリーミング専用のセッションを使用する
+"""
+from flask import Response, current_app, stream_with_context
+
+# サーバーサイドカーソルから一度に取得する行数
+STREAM_BATCH_SIZE = 20
+
+def iter_json_array(items):
+    """
+    要素を1つずつJSON配列の断片として返すジェネレータ
+
+    Args:
+        items (iterable): シリアライズできる要素
+
+    Yields:
+        str: JSONの断片
+    """
+    yield '['
+    separator = ''
+    for item in items:
+        yield separator + current_app.json.dumps(item)
+        separator = ','
+    yield ']'
+
+def iter_json_object(head, key, items):
+    """
+    オブジェクトの最後のキーに配列を持つJSONを断片として返すジェネレータ
+
+    Args:
+        head (dict): 配列以外のキーと値
+        key (str): 配列のキー
+        items (iterable): 配列の要素
+
+    Yields:
+        str: JSONの断片
+    """
+    # '{...}'の末尾の'}'を外して配列のキーを続ける
+    prefix = current_app.json.dumps(head)[:-1]
+    yield prefix + (',' if head else '') + current_app.json.dumps(key) + ':'
+    yield from iter_json_array(items)
+    yield '}'
+
+def stream_rows(session_factory, build_query, serialize, batch_size=STREAM_BATCH_SIZE):
+    """
+    専用のセッションで行を少しずつ取得してシリアライズするジェネレータ
+
+    クライアントが途中で切断した場合もセッションは閉じられます。
+
+    Args:
+        session_factory (callable): セッションを作成する関数（scoped_sessionのsession_factory）
+        build_query (callable): セッションを受け取ってクエリを返す関数
+        serialize (callable): 行をシリアライズできる値に変換する関数
+        batch_size (int): 一度に取得する行数
+
+    Yields:
+        行をserializeで変換した値
+    """
+    with session_factory() as session:
+        for row in build_query(session).yield_per(batch_size):
+            yield serialize(row)
+
+def json_stream_response(chunks, status=200):
+    """
+    JSONの断片のジェネレータからストリーミングのレスポンスを作成する関数
+
+    Args:
+        chunks (iterable): iter_json_array()またはiter_json_object()のジェネレータ
+        status (int): ステータスコード
+
+    Returns:
+        Response: ストリーミングのレスポンス
+    """
+    return Response(stream_with_context(chunks), status=status, mimetype='application/json')
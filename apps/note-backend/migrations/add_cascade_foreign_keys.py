@@ -0,0 +1,103 @@
+"""
+pages, bookmarksテーブルの外部キーにON DELETE CASCADEを設定するマイグレーションスクリプト
+
+ノートの削除時にページとしおりをデータベースで削除するようになり、
+SQLAlchemyがページの内容を読み込んで1行ずつ削除する必要がなくなります（passive_deletes）。
+
+- PostgreSQL: 外部キー制約を削除してON DELETE CASCADE付きで作成し直す
+- SQLite: 外部キー制約を変更できないため、モデルの定義でテーブルを作り直して行をコピーする
+  （参照先が存在しない行はコピーしない）
+
+使い方:
+    python migrations/add_cascade_foreign_keys.py
+"""
+import os
+import sys
+
+# モデルをインポートするためにパスを追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlalchemy as sa
+from sqlalchemy import text
+from database import engine
+from models import Base
+
+TARGET_TABLES = ['pages', 'bookmarks']
+
+def _foreign_keys_without_cascade(inspector, table_name):
+    return [fk for fk in inspector.get_foreign_keys(table_name)
+            if (fk.get('options') or {}).get('ondelete', '').upper() != 'CASCADE']
+
+def _upgrade_postgres(conn, table_name, foreign_keys):
+    for fk in foreign_keys:
+        name = fk['name']
+        columns = ', '.join(fk['constrained_columns'])
+        referred = ', '.join(fk['referred_columns'])
+        conn.execute(text(f'ALTER TABLE {table_name} DROP CONSTRAINT {name}'))
+        conn.execute(text(
+            f'ALTER TABLE {table_name} ADD CONSTRAINT {name} FOREIGN KEY ({columns}) '
+            f'REFERENCES {fk["referred_table"]} ({referred}) ON DELETE CASCADE'
+        ))
+
+def _upgrade_sqlite(conn, inspector, table_name):
+    table = Base.metadata.tables[table_name]
+    old_name = f'{table_name}_old'
+    old_columns = {c['name'] for c in inspector.get_columns(table_name)}
+    old_indexes = [index['name'] for index in inspector.get_indexes(table_name)]
+    columns = ', '.join(c.name for c in table.columns if c.name in old_columns)
+    conditions = ' AND '.join(
+        f'{fk.parent.name} IN (SELECT {fk.column.name} FROM {fk.column.table.name})'
+        for fk in table.foreign_keys
+    ) or '1 = 1'
+
+    conn.execute(text(f'ALTER TABLE {table_name} RENAME TO {old_name}'))
+    for index_name in old_indexes:
+        conn.execute(text(f'DROP INDEX IF EXISTS {index_name}'))
+    table.create(conn)
+    conn.execute(text(
+        f'INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {old_name} WHERE {conditions}'
+    ))
+    conn.execute(text(f'DROP TABLE {old_name}'))
+
+def upgrade():
+    """
+    アップグレード処理: 外部キーにON DELETE CASCADEを設定
+    """
+    try:
+        inspector = sa.inspect(engine)
+        targets = {table_name: _foreign_keys_without_cascade(inspector, table_name)
+                   for table_name in TARGET_TABLES}
+        targets = {table_name: fks for table_name, fks in targets.items() if fks}
+        if not targets:
+            print("外部キーにはすでに ON DELETE CASCADE が設定されています")
+            return
+
+        if engine.dialect.name == 'sqlite':
+            with engine.connect() as conn:
+                # 作り直す間は外部キーの検査を止め、テーブル名の変更で
+                # 他のテーブルの外部キーの参照先が書き換わらないようにする
+                conn.execute(text('PRAGMA foreign_keys = OFF'))
+                conn.execute(text('PRAGMA legacy_alter_table = ON'))
+                conn.commit()
+                try:
+                    with conn.begin():
+                        for table_name in targets:
+                            _upgrade_sqlite(conn, inspector, table_name)
+                finally:
+                    conn.execute(text('PRAGMA legacy_alter_table = OFF'))
+                    conn.execute(text('PRAGMA foreign_keys = ON'))
+                    conn.commit()
+        else:
+            with engine.begin() as conn:
+                for table_name, foreign_keys in targets.items():
+                    _upgrade_postgres(conn, table_name, foreign_keys)
+
+        for table_name in targets:
+            print(f"{table_name} テーブルの外部キーに ON DELETE CASCADE を設定しました")
+
+    except Exception as e:
+        print(f"マイグレーションエラー: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    upgrade()
@@ -0,0 +1,44 @@
+"""
+notesテーブルにlast_positionカラム（ページの位置カウンター）を追加するマイグレーションスクリプト
+
+末尾に追加するページの位置は、最大の位置を読んでから挿入するのではなく、
+last_positionをUPDATE ... RETURNINGで進めて割り当てるようになります（page_order.append_position）。
+既存のノートは最後のページの位置から始まります。
+
+使い方:
+    python migrations/add_note_page_counter.py
+"""
+import os
+import sys
+
+# モデルをインポートするためにパスを追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlalchemy as sa
+from sqlalchemy import text
+from database import engine
+
+def upgrade():
+    """
+    アップグレード処理: last_positionカラムを追加して既存のページの位置から設定
+    """
+    try:
+        inspector = sa.inspect(engine)
+        columns = [c['name'] for c in inspector.get_columns('notes')]
+        if 'last_position' in columns:
+            print("notes テーブルの last_position カラムはすでに存在します")
+            return
+
+        with engine.begin() as conn:
+            conn.execute(text('ALTER TABLE notes ADD COLUMN last_position INTEGER NOT NULL DEFAULT 0'))
+            conn.execute(text(
+                'UPDATE notes SET last_position = COALESCE('
+                '(SELECT MAX(position) FROM pages WHERE pages.note_id = notes.id), 0)'
+            ))
+        print("notes テーブルに last_position カラムを追加しました")
+    except Exception as e:
+        print(f"マイグレーションエラー: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    upgrade()
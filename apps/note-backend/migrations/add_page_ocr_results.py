@@ -0,0 +1,44 @@
+"""
+ページのOCR結果を保存するpage_ocr_resultsテーブルを作成するマイグレーションスクリプト
+
+OCRの結果はページのバージョンと画像のハッシュとともに保存され、ページが更新されるか
+別の画像が送られるまではVision APIを呼び出さずに保存した結果を返すようになります（routes/ocr.py）。
+テーブルが作成済みでimage_hashカラムがない場合はカラムを追加します。
+
+使い方:
+    python migrations/add_page_ocr_results.py
+"""
+import os
+import sys
+
+# モデルをインポートするためにパスを追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlalchemy as sa
+from sqlalchemy import text
+from database import engine
+from models import PageOcrResult
+
+def upgrade():
+    """
+    アップグレード処理: page_ocr_resultsテーブルを作成
+    """
+    try:
+        inspector = sa.inspect(engine)
+        if inspector.has_table(PageOcrResult.__tablename__):
+            columns = [c['name'] for c in inspector.get_columns(PageOcrResult.__tablename__)]
+            if 'image_hash' in columns:
+                print("page_ocr_results テーブルはすでに存在します")
+                return
+            with engine.begin() as conn:
+                conn.execute(text('ALTER TABLE page_ocr_results ADD COLUMN image_hash VARCHAR(64)'))
+            print("page_ocr_results テーブルに image_hash カラムを追加しました")
+            return
+        PageOcrResult.__table__.create(engine)
+        print("page_ocr_results テーブルを作成しました")
+    except Exception as e:
+        print(f"マイグレーションエラー: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    upgrade()
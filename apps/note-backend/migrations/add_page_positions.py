@@ -0,0 +1,67 @@
+"""
+pagesテーブルのpage_numberカラムをpositionカラム（疎な並び順）に置き換えるマイグレーションスクリプト
+
+ページ番号は保存せず、読み込み時にpositionの順序から計算するようになります（page_order.py）。
+既存のページはpage_number * POSITION_GAPの位置に並べるため、ページの順序は変わりません。
+
+1. positionカラムを追加し、1つのUPDATE文でpage_numberから値を設定
+2. (note_id, position, id)のインデックスを作成
+3. (note_id, page_number)の一意インデックスとpage_numberカラムを削除
+
+使い方:
+    python migrations/add_page_positions.py
+"""
+import os
+import sys
+
+# モデルをインポートするためにパスを追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlalchemy as sa
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+from database import engine
+from models import Page
+from page_order import POSITION_GAP
+
+OLD_INDEX_NAME = 'uix_pages_note_page_number'
+NEW_INDEX_NAME = 'idx_pages_note_position'
+
+def upgrade():
+    """
+    アップグレード処理: positionカラムを追加してpage_numberカラムを削除
+    """
+    try:
+        inspector = sa.inspect(engine)
+        columns = [c['name'] for c in inspector.get_columns('pages')]
+        is_postgres = engine.dialect.name == 'postgresql'
+
+        with engine.begin() as conn:
+            if 'position' not in columns:
+                conn.execute(text('ALTER TABLE pages ADD COLUMN position INTEGER'))
+                conn.execute(text('UPDATE pages SET position = page_number * :gap'), {'gap': POSITION_GAP})
+                if is_postgres:
+                    conn.execute(text('ALTER TABLE pages ALTER COLUMN position SET NOT NULL'))
+                print("pages テーブルに position カラムを追加しました")
+            else:
+                print("pages テーブルの position カラムはすでに存在します")
+
+            index = next(index for index in Page.__table__.indexes if index.name == NEW_INDEX_NAME)
+            conn.execute(CreateIndex(index, if_not_exists=True))
+            print(f"pages テーブルに {NEW_INDEX_NAME} を作成しました")
+
+            conn.execute(text(f'DROP INDEX IF EXISTS {OLD_INDEX_NAME}'))
+            if 'page_number' in columns:
+                # SQLiteのDROP COLUMNは3.35以降で使用でき、インデックスを先に削除する必要がある
+                conn.execute(text('ALTER TABLE pages DROP COLUMN page_number'))
+                print("pages テーブルから page_number カラムを削除しました")
+
+        with engine.begin() as conn:
+            conn.execute(text('ANALYZE'))
+
+    except Exception as e:
+        print(f"マイグレーションエラー: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    upgrade()
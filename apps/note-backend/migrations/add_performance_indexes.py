@@ -0,0 +1,146 @@
+"""
+notes, pages, bookmarksテーブルに検索用インデックスを追加するマイグレーションスクリプト
+
+書き込みを止めずにインデックスを作成します。
+- PostgreSQL: CREATE INDEX CONCURRENTLY（トランザクション外で1つずつ実行）
+- SQLite: CREATE INDEX IF NOT EXISTS を1インデックスごとの短いトランザクションで実行
+
+実行前後に代表的なクエリの実行計画を表示し、インデックスが使われることを確認します。
+
+使い方:
+    python migrations/add_performance_indexes.py            # インデックスを作成
+    python migrations/add_performance_indexes.py --explain  # 実行計画の確認のみ
+    python migrations/add_performance_indexes.py --downgrade
+"""
+import os
+import sys
+
+# モデルをインポートするためにパスを追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex, DropIndex
+from database import engine
+from models import Base
+
+# 作成するインデックス（テーブル名, インデックス名）
+TARGET_INDEXES = [
+    ('notes', 'idx_notes_user_created'),
+    ('pages', 'idx_pages_note_position'),
+    ('bookmarks', 'idx_bookmarks_note_id'),
+]
+
+# 実行計画を確認する代表的なクエリ（get_notes, get_page/update_page, get_bookmarks）
+PLAN_QUERIES = [
+    ('get_notes',
+     'SELECT id FROM notes WHERE user_id = :user_id ORDER BY created_at DESC',
+     {'user_id': 'plan-check'}),
+    ('get_page',
+     'SELECT id FROM pages WHERE note_id = :note_id ORDER BY position, id LIMIT 1 OFFSET :offset',
+     {'note_id': 1, 'offset': 0}),
+    ('get_bookmarks',
+     'SELECT id FROM bookmarks WHERE note_id = :note_id',
+     {'note_id': 1}),
+]
+
+def _get_index(table_name, index_name):
+    table = Base.metadata.tables[table_name]
+    for index in table.indexes:
+        if index.name == index_name:
+            return index
+    raise KeyError(index_name)
+
+def explain_queries(conn):
+    """
+    代表的なクエリの実行計画を表示する
+
+    Args:
+        conn: データベース接続
+
+    Returns:
+        dict: クエリ名と実行計画の文字列の対応
+    """
+    is_postgres = conn.dialect.name == 'postgresql'
+    plans = {}
+    for name, sql, params in PLAN_QUERIES:
+        prefix = 'EXPLAIN ' if is_postgres else 'EXPLAIN QUERY PLAN '
+        rows = conn.execute(text(prefix + sql), params).fetchall()
+        plan = '\n'.join(str(row[0] if is_postgres else row[-1]) for row in rows)
+        plans[name] = plan
+        print(f"[{name}]\n{plan}\n")
+    return plans
+
+def _create_index_postgres(index):
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        # 以前のCONCURRENTLYの失敗で残った無効なインデックスは作り直す
+        invalid = conn.execute(text(
+            'SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+            'WHERE c.relname = :name AND NOT i.indisvalid'
+        ), {'name': index.name}).first()
+        if invalid:
+            print(f"無効なインデックス {index.name} を削除して作り直します")
+            conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {index.name}'))
+
+        index.dialect_kwargs['postgresql_concurrently'] = True
+        conn.execute(CreateIndex(index, if_not_exists=True))
+
+def _create_index_sqlite(index):
+    with engine.begin() as conn:
+        conn.execute(text('PRAGMA busy_timeout = 30000'))
+        conn.execute(CreateIndex(index, if_not_exists=True))
+
+def upgrade():
+    """
+    アップグレード処理: インデックスを作成
+    """
+    try:
+        for table_name, index_name in TARGET_INDEXES:
+            index = _get_index(table_name, index_name)
+            if engine.dialect.name == 'postgresql':
+                _create_index_postgres(index)
+            else:
+                _create_index_sqlite(index)
+            print(f"{table_name} テーブルに {index_name} を作成しました")
+
+        with engine.begin() as conn:
+            conn.execute(text('ANALYZE'))
+
+    except Exception as e:
+        print(f"マイグレーションエラー: {str(e)}")
+        raise
+
+def downgrade():
+    """
+    ダウングレード処理: インデックスを削除
+    """
+    try:
+        for table_name, index_name in TARGET_INDEXES:
+            index = _get_index(table_name, index_name)
+            if engine.dialect.name == 'postgresql':
+                with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                    conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {index_name}'))
+            else:
+                with engine.begin() as conn:
+                    conn.execute(DropIndex(index, if_exists=True))
+            print(f"{table_name} テーブルから {index_name} を削除しました")
+    except Exception as e:
+        print(f"ダウングレードエラー: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    if '--downgrade' in sys.argv:
+        downgrade()
+        sys.exit(0)
+
+    print("=== 実行計画（変更前） ===")
+    with engine.connect() as conn:
+        explain_queries(conn)
+
+    if '--explain' in sys.argv:
+        sys.exit(0)
+
+    upgrade()
+
+    print("=== 実行計画（変更後） ===")
+    with engine.connect() as conn:
+        explain_queries(conn)
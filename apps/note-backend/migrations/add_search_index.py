@@ -0,0 +1,80 @@
+"""
+全文検索用のsearch_documentsテーブルを作成し、既存のノートとページを登録するマイグレーションスクリプト
+
+テーブルの作成時に全文検索インデックス（SQLiteはFTS5のテーブルとトリガー、
+PostgreSQLはGINインデックス）も作成されます（text_search.attach_search_index）。
+ページの本文は圧縮して保存されているため、モデルを通して展開したテキストから登録します。
+
+使い方:
+    python migrations/add_search_index.py
+"""
+import os
+import sys
+
+# モデルをインポートするためにパスを追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlalchemy as sa
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+from database import engine
+from models import Note, Page, SearchDocument
+from search_index import page_text
+from text_search import index_tokens
+
+BATCH_SIZE = 500
+
+def _insert_batches(db, rows):
+    batch = []
+    count = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            db.execute(insert(SearchDocument.__table__), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        db.execute(insert(SearchDocument.__table__), batch)
+        count += len(batch)
+    return count
+
+def upgrade():
+    """
+    アップグレード処理: search_documentsテーブルを作成して既存のノートとページを登録
+    """
+    try:
+        if sa.inspect(engine).has_table(SearchDocument.__tablename__):
+            print("search_documents テーブルはすでに存在します")
+            return
+        SearchDocument.__table__.create(engine)
+        print("search_documents テーブルと全文検索インデックスを作成しました")
+
+        db = sessionmaker(bind=engine)()
+        try:
+            notes = db.query(Note.id, Note.user_id, Note.title, Note.main_category, Note.sub_category)
+            count = _insert_batches(db, ({
+                'user_id': user_id,
+                'note_id': note_id,
+                'page_id': None,
+                'tokens': index_tokens(title, main_category, sub_category),
+            } for note_id, user_id, title, main_category, sub_category in notes.yield_per(BATCH_SIZE)))
+            print(f"{count}件のノートを登録しました")
+
+            pages = db.query(Page.id, Page.note_id, Note.user_id, Page.content).join(Note, Note.id == Page.note_id)
+            count = _insert_batches(db, ({
+                'user_id': user_id,
+                'note_id': note_id,
+                'page_id': page_id,
+                'tokens': index_tokens(page_text(content)),
+            } for page_id, note_id, user_id, content in pages.yield_per(BATCH_SIZE)))
+            print(f"{count}件のページを登録しました")
+            db.commit()
+        finally:
+            db.close()
+
+    except Exception as e:
+        print(f"マイグレーションエラー: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    upgrade()
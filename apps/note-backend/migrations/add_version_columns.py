@@ -0,0 +1,41 @@
+"""
+notes, pagesテーブルにversionカラムを追加するマイグレーションスクリプト
+
+versionは行の更新ごとに1ずつ増え、ETagの計算に使用します。
+既存の行は1から始まります。
+
+使い方:
+    python migrations/add_version_columns.py
+"""
+import os
+import sys
+
+# モデルをインポートするためにパスを追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlalchemy as sa
+from sqlalchemy import text
+from database import engine
+
+TARGET_TABLES = ['notes', 'pages']
+
+def upgrade():
+    """
+    アップグレード処理: versionカラムを追加
+    """
+    try:
+        inspector = sa.inspect(engine)
+        for table_name in TARGET_TABLES:
+            columns = [c['name'] for c in inspector.get_columns(table_name)]
+            if 'version' in columns:
+                print(f"{table_name} テーブルの version カラムはすでに存在します")
+                continue
+            with engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE {table_name} ADD COLUMN version INTEGER NOT NULL DEFAULT 1'))
+            print(f"{table_name} テーブルに version カラムを追加しました")
+    except Exception as e:
+        print(f"マイグレーションエラー: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    upgrade()
@@ -1,10 +1,22 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, JSON, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Boolean, Index, literal_column
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
+from content_codec import CompressedText
+from text_search import attach_search_index
 
 Base = declarative_base()
 
+def version_column():
+    """
+    行の更新ごとに1ずつ増えるバージョン列を作成する関数
+
+    ORMの更新だけでなくQuery.update()による一括更新でも増えます。
+    ETagの計算に使用します。
+    """
+    return Column(Integer, nullable=False, default=1, server_default='1',
+                  onupdate=literal_column('version', Integer) + 1)
+
 class Note(Base):
     """
     @docs
@@ -16,6 +28,8 @@ class Note(Base):
         main_category (str): メインカテゴリ
         sub_category (str): サブカテゴリ
         user_id (str): 所有者のユーザーID
+        version (int): 更新ごとに増えるバージョン（ETag用）
+        last_position (int): 最後に割り当てたページの位置（末尾への追加時にUPDATE ... RETURNINGで進める）
         created_at (datetime): 作成日時
         updated_at (datetime): 更新日時
         pages (relationship): ページとの1対多のリレーション
@@ -28,14 +42,22 @@ class Note(Base):
     main_category = Column(String(50), nullable=False)
     sub_category = Column(String(50), nullable=False)
     user_id = Column(String(128), nullable=True)  # Firebaseユーザーのuidを保存
+    version = version_column()
+    last_position = Column(Integer, nullable=False, default=0, server_default='0')  # page_order.append_position用
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Pageテーブルとの1対多のリレーション
-    pages = relationship("Page", back_populates="note", cascade="all, delete-orphan")
+    # 削除はデータベースのON DELETE CASCADEに任せ、ページを読み込まずにノートの行だけを削除する
+    pages = relationship("Page", back_populates="note", cascade="all, delete-orphan", passive_deletes=True)
     
     # Bookmarkテーブルとの1対多のリレーション
-    bookmarks = relationship("Bookmark", back_populates="note", cascade="all, delete-orphan")
+    bookmarks = relationship("Bookmark", back_populates="note", cascade="all, delete-orphan", passive_deletes=True)
+
+    # ユーザーごとのノート一覧（作成日時の降順）用のインデックス
+    __table_args__ = (
+        Index('idx_notes_user_created', user_id, created_at.desc()),
+    )
 
 class Page(Base):
     """
@@ -45,25 +67,32 @@ class Page(Base):
     Attributes:
         id (int): プライマリーキー
         note_id (int): 所属するノートのID（外部キー）
-        page_number (int): ページ番号
-        content (Text): ページの内容（キャンバスデータ）
+        position (int): 並び順の位置（疎な整数。ページ番号は読み込み時にこの順序から計算する）
+        content (CompressedText): ページの内容（キャンバスデータ、保存時に圧縮）
         layout_settings (JSON): レイアウト設定（JSON形式）
+        version (int): 更新ごとに増えるバージョン（ETag用）
         note (relationship): ノートとの多対1のリレーション
         bookmarks (relationship): ブックマークとの1対多のリレーション
     """
     __tablename__ = 'pages'
 
     id = Column(Integer, primary_key=True)
-    note_id = Column(Integer, ForeignKey('notes.id'), nullable=False)
-    page_number = Column(Integer, nullable=False)
-    content = Column(Text)  # キャンバスデータをJSON文字列として保存
+    note_id = Column(Integer, ForeignKey('notes.id', ondelete='CASCADE'), nullable=False)
+    position = Column(Integer, nullable=False)  # 並び順（page_order.POSITION_GAP間隔で振る）
+    content = Column(CompressedText)  # キャンバスデータをJSON文字列として保存（保存時に圧縮）
     layout_settings = Column(JSON)  # レイアウト設定
+    version = version_column()
 
     # Noteテーブルとの多対1のリレーション
     note = relationship("Note", back_populates="pages")
     
     # Bookmarkテーブルとの1対多のリレーション
-    bookmarks = relationship("Bookmark", back_populates="page", cascade="all, delete-orphan")
+    bookmarks = relationship("Bookmark", back_populates="page", cascade="all, delete-orphan", passive_deletes=True)
+
+    # ノートごとのページの並び順（ページ番号の計算と挿入位置の検索）用のインデックス
+    __table_args__ = (
+        Index('idx_pages_note_position', 'note_id', 'position', 'id'),
+    )
 
 class Bookmark(Base):
     """
@@ -74,7 +103,7 @@ class Bookmark(Base):
         id (int): プライマリーキー
         note_id (int): 所属するノートのID（外部キー）
         page_id (int): 所属するページのID（外部キー）
-        page_number (int): ページ番号
+        page_number (int): 作成時のページ番号（レスポンスでは現在のページ番号を計算して返す）
         position_x (int): キャンバス上のX座標位置（オプション）
         position_y (int): キャンバス上のY座標位置（オプション）
         title (str): しおりのタイトル（ページ番号がデフォルト）
@@ -86,8 +115,8 @@ class Bookmark(Base):
     __tablename__ = 'bookmarks'
     
     id = Column(Integer, primary_key=True)
-    note_id = Column(Integer, ForeignKey('notes.id'), nullable=False)
-    page_id = Column(Integer, ForeignKey('pages.id'), nullable=False)
+    note_id = Column(Integer, ForeignKey('notes.id', ondelete='CASCADE'), nullable=False)
+    page_id = Column(Integer, ForeignKey('pages.id', ondelete='CASCADE'), nullable=False)
     page_number = Column(Integer, nullable=False)
     position_x = Column(Integer, nullable=True)
     position_y = Column(Integer, nullable=True)
@@ -100,3 +129,88 @@ class Bookmark(Base):
     
     # Pageテーブルとの多対1のリレーション
     page = relationship("Page", back_populates="bookmarks")
+
+    __table_args__ = (
+        Index('idx_bookmarks_note_id', 'note_id'),
+    )
+
+class SearchDocument(Base):
+    """
+    @docs
+    全文検索の対象（ノートのタイトル・カテゴリ、ページのテキスト）を管理するテーブル
+
+    ノートとページの保存時にsearch_index.pyで更新し、削除時は外部キーのON DELETE CASCADEで削除されます。
+    tokens列にはtext_search.index_tokens()で分割したトークンを保存し、
+    全文検索インデックス（SQLiteはFTS5、PostgreSQLはGIN）はtext_search.attach_search_index()で作成します。
+
+    Attributes:
+        id (int): プライマリーキー
+        user_id (str): ノートの所有者のユーザーID（検索結果の絞り込み用）
+        note_id (int): ノートのID（外部キー）
+        page_id (int): ページのID（外部キー、ノート自体の文書の場合はNone）
+        tokens (str): スペース区切りの検索用トークン
+    """
+    __tablename__ = 'search_documents'
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String(128), nullable=True)
+    note_id = Column(Integer, ForeignKey('notes.id', ondelete='CASCADE'), nullable=False)
+    page_id = Column(Integer, ForeignKey('pages.id', ondelete='CASCADE'), nullable=True)
+    tokens = Column(Text, nullable=False, default='')
+
+    __table_args__ = (
+        Index('idx_search_documents_note_page', 'note_id', 'page_id'),
+        Index('idx_search_documents_page', 'page_id'),
+    )
+
+attach_search_index(SearchDocument.__table__)
+
+class CategorySummary(Base):
+    """
+    @docs
+    ユーザーのカテゴリごとのノート数を管理するテーブル
+
+    ノートの作成・更新・削除と同じトランザクションでcategory_summary.pyにより増減し、
+    カテゴリ一覧（GET /api/notes/categories）はこのテーブルだけを読みます。
+
+    Attributes:
+        user_id (str): ノートの所有者のユーザーID
+        main_category (str): メインカテゴリ
+        sub_category (str): サブカテゴリ（未設定は空文字）
+        item_count (int): カテゴリのノート数
+        last_updated_at (datetime): カテゴリ内で最後にノートを作成・更新した日時
+    """
+    __tablename__ = 'note_category_summaries'
+
+    user_id = Column(String(128), primary_key=True)
+    main_category = Column(String(50), primary_key=True)
+    sub_category = Column(String(50), primary_key=True)
+    item_count = Column(Integer, nullable=False, default=0)
+    last_updated_at = Column(DateTime, nullable=True)
+
+class PageOcrResult(Base):
+    """
+    @docs
+    ページのOCR結果を管理するテーブル
+
+    Vision APIの結果をページごとに1行保存し、page_versionがページのversionと一致し、
+    送られた画像のハッシュがimage_hashと一致する（または画像が送られない）間は
+    再度APIを呼び出さずにこの結果を返します（routes/ocr.py）。ページの削除時は
+    外部キーのON DELETE CASCADEで削除されます。
+
+    Attributes:
+        page_id (int): ページのID（プライマリーキー、外部キー）
+        page_version (int): OCRを実行したときのページのバージョン
+        image_hash (str): OCRを実行した画像のSHA-256（16進数）
+        text (str): 抽出した全文（保存時に圧縮）
+        boxes (str): 単語と行の位置のJSON（ocr_result.encode_boxes()の形式、保存時に圧縮）
+        created_at (datetime): OCRを実行した日時
+    """
+    __tablename__ = 'page_ocr_results'
+
+    page_id = Column(Integer, ForeignKey('pages.id', ondelete='CASCADE'), primary_key=True)
+    page_version = Column(Integer, nullable=False)
+    image_hash = Column(String(64), nullable=True)
+    text = Column(CompressedText, nullable=False, default='')
+    boxes = Column(CompressedText, nullable=False, default='{}')
+    created_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
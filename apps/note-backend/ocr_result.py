@@ -0,0 +1,92 @@
+"""
+OCR結果の単語と行の位置をまとめる処理
+
+Vision APIのfull_text_annotation（ページ→ブロック→段落→単語→文字）から
+単語と行の文字列と外接矩形を取り出し、保存用のコンパクトなJSONに変換します。
+
+保存形式（PageOcrResult.boxes）:
+    {"w": [[文字列, x0, y0, x1, y1], ...], "l": [[文字列, x0, y0, x1, y1], ...]}
+    wは単語、lは行。座標は画像のピクセル単位の左上(x0, y0)と右下(x1, y1)
+"""
+import json
+from google.cloud import vision
+
+_BreakType = vision.TextAnnotation.DetectedBreak.BreakType
+# 単語の後ろに空白を入れる区切り
+_SPACE_BREAKS = (_BreakType.SPACE, _BreakType.SURE_SPACE)
+# 行の終わりを表す区切り
+_LINE_BREAKS = (_BreakType.EOL_SURE_SPACE, _BreakType.LINE_BREAK, _BreakType.HYPHEN)
+
+def _bounds(bounding_box):
+    xs = [vertex.x for vertex in bounding_box.vertices]
+    ys = [vertex.y for vertex in bounding_box.vertices]
+    if not xs:
+        return [0, 0, 0, 0]
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+def _merge(box, other):
+    return [min(box[0], other[0]), min(box[1], other[1]), max(box[2], other[2]), max(box[3], other[3])]
+
+def extract_boxes(annotation):
+    """
+    full_text_annotationから単語と行を取り出す関数
+
+    行はVision APIが文字ごとに返す区切り（改行・行末の空白・ハイフン）と段落の終わりで分けます。
+
+    Args:
+        annotation: Vision APIのfull_text_annotation
+
+    Returns:
+        tuple: (単語のリスト, 行のリスト)。要素はどちらも[文字列, x0, y0, x1, y1]
+    """
+    words = []
+    lines = []
+    for page in annotation.pages:
+        for block in page.blocks:
+            for paragraph in block.paragraphs:
+                line_text = ''
+                line_box = None
+                for word in paragraph.words:
+                    if not word.symbols:
+                        continue
+                    text = ''.join(symbol.text for symbol in word.symbols)
+                    box = _bounds(word.bounding_box)
+                    words.append([text] + box)
+
+                    line_text += text
+                    line_box = box if line_box is None else _merge(line_box, box)
+                    detected_break = word.symbols[-1].property.detected_break.type_
+                    if detected_break in _LINE_BREAKS:
+                        lines.append([line_text] + line_box)
+                        line_text, line_box = '', None
+                    elif detected_break in _SPACE_BREAKS:
+                        line_text += ' '
+                if line_box is not None:
+                    lines.append([line_text.rstrip()] + line_box)
+    return words, lines
+
+def encode_boxes(words, lines):
+    """
+    単語と行を保存用のJSON文字列に変換する関数
+
+    Args:
+        words (list): 単語のリスト
+        lines (list): 行のリスト
+
+    Returns:
+        str: 保存用のJSON文字列
+    """
+    return json.dumps({'w': words, 'l': lines}, ensure_ascii=False, separators=(',', ':'))
+
+def decode_boxes(boxes):
+    """
+    保存したJSON文字列から単語と行を取り出す関数
+
+    Args:
+        boxes (str): encode_boxes()で作成したJSON文字列
+
+    Returns:
+        tuple: (単語のリスト, 行のリスト)
+    """
+    data = json.loads(boxes or '{}')
+    return data.get('w', []), data.get('l', [])
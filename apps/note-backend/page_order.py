@@ -0,0 +1,180 @@
+"""
+ページの並び順
+
+ページの並び順は疎な整数の位置（Page.position）で保存し、
+ページ番号は読み込み時に位置の順序（同じ位置の場合はID順）から計算します。
+
+- 挿入と移動は前後のページの位置の間の値を1行に設定する
+- 削除は1行を削除するだけで、後ろのページの番号は読み込み時に詰まる
+- 前後の位置の間に空きがない場合だけ、ノートの全ページの位置を
+  1つのUPDATE文でPOSITION_GAP間隔に振り直す（compact_positions）
+- 末尾への追加はノートの位置カウンター（Note.last_position）を
+  UPDATE ... RETURNINGで進めて割り当てるため、同時に追加しても位置が重ならない
+"""
+from sqlalchemy import and_, false, func, or_, select, true, update
+from sqlalchemy.orm import aliased
+from models import Note, Page
+
+# 新しく振る位置の間隔
+POSITION_GAP = 1024
+
+def ordered(query):
+    """
+    ページのクエリをページ番号の順に並べる関数
+
+    Args:
+        query (Query): Pageの列を含むクエリ
+
+    Returns:
+        Query: 並べ替えたクエリ
+    """
+    return query.order_by(Page.position, Page.id)
+
+def page_id_at(note_id, page_number):
+    """
+    ページ番号のページIDを返すスカラーサブクエリを作成する関数
+
+    (note_id, position)のインデックスを順に読み、page_number番目の行のIDを返します。
+
+    Args:
+        note_id (int): ノートID
+        page_number (int): ページ番号（1から）
+
+    Returns:
+        ScalarSelect: ページIDのサブクエリ（存在しない場合はNULL）
+    """
+    return select(Page.id).where(
+        Page.note_id == note_id,
+        true() if page_number >= 1 else false()
+    ).order_by(Page.position, Page.id).offset(max(page_number - 1, 0)).limit(1).scalar_subquery()
+
+def page_number_of(page=Page):
+    """
+    ページのページ番号を計算する相関サブクエリを作成する関数
+
+    しおりなど、ページIDから現在のページ番号を求める場合に使用します。
+
+    Args:
+        page: ページ番号を求めるPage（またはそのエイリアス）
+
+    Returns:
+        ScalarSelect: ページ番号のサブクエリ
+    """
+    other = aliased(Page)
+    return select(func.count(other.id)).where(
+        other.note_id == page.note_id,
+        or_(other.position < page.position,
+            and_(other.position == page.position, other.id <= page.id))
+    ).scalar_subquery()
+
+def _neighbor_positions(db, note_id, page_number, exclude_id):
+    query = db.query(Page.position).filter(Page.note_id == note_id)
+    if exclude_id is not None:
+        query = query.filter(Page.id != exclude_id)
+
+    if page_number <= 1:
+        row = ordered(query).first()
+        return None, row[0] if row else None
+
+    rows = ordered(query).offset(page_number - 2).limit(2).all()
+    if not rows:
+        # 最後のページより後ろを指定した場合は末尾に追加する
+        return None, None
+    return rows[0][0], rows[1][0] if len(rows) > 1 else None
+
+def _position_between(before, after):
+    if before is None:
+        return after - POSITION_GAP
+    if after - before > 1:
+        return (before + after) // 2
+    return None
+
+def position_for(db, note_id, page_number, exclude_id=None):
+    """
+    指定したページ番号にページを置くための位置を決める関数
+
+    前後のページの位置の間に空きがない場合はcompact_positionsで振り直してから決めます。
+    ページ数より大きいページ番号を指定した場合はappend_positionで末尾の位置を割り当てます。
+
+    Args:
+        db (Session): 使用するセッション
+        note_id (int): ノートID
+        page_number (int): 置きたいページ番号（1から）
+        exclude_id (int): 移動するページのID（移動の場合のみ、前後のページから除く）
+
+    Returns:
+        int: 位置
+    """
+    before, after = _neighbor_positions(db, note_id, page_number, exclude_id)
+    if after is None:
+        return append_position(db, note_id)
+    position = _position_between(before, after)
+    if position is None:
+        compact_positions(db, note_id)
+        position = _position_between(*_neighbor_positions(db, note_id, page_number, exclude_id))
+    return position
+
+def _advance_counter(db, note_id, step=None, value=None):
+    # ノートの行をロックしてカウンターを進め（または設定し）、新しい値を返す
+    # ノートのバージョンと更新日時は変えない
+    notes = Note.__table__
+    statement = update(notes).where(notes.c.id == note_id).values(
+        last_position=notes.c.last_position + step if value is None else value,
+        version=notes.c.version,
+        updated_at=notes.c.updated_at
+    )
+    if db.get_bind().dialect.update_returning:
+        return db.execute(statement.returning(notes.c.last_position)).scalar()
+
+    # RETURNINGに対応していないデータベース（3.35より前のSQLiteなど）では、
+    # UPDATEで書き込みロックを取得した同じトランザクション内で読み直す
+    db.execute(statement)
+    return db.execute(select(notes.c.last_position).where(notes.c.id == note_id)).scalar()
+
+def append_position(db, note_id, count=1):
+    """
+    ノートの末尾に追加するページの位置を割り当てる関数
+
+    ノートの位置カウンターを1つのUPDATE ... RETURNING文で進めるため、
+    同じノートに同時にページを追加しても同じ位置は割り当てられません。
+    カウンターは追加したトランザクションの終了までロックされます。
+
+    Args:
+        db (Session): 使用するセッション
+        note_id (int): ノートID
+        count (int): 追加するページ数（続けてPOSITION_GAP間隔の位置を割り当てる）
+
+    Returns:
+        int: 最初のページの位置（ノートが存在しない場合はNone）
+    """
+    last = _advance_counter(db, note_id, step=count * POSITION_GAP)
+    return None if last is None else last - (count - 1) * POSITION_GAP
+
+def compact_positions(db, note_id):
+    """
+    ノートの全ページの位置を1つのUPDATE文でPOSITION_GAP間隔に振り直す関数
+
+    順序は変えないため、ページのバージョンは増やしません。
+    振り直す前にノートの位置カウンターをロックし、同時に末尾に追加されるページと
+    位置が重ならないよう、振り直した後のカウンターを最後の位置に合わせます。
+
+    Args:
+        db (Session): 使用するセッション
+        note_id (int): ノートID
+
+    Returns:
+        int: 更新した行数
+    """
+    _advance_counter(db, note_id, step=0)
+    ranks = select(
+        Page.id.label('page_id'),
+        func.row_number().over(order_by=(Page.position, Page.id)).label('rank')
+    ).where(Page.note_id == note_id).subquery()
+    result = db.execute(
+        update(Page)
+        .where(Page.id == ranks.c.page_id)
+        .values(position=ranks.c.rank * POSITION_GAP, version=Page.version)
+        .execution_options(synchronize_session=False)
+    )
+    _advance_counter(db, note_id, value=result.rowcount * POSITION_GAP)
+    return result.rowcount
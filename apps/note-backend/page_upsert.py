@@ -0,0 +1,128 @@
+"""
+ページの一括アップサート
+
+ノートの複数のページを1つのトランザクションで作成・更新します。
+ページ番号は位置の順序から計算するため（page_order）、まずノートのページIDを順に読み、
+
+- 既存のページ番号のページは、指定された列の組み合わせごとに1つのUPDATE文（executemany）で更新し、
+- ページ数+1から連続するページ番号のページは、1つのINSERT文（executemany）で末尾に追加します。
+
+ページ番号が飛んでいる場合は何も書き込まずにエラーにするため、
+同じリクエストを再送してもページが重複して追加されることはありません。
+"""
+from sqlalchemy import bindparam, insert, update
+from models import Page
+from page_order import POSITION_GAP, append_position, ordered
+
+# 1回のリクエストで更新できる最大ページ数
+MAX_BATCH_PAGES = 100
+
+# クライアントが指定できるページの列
+PAGE_FIELDS = ('content', 'layout_settings')
+
+class BatchError(Exception):
+    """一括更新のリクエストが不正な場合の例外クラス"""
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def parse_batch(data):
+    """
+    一括更新のリクエストボディを検証する関数
+
+    Args:
+        data (dict): {"pages": [{"page_number": 1, "content": ..., "layout_settings": ...}, ...]}
+
+    Returns:
+        list: 検証済みのページのリスト（ページ番号順）
+    """
+    pages = data.get('pages') if isinstance(data, dict) else None
+    if not isinstance(pages, list) or not pages:
+        raise BatchError('pagesの配列が必要です')
+    if len(pages) > MAX_BATCH_PAGES:
+        raise BatchError(f'一度に更新できるページは{MAX_BATCH_PAGES}ページまでです')
+
+    items = {}
+    for item in pages:
+        if not isinstance(item, dict):
+            raise BatchError('ページの形式が不正です')
+        page_number = item.get('page_number')
+        if not isinstance(page_number, int) or isinstance(page_number, bool) or page_number < 1:
+            raise BatchError('page_numberは1以上の整数で指定してください')
+        if page_number in items:
+            raise BatchError(f'page_numberが重複しています: {page_number}')
+        items[page_number] = item
+    return [items[number] for number in sorted(items)]
+
+def _group_by_fields(items):
+    # 指定された列ごとに分けて、指定されていない列は既存の値を残す
+    groups = {}
+    for item in items:
+        fields = tuple(field for field in PAGE_FIELDS if field in item)
+        groups.setdefault(fields, []).append(item)
+    return groups
+
+def upsert_pages(db, note_id, items):
+    """
+    ページを一括で作成・更新する関数
+
+    コミットは呼び出し側で行います。
+    ページ数より大きいページ番号は、ページ数+1から連続している場合のみ末尾に追加します。
+    途中のページ番号が抜けている場合は、書き込む前にBatchError（404）を送出します。
+
+    Args:
+        db (Session): 使用するセッション
+        note_id (int): ノートID
+        items (list): parse_batch()で検証したページのリスト
+
+    Returns:
+        list: ページごとの結果 {"id", "page_number", "version", "created"}（ページ番号順）
+    """
+    page_ids = [row[0] for row in ordered(db.query(Page.id).filter(Page.note_id == note_id))]
+    existing = [item for item in items if item['page_number'] <= len(page_ids)]
+    new = [item for item in items if item['page_number'] > len(page_ids)]
+    # itemsはページ番号順で重複がないため、末尾のページ番号だけで連続しているかを判定できる
+    if new and new[-1]['page_number'] != len(page_ids) + len(new):
+        raise BatchError(f'ページ番号は{len(page_ids) + 1}から連続して指定してください'
+                         f'（現在のページ数: {len(page_ids)}）', status_code=404)
+
+    # ORMの一括更新ではなくテーブルに対するexecutemanyとして実行する
+    pages = Page.__table__
+    for fields, group in _group_by_fields(existing).items():
+        values = {field: bindparam(f'new_{field}') for field in fields}
+        values['version'] = pages.c.version + 1
+        db.execute(
+            update(pages).where(pages.c.id == bindparam('page_id')).values(**values),
+            [dict({f'new_{field}': item[field] for field in fields},
+                  page_id=page_ids[item['page_number'] - 1]) for item in group]
+        )
+
+    results = []
+    if existing:
+        ids = [page_ids[item['page_number'] - 1] for item in existing]
+        versions = dict(db.query(Page.id, Page.version).filter(Page.id.in_(ids)))
+        results = [{
+            'id': page_id,
+            'page_number': item['page_number'],
+            'version': versions[page_id],
+            'created': False,
+        } for page_id, item in zip(ids, existing)]
+
+    if new:
+        start = append_position(db, note_id, count=len(new))
+        rows = db.execute(
+            insert(Page).returning(Page.id, Page.version, sort_by_parameter_order=True),
+            [{
+                'note_id': note_id,
+                'position': start + index * POSITION_GAP,
+                'content': item.get('content', ''),
+                'layout_settings': item.get('layout_settings', {}),
+            } for index, item in enumerate(new)]
+        ).all()
+        results += [{
+            'id': page_id,
+            'page_number': item['page_number'],
+            'version': version,
+            'created': True,
+        } for item, (page_id, version) in zip(new, rows)]
+    return results
@@ -0,0 +1,239 @@
+"""
+一覧取得のキーセットページネーションと列の絞り込み
+
+(created_at, id)の降順で並べた一覧を、前のページの最後の行を指す
+カーソルから続けて取得します。OFFSETを使わないため、何ページ目でも
+インデックスを辿る一定のコストで取得できます。
+関連度順の検索結果のようにキーセットで続きを取得できない一覧は、
+行の位置を含むカーソル（encode_offset_cursor）を使います。
+"""
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, func, or_, select
+
+# 1ページの件数の既定値と上限
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 200
+
+# 次のページのカーソルを返すレスポンスヘッダー
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+class PaginationError(Exception):
+    """ページネーションのパラメータが不正な場合の例外クラス"""
+
+def encode_cursor(created_at, row_id):
+    """
+    行の(created_at, id)からカーソル文字列を作成する関数
+
+    Args:
+        created_at (datetime): 行の作成日時
+        row_id (int): 行のID
+
+    Returns:
+        str: URLで使えるカーソル文字列
+    """
+    payload = json.dumps([created_at.isoformat() if created_at else None, row_id])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    カーソル文字列を(created_at, id)に戻す関数
+
+    Args:
+        cursor (str): encode_cursorで作成したカーソル文字列
+
+    Returns:
+        tuple: (作成日時, ID)
+
+    Raises:
+        PaginationError: カーソルの形式が不正な場合
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded).decode('utf-8'))
+        created_at = datetime.fromisoformat(created_at) if created_at else None
+        if not isinstance(row_id, int):
+            raise ValueError(row_id)
+        return created_at, row_id
+    except (ValueError, TypeError):
+        raise PaginationError('カーソルの形式が不正です')
+
+def parse_page_params(args):
+    """
+    クエリパラメータからlimitとcursorを読み取る関数
+
+    どちらも指定されていない場合はページネーションしません（limitがNone）。
+
+    Args:
+        args (MultiDict): request.args
+
+    Returns:
+        tuple: (limit, カーソルの(作成日時, ID)またはNone)
+
+    Raises:
+        PaginationError: パラメータが不正な場合
+    """
+    limit = args.get('limit')
+    cursor = args.get('cursor')
+    if limit is None and not cursor:
+        return None, None
+
+    if limit is None:
+        limit = DEFAULT_PAGE_LIMIT
+    else:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise PaginationError('limitは整数で指定してください')
+        if limit < 1:
+            raise PaginationError('limitは1以上で指定してください')
+        limit = min(limit, MAX_PAGE_LIMIT)
+
+    return limit, decode_cursor(cursor) if cursor else None
+
+def encode_offset_cursor(offset):
+    """
+    関連度順など、キーセットで続きを取得できない一覧のカーソル文字列を作成する関数
+
+    Args:
+        offset (int): 次のページの先頭の行の位置
+
+    Returns:
+        str: URLで使えるカーソル文字列
+    """
+    payload = json.dumps({'offset': offset})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def parse_offset_params(args):
+    """
+    クエリパラメータからlimitとencode_offset_cursorで作成したcursorを読み取る関数
+
+    Args:
+        args (MultiDict): request.args
+
+    Returns:
+        tuple: (limit, offset)
+
+    Raises:
+        PaginationError: パラメータが不正な場合
+    """
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_LIMIT))
+    except ValueError:
+        raise PaginationError('limitは整数で指定してください')
+    if limit < 1:
+        raise PaginationError('limitは1以上で指定してください')
+
+    offset = 0
+    cursor = args.get('cursor')
+    if cursor:
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            offset = json.loads(base64.urlsafe_b64decode(padded).decode('utf-8'))['offset']
+            if not isinstance(offset, int) or offset < 0:
+                raise ValueError(offset)
+        except (ValueError, TypeError, KeyError):
+            raise PaginationError('カーソルの形式が不正です')
+    return min(limit, MAX_PAGE_LIMIT), offset
+
+def parse_fields(value, allowed):
+    """
+    fieldsパラメータから取得する列を決める関数
+
+    Args:
+        value (str): カンマ区切りのフィールド名（Noneの場合は全フィールド）
+        allowed (dict): フィールド名と列の対応
+
+    Returns:
+        list: 取得するフィールド名（指定順）
+
+    Raises:
+        PaginationError: 不明なフィールド名が含まれる場合
+    """
+    if not value:
+        return list(allowed)
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise PaginationError(f"不明なフィールドです: {', '.join(unknown)}")
+    return list(dict.fromkeys(fields))
+
+def parse_page_range(value):
+    """
+    pagesパラメータからページ番号の範囲を読み取る関数
+
+    "3..7"（3〜7ページ）、"3.."（3ページ以降）、"..7"（7ページまで）、"3"（3ページのみ）の形式を受け付けます。
+
+    Args:
+        value (str): pagesパラメータの値（Noneの場合は範囲を指定しない）
+
+    Returns:
+        tuple: (開始ページ番号, 終了ページ番号)。指定しない側はNone
+
+    Raises:
+        PaginationError: 形式が不正な場合
+    """
+    if not value:
+        return None, None
+    start, separator, end = value.partition('..')
+    if not separator:
+        end = start
+    try:
+        start = int(start) if start else None
+        end = int(end) if end else None
+    except ValueError:
+        raise PaginationError('pagesは"開始..終了"の形式で指定してください')
+    if (start is not None and start < 1) or (end is not None and end < 1):
+        raise PaginationError('pagesのページ番号は1以上で指定してください')
+    if start is not None and end is not None and start > end:
+        raise PaginationError('pagesの開始ページが終了ページより後になっています')
+    return start, end
+
+def apply_keyset(query, created_column, id_column, cursor):
+    """
+    (created_at, id)の降順でカーソル以降の行に絞り込む関数
+
+    カーソルの行の作成日時はデータベースから読み直して比較します。
+    SQLiteのserver_defaultのように、保存形式とバインドした値の形式が
+    異なる場合でも同じ作成日時の行を正しく比較するためです。
+    カーソルの行が削除されていた場合はカーソル内の作成日時を使います。
+
+    Args:
+        query (Query): 対象のクエリ
+        created_column (Column): 作成日時の列
+        id_column (Column): IDの列
+        cursor (tuple): decode_cursorの結果（Noneの場合は先頭から）
+
+    Returns:
+        Query: 並び順と絞り込みを適用したクエリ
+    """
+    if cursor is not None:
+        cursor_created_at, cursor_id = cursor
+        anchor = func.coalesce(
+            select(created_column).where(id_column == cursor_id).scalar_subquery(),
+            cursor_created_at
+        )
+        query = query.filter(or_(
+            created_column < anchor,
+            and_(created_column == anchor, id_column < cursor_id)
+        ))
+    return query.order_by(created_column.desc(), id_column.desc())
+
+def fetch_page(query, limit):
+    """
+    1ページ分の行と次のページの有無を取得する関数
+
+    limit+1件を取得し、余分な1件があれば次のページがあると判断します。
+
+    Args:
+        query (Query): apply_keysetを適用したクエリ
+        limit (int): 1ページの件数（Noneの場合は全件）
+
+    Returns:
+        tuple: (行のリスト, 次のページがある場合はTrue)
+    """
+    if limit is None:
+        return query.all(), False
+    rows = query.limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,159 @@
+"""
+圧縮されたリクエストボディの展開
+
+Content-Encoding: gzip（zstandardパッケージがある場合はzstdも）のリクエストボディを、
+Flaskがボディを読む前にWSGIの段階で展開します。
+
+- 圧縮されたボディを少しずつ読みながら展開し、一度に展開する量を制限する
+- 展開後のサイズが上限を超えた時点で展開を止めて413を返す（zip bomb対策）
+- 展開後のボディとContent-Lengthに置き換えるため、request.get_json()は通常どおり使える
+
+エラーのレスポンスはFlaskのbefore_requestで返すため、CORSのヘッダーも付きます。
+"""
+import io
+import os
+import zlib
+from flask import jsonify, request
+from werkzeug.wsgi import get_input_stream
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 展開時のエラーをFlaskに渡すためのenvironのキー
+ERROR_ENVIRON_KEY = 'request_decompression.error'
+
+# 一度に読み込む・展開するバイト数
+CHUNK_SIZE = 64 * 1024
+
+class DecompressedTooLarge(Exception):
+    """展開後のサイズが上限を超えた場合の例外クラス"""
+
+def load_decompression_config():
+    """
+    環境変数から展開の設定を読み込む関数
+
+    REQUEST_DECOMPRESSION_ENABLED: 'true'で圧縮されたボディを受け付ける（デフォルト: true）
+    REQUEST_DECOMPRESSION_MAX_BYTES: 展開後のボディの最大バイト数（デフォルト: 10MB）
+
+    Returns:
+        dict: 展開の設定
+    """
+    return {
+        'enabled': os.getenv('REQUEST_DECOMPRESSION_ENABLED', 'true').lower() == 'true',
+        'max_bytes': int(os.getenv('REQUEST_DECOMPRESSION_MAX_BYTES', str(10 * 1024 * 1024))),
+    }
+
+def _gzip_chunks(stream):
+    # wbits=47でgzipとzlibの両方の形式を自動判定する
+    decompressor = zlib.decompressobj(47)
+    while not decompressor.eof:
+        data = stream.read(CHUNK_SIZE)
+        if not data:
+            raise zlib.error('圧縮データが途中で終わっています')
+        # max_lengthで1回の展開量を制限し、残りはunconsumed_tailから続ける
+        while data:
+            chunk = decompressor.decompress(data, CHUNK_SIZE)
+            if chunk:
+                yield chunk
+            data = decompressor.unconsumed_tail
+            if decompressor.eof:
+                break
+
+def _zstd_chunks(stream):
+    reader = zstandard.ZstdDecompressor().stream_reader(stream, read_size=CHUNK_SIZE)
+    while True:
+        chunk = reader.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+def decompress_stream(encoding, stream, max_bytes):
+    """
+    圧縮されたストリームを上限付きで展開する関数
+
+    Args:
+        encoding (str): Content-Encodingの値（'gzip'または'zstd'）
+        stream: 圧縮されたボディを読み込むファイルライクオブジェクト
+        max_bytes (int): 展開後の最大バイト数
+
+    Returns:
+        bytes: 展開したボディ
+
+    Raises:
+        DecompressedTooLarge: 展開後のサイズが上限を超えた場合
+    """
+    chunks = _zstd_chunks(stream) if encoding == 'zstd' else _gzip_chunks(stream)
+    body = io.BytesIO()
+    for chunk in chunks:
+        if body.tell() + len(chunk) > max_bytes:
+            raise DecompressedTooLarge()
+        body.write(chunk)
+    return body.getvalue()
+
+class RequestDecompressor:
+    """
+    @docs
+    圧縮されたリクエストボディを展開するWSGIミドルウェア
+
+    Attributes:
+        config (dict): load_decompression_config()の形式の設定
+    """
+
+    def __init__(self, app=None, config=None):
+        self.config = config or load_decompression_config()
+        self.wsgi_app = None
+        if app is not None:
+            self.init_app(app)
+
+    def supported_encodings(self):
+        """
+        展開できるエンコーディングを返す
+
+        Returns:
+            list: エンコーディング名のリスト
+        """
+        return ['gzip', 'zstd'] if zstandard is not None else ['gzip']
+
+    def init_app(self, app):
+        """
+        WSGIミドルウェアとエラーを返すフックを登録する
+
+        Args:
+            app (Flask): 対象のアプリケーション
+        """
+        self.wsgi_app = app.wsgi_app
+        app.wsgi_app = self
+        app.before_request(self._reject_failed_request)
+
+    def __call__(self, environ, start_response):
+        encoding = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if self.config['enabled'] and encoding and encoding != 'identity':
+            self._decompress_environ(environ, encoding)
+        return self.wsgi_app(environ, start_response)
+
+    def _decompress_environ(self, environ, encoding):
+        if encoding not in self.supported_encodings():
+            environ[ERROR_ENVIRON_KEY] = (415, f'対応していないContent-Encodingです: {encoding}')
+            return
+        try:
+            body = decompress_stream(encoding, get_input_stream(environ), self.config['max_bytes'])
+        except DecompressedTooLarge:
+            environ[ERROR_ENVIRON_KEY] = (413, 'リクエストボディが大きすぎます')
+            return
+        except Exception:
+            environ[ERROR_ENVIRON_KEY] = (400, '圧縮されたリクエストボディを展開できません')
+            return
+
+        environ['wsgi.input'] = io.BytesIO(body)
+        environ['CONTENT_LENGTH'] = str(len(body))
+        environ.pop('HTTP_CONTENT_ENCODING', None)
+        environ.pop('HTTP_TRANSFER_ENCODING', None)
+
+    def _reject_failed_request(self):
+        error = request.environ.get(ERROR_ENVIRON_KEY)
+        if error is not None:
+            status, message = error
+            return jsonify({'error': message}), status
+        return None
@@ -0,0 +1,207 @@
+"""
+レスポンスの圧縮
+
+Accept-Encodingに応じてレスポンスをbrotliまたはgzipで圧縮します。
+brotliはパッケージがインストールされている場合のみ使用します。
+
+- 最小サイズ未満のレスポンスやJSON・テキスト以外のレスポンスは圧縮しない
+- ストリーミングのレスポンスはチャンクごとに圧縮し、全体をバッファしない
+- エンドポイントごとの圧縮前後のバイト数を記録する（stats()で取得）
+- 圧縮したレスポンスの強いETagは弱いETagにし、Vary: Accept-Encodingでキャッシュを分ける
+"""
+import os
+import threading
+import zlib
+from collections import defaultdict
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 圧縮対象のContent-Type
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'text/',
+)
+
+def load_compression_config():
+    """
+    環境変数から圧縮の設定を読み込む関数
+
+    RESPONSE_COMPRESSION_ENABLED: 'true'で圧縮する（デフォルト: true）
+    RESPONSE_COMPRESSION_MIN_BYTES: これより小さいレスポンスは圧縮しない（デフォルト: 1024）
+    RESPONSE_COMPRESSION_GZIP_LEVEL: gzipの圧縮レベル1〜9（デフォルト: 6）
+    RESPONSE_COMPRESSION_BROTLI_QUALITY: brotliの品質0〜11（デフォルト: 4）
+
+    Returns:
+        dict: 圧縮の設定
+    """
+    return {
+        'enabled': os.getenv('RESPONSE_COMPRESSION_ENABLED', 'true').lower() == 'true',
+        'min_bytes': int(os.getenv('RESPONSE_COMPRESSION_MIN_BYTES', '1024')),
+        'gzip_level': int(os.getenv('RESPONSE_COMPRESSION_GZIP_LEVEL', '6')),
+        'brotli_quality': int(os.getenv('RESPONSE_COMPRESSION_BROTLI_QUALITY', '4')),
+    }
+
+class _GzipEncoder:
+    def __init__(self, level):
+        # wbits=31でgzip形式のヘッダーとフッターを付ける
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+class _BrotliEncoder:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.finish()
+
+class ResponseCompressor:
+    """
+    @docs
+    Accept-Encodingに応じてレスポンスを圧縮するクラス
+
+    Attributes:
+        config (dict): load_compression_config()の形式の設定
+    """
+
+    def __init__(self, app=None, config=None):
+        self.config = config or load_compression_config()
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {'responses': 0, 'bytes_in': 0, 'bytes_out': 0})
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        レスポンスを圧縮するフックを登録する
+
+        Args:
+            app (Flask): 対象のアプリケーション
+        """
+        app.after_request(self.compress_response)
+
+    def available_encodings(self):
+        """
+        使用できるエンコーディングを優先順に返す
+
+        Returns:
+            list: エンコーディング名のリスト
+        """
+        return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    def _choose_encoding(self):
+        return request.accept_encodings.best_match(self.available_encodings())
+
+    def _new_encoder(self, encoding):
+        if encoding == 'br':
+            return _BrotliEncoder(self.config['brotli_quality'])
+        return _GzipEncoder(self.config['gzip_level'])
+
+    def _should_compress(self, response):
+        if not self.config['enabled'] or response.direct_passthrough:
+            return False
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        if 'Content-Encoding' in response.headers:
+            return False
+        mimetype = response.mimetype or ''
+        if not mimetype.startswith(COMPRESSIBLE_TYPES):
+            return False
+        if not response.is_streamed and response.content_length is not None \
+                and response.content_length < self.config['min_bytes']:
+            return False
+        return True
+
+    def _record(self, endpoint, bytes_in, bytes_out):
+        with self._lock:
+            stats = self._stats[endpoint or 'unknown']
+            stats['responses'] += 1
+            stats['bytes_in'] += bytes_in
+            stats['bytes_out'] += bytes_out
+
+    def compress_response(self, response):
+        """
+        レスポンスを圧縮する（after_requestのフック）
+
+        Args:
+            response (Response): 元のレスポンス
+
+        Returns:
+            Response: 圧縮したレスポンス（対象外の場合は元のレスポンス）
+        """
+        if not self._should_compress(response):
+            return response
+        response.vary.add('Accept-Encoding')
+
+        encoding = self._choose_encoding()
+        if not encoding:
+            return response
+
+        endpoint = request.endpoint
+        if response.is_streamed:
+            response.response = self._compress_stream(response.response, encoding, endpoint)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.config['min_bytes']:
+                return response
+            encoder = self._new_encoder(encoding)
+            compressed = encoder.compress(data) + encoder.flush()
+            response.set_data(compressed)
+            self._record(endpoint, len(data), len(compressed))
+
+        response.headers['Content-Encoding'] = encoding
+        # 強いETagはエンコーディングごとに異なる必要があるため（RFC 9110 8.8.3）弱いETagにする。
+        # 304のレスポンスにも同じ弱いETagを返すよう、アプリのETagは初めから弱いETagにしている
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def _compress_stream(self, chunks, encoding, endpoint):
+        encoder = self._new_encoder(encoding)
+        bytes_in = 0
+        bytes_out = 0
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                bytes_in += len(chunk)
+                compressed = encoder.compress(chunk)
+                if compressed:
+                    bytes_out += len(compressed)
+                    yield compressed
+            tail = encoder.flush()
+            bytes_out += len(tail)
+            yield tail
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+            self._record(endpoint, bytes_in, bytes_out)
+
+    def stats(self):
+        """
+        エンドポイントごとの圧縮の統計情報を取得する
+
+        Returns:
+            dict: エンドポイント名と、レスポンス数・圧縮前後のバイト数・圧縮率
+        """
+        with self._lock:
+            return {
+                endpoint: dict(values, ratio=round(values['bytes_out'] / values['bytes_in'], 4)
+                               if values['bytes_in'] else None)
+                for endpoint, values in self._stats.items()
+            }
@@ -10,3 +10,4 @@ from .bookmarks import bookmarks_bp
 from . import notes  # ノート管理API
 from . import ocr    # OCR API
 from . import tts    # TTS API
+from . import search  # 全文検索API
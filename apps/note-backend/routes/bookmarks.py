@@ -1,10 +1,11 @@
 from flask import jsonify, request, Blueprint
-from database import Session
-from models import Note, Page, Bookmark
+from models import Page, Bookmark
 from datetime import datetime
-from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import SQLAlchemyError
 from logger import logger
+from auth_middleware import require_auth
+from .note_access import require_note_owner
+from page_order import page_id_at, page_number_of
 
 # ブループリントの作成
 bookmarks_bp = Blueprint('bookmarks', __name__)
@@ -27,34 +28,40 @@ def handle_db_error(error):
     logger.error(f"Database error: {str(error)}")
     return jsonify({'error': 'データベース操作中にエラーが発生しました'}), 500
 
+def current_page_number(db, page_id):
+    """
+    しおりのページの現在のページ番号を取得する関数
+
+    ページ番号はページの位置の順序から計算するため、しおりの作成後に
+    ページの挿入・移動・削除があると作成時のページ番号とは異なります。
+    """
+    return db.query(page_number_of()).filter(Page.id == page_id).scalar()
+
 @bookmarks_bp.route('/notes/<int:note_id>/bookmarks', methods=['GET'])
-def get_bookmarks(note_id):
+@require_auth
+@require_note_owner()
+def get_bookmarks(note_id, db, note):
     """指定されたノートのすべてのしおりを取得するエンドポイント"""
     try:
         logger.info(f"ノートID={note_id}のしおり一覧リクエストを受信")
-        db = Session()
-        
-        # ノートの存在確認
-        note = db.query(Note).filter(Note.id == note_id).first()
-        if not note:
-            logger.warning(f"ノートID={note_id}が見つかりません")
-            raise BookmarkError(f'ノートID={note_id}が見つかりません', 404)
-        
-        # ノートに関連するしおりを取得
-        bookmarks = db.query(Bookmark).filter(Bookmark.note_id == note_id).all()
+
+        # ノートに関連するしおりを現在のページ番号と一緒に取得
+        bookmarks = db.query(Bookmark, page_number_of()).join(
+            Page, Page.id == Bookmark.page_id
+        ).filter(Bookmark.note_id == note_id).all()
         
         # しおりの情報をJSONに変換
         result = [{
             'id': bookmark.id,
             'note_id': bookmark.note_id,
             'page_id': bookmark.page_id,
-            'page_number': bookmark.page_number,
+            'page_number': page_number,
             'position_x': bookmark.position_x,
             'position_y': bookmark.position_y,
-            'title': bookmark.title or f'ページ {bookmark.page_number}',
+            'title': bookmark.title or f'ページ {page_number}',
             'is_favorite': bookmark.is_favorite,
-            'created_at': bookmark.created_at.isoformat()
-        } for bookmark in bookmarks]
+            'created_at': bookmark.created_at
+        } for bookmark, page_number in bookmarks]
         
         logger.info(f"ノートID={note_id}のしおり{len(result)}件を取得しました")
         return jsonify(result)
@@ -66,7 +73,9 @@ def get_bookmarks(note_id):
         raise BookmarkError(f'しおり一覧の取得に失敗しました: {str(e)}', 500)
 
 @bookmarks_bp.route('/notes/<int:note_id>/bookmarks', methods=['POST'])
-def create_bookmark(note_id):
+@require_auth
+@require_note_owner()
+def create_bookmark(note_id, db, note):
     """新しいしおりを作成するエンドポイント"""
     try:
         logger.info(f"ノートID={note_id}のしおり作成リクエストを受信")
@@ -77,20 +86,10 @@ def create_bookmark(note_id):
             logger.warning("ページ番号が指定されていません")
             raise BookmarkError('ページ番号は必須です')
         
-        db = Session()
-        
-        # ノートの存在確認
-        note = db.query(Note).filter(Note.id == note_id).first()
-        if not note:
-            logger.warning(f"ノートID={note_id}が見つかりません")
-            raise BookmarkError(f'ノートID={note_id}が見つかりません', 404)
-        
+
         # ページの存在確認
         page_number = int(data['page_number'])
-        page = db.query(Page).filter(
-            Page.note_id == note_id, 
-            Page.page_number == page_number
-        ).first()
+        page = db.query(Page).filter(Page.id == page_id_at(note_id, page_number)).first()
         
         if not page:
             logger.warning(f"ノートID={note_id}のページ{page_number}が見つかりません")
@@ -114,12 +113,12 @@ def create_bookmark(note_id):
             'id': bookmark.id,
             'note_id': bookmark.note_id,
             'page_id': bookmark.page_id,
-            'page_number': bookmark.page_number,
+            'page_number': page_number,
             'position_x': bookmark.position_x,
             'position_y': bookmark.position_y,
-            'title': bookmark.title or f'ページ {bookmark.page_number}',
+            'title': bookmark.title or f'ページ {page_number}',
             'is_favorite': bookmark.is_favorite,
-            'created_at': bookmark.created_at.isoformat()
+            'created_at': bookmark.created_at
         }
         
         logger.info(f"ノートID={note_id}のページ{page_number}にしおりを作成しました: ID={bookmark.id}")
@@ -132,12 +131,13 @@ def create_bookmark(note_id):
         raise BookmarkError(f'しおりの作成に失敗しました: {str(e)}', 500)
 
 @bookmarks_bp.route('/notes/<int:note_id>/bookmarks/<int:bookmark_id>', methods=['GET'])
-def get_bookmark(note_id, bookmark_id):
+@require_auth
+@require_note_owner()
+def get_bookmark(note_id, bookmark_id, db, note):
     """指定されたしおりを取得するエンドポイント"""
     try:
         logger.info(f"ノートID={note_id}のしおりID={bookmark_id}のリクエストを受信")
-        db = Session()
-        
+
         # しおりの存在確認と取得
         bookmark = db.query(Bookmark).filter(
             Bookmark.note_id == note_id,
@@ -148,16 +148,17 @@ def get_bookmark(note_id, bookmark_id):
             logger.warning(f"ノートID={note_id}のしおりID={bookmark_id}が見つかりません")
             raise BookmarkError(f'指定されたしおりが見つかりません', 404)
         
+        page_number = current_page_number(db, bookmark.page_id)
         result = {
             'id': bookmark.id,
             'note_id': bookmark.note_id,
             'page_id': bookmark.page_id,
-            'page_number': bookmark.page_number,
+            'page_number': page_number,
             'position_x': bookmark.position_x,
             'position_y': bookmark.position_y,
-            'title': bookmark.title or f'ページ {bookmark.page_number}',
+            'title': bookmark.title or f'ページ {page_number}',
             'is_favorite': bookmark.is_favorite,
-            'created_at': bookmark.created_at.isoformat()
+            'created_at': bookmark.created_at
         }
         
         logger.info(f"しおりID={bookmark_id}の情報を取得しました")
@@ -170,7 +171,9 @@ def get_bookmark(note_id, bookmark_id):
         raise BookmarkError(f'しおりの取得に失敗しました: {str(e)}', 500)
 
 @bookmarks_bp.route('/notes/<int:note_id>/bookmarks/<int:bookmark_id>', methods=['PUT'])
-def update_bookmark(note_id, bookmark_id):
+@require_auth
+@require_note_owner()
+def update_bookmark(note_id, bookmark_id, db, note):
     """指定されたしおりを更新するエンドポイント"""
     try:
         logger.info(f"ノートID={note_id}のしおりID={bookmark_id}の更新リクエストを受信")
@@ -180,8 +183,7 @@ def update_bookmark(note_id, bookmark_id):
             logger.warning("更新データが指定されていません")
             raise BookmarkError('更新データは必須です')
         
-        db = Session()
-        
+
         # しおりの存在確認と取得
         bookmark = db.query(Bookmark).filter(
             Bookmark.note_id == note_id,
@@ -204,16 +206,17 @@ def update_bookmark(note_id, bookmark_id):
         
         db.commit()
         
+        page_number = current_page_number(db, bookmark.page_id)
         result = {
             'id': bookmark.id,
             'note_id': bookmark.note_id,
             'page_id': bookmark.page_id,
-            'page_number': bookmark.page_number,
+            'page_number': page_number,
             'position_x': bookmark.position_x,
             'position_y': bookmark.position_y,
-            'title': bookmark.title or f'ページ {bookmark.page_number}',
+            'title': bookmark.title or f'ページ {page_number}',
             'is_favorite': bookmark.is_favorite,
-            'created_at': bookmark.created_at.isoformat()
+            'created_at': bookmark.created_at
         }
         
         logger.info(f"しおりID={bookmark_id}を更新しました")
@@ -226,12 +229,13 @@ def update_bookmark(note_id, bookmark_id):
         raise BookmarkError(f'しおりの更新に失敗しました: {str(e)}', 500)
 
 @bookmarks_bp.route('/notes/<int:note_id>/bookmarks/<int:bookmark_id>', methods=['DELETE'])
-def delete_bookmark(note_id, bookmark_id):
+@require_auth
+@require_note_owner()
+def delete_bookmark(note_id, bookmark_id, db, note):
     """指定されたしおりを削除するエンドポイント"""
     try:
         logger.info(f"ノートID={note_id}のしおりID={bookmark_id}の削除リクエストを受信")
-        db = Session()
-        
+
         # しおりの存在確認と取得
         bookmark = db.query(Bookmark).filter(
             Bookmark.note_id == note_id,
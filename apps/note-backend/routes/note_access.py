@@ -0,0 +1,188 @@
+"""
+ノートの所有権チェック付きローダー
+
+ノート、所有権、必要に応じてページを1回のSQLで取得し、
+ハンドラーに渡すデコレータを提供します。
+"""
+import hashlib
+from functools import wraps
+from flask import jsonify, make_response, request
+from sqlalchemy import and_
+from database import Session, ReadSession
+from db_routing import is_read_request
+from models import Note, Page
+from page_order import page_id_at
+from logger import logger
+
+def note_etag(note_id, note_version, page_versions, variant=''):
+    """
+    ページを含むノートのETagを作成する関数
+
+    Args:
+        note_id (int): ノートID
+        note_version (int): ノートのバージョン
+        page_versions (iterable): ページの(ID, バージョン)の組
+        variant (str): レスポンスの形を変えるクエリパラメータを正規化した文字列
+
+    Returns:
+        str: ETagの値
+    """
+    pages = ','.join(f'{page_id}:{version}' for page_id, version in sorted(page_versions))
+    digest = hashlib.sha1(f'{pages}|{variant}'.encode('utf-8')).hexdigest()[:16]
+    return f'note-{note_id}-{note_version}-{digest}'
+
+def page_etag(note_id, page_number, page_id, page_version):
+    """
+    ページのETagを作成する関数
+
+    ページが存在しない場合（空のページを返す場合）もページ番号ごとのETagを返します。
+
+    Args:
+        note_id (int): ノートID
+        page_number (int): ページ番号
+        page_id (int): ページID（存在しない場合はNone）
+        page_version (int): ページのバージョン
+
+    Returns:
+        str: ETagの値
+    """
+    if page_id is None:
+        return f'page-{note_id}-{page_number}-empty'
+    return f'page-{page_id}-{page_version}'
+
+def not_modified_response(etag):
+    """
+    If-None-MatchがETagと一致する場合に304のレスポンスを返す関数
+
+    ETagはバージョンから作るためレスポンスのバイト列（圧縮の有無）を区別しない。
+    200と304のどちらのレスポンスでも弱いETagとして返します。
+
+    Args:
+        etag (str): 現在のETag
+
+    Returns:
+        Response: 一致する場合は304のレスポンス、それ以外はNone
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = make_response('', 304)
+    response.set_etag(etag, weak=True)
+    return response
+
+def _check_not_modified(db, note_id, user_id, load_pages, page_number, variant):
+    # 本文の列を読まずに所有者とバージョンだけを取得してETagを比較する
+    if page_number is not None:
+        row = db.query(Note.user_id, Note.version, Page.id, Page.version).outerjoin(Page, and_(
+            Page.note_id == Note.id,
+            Page.id == page_id_at(note_id, page_number)
+        )).filter(Note.id == note_id).first()
+        if not row or row[0] != user_id:
+            return None
+        return not_modified_response(page_etag(note_id, page_number, row[2], row[3]))
+
+    query = db.query(Note.user_id, Note.version)
+    if load_pages:
+        query = query.add_columns(Page.id, Page.version).outerjoin(Page, Page.note_id == Note.id)
+    rows = query.filter(Note.id == note_id).all()
+    if not rows or rows[0][0] != user_id:
+        return None
+    page_versions = [(row[2], row[3]) for row in rows if load_pages and row[2] is not None]
+    return not_modified_response(note_etag(note_id, rows[0][1], page_versions, variant))
+
+def require_note_owner(load_pages=False, page_number=None, conditional=False, etag_variant=None):
+    """
+    ノートの所有者であることを必要とするエンドポイントのためのデコレータ
+
+    URLの`note_id`のノートを取得し、ログインユーザーが所有者でなければ
+    404または403を返します。`require_auth`の内側で使用してください。
+
+    GETリクエストでは読み取り用のセッションを使用します。
+
+    `conditional`を指定したGETリクエストでは、レスポンスにETagを付け、
+    If-None-Matchが一致する場合は本文の列を読まずに304を返します。
+    クエリパラメータでレスポンスの形が変わる場合は`etag_variant`でETagに含めてください。
+
+    ハンドラーにはキーワード引数として以下が渡されます:
+        db: ノートを取得したセッション（ハンドラー終了後に閉じられる）
+        note: 取得したノート
+        page: `page_number`を指定した場合のページ（存在しない場合はNone）
+
+    Args:
+        load_pages (bool): Trueの場合はETagに全ページのバージョンを含める（本文の列は読まない）
+        page_number (str): ページ番号として使うURL引数の名前
+        conditional (bool): Trueの場合はGETリクエストでETagによる条件付き取得を行う
+        etag_variant (callable): リクエストのクエリパラメータを受け取り、ETagに含める文字列を返す関数
+
+    Returns:
+        decorator: 所有権チェック付きのデコレータ
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            user_id = request.firebase_token.get('uid')
+            if not user_id:
+                logger.error("ユーザーIDが取得できません")
+                return jsonify({'error': '認証エラー'}), 401
+
+            note_id = kwargs['note_id']
+            db = ReadSession() if is_read_request() else Session()
+            conditional_get = conditional and request.method == 'GET'
+            variant = etag_variant(request.args) if conditional_get and etag_variant else ''
+            try:
+                if conditional_get and request.if_none_match:
+                    response = _check_not_modified(
+                        db, note_id, user_id, load_pages,
+                        kwargs[page_number] if page_number is not None else None,
+                        variant
+                    )
+                    if response is not None:
+                        return response
+
+                if page_number is not None:
+                    query = db.query(Note, Page).outerjoin(Page, and_(
+                        Page.note_id == Note.id,
+                        Page.id == page_id_at(note_id, kwargs[page_number])
+                    ))
+                else:
+                    query = db.query(Note)
+
+                row = query.filter(Note.id == note_id).first()
+                if page_number is not None:
+                    note, page = row if row else (None, None)
+                else:
+                    note, page = row, None
+
+                if not note:
+                    logger.warning(f"ノートが見つかりません: ID={note_id}")
+                    return jsonify({'error': '指定されたノートが見つかりません'}), 404
+
+                if note.user_id != user_id:
+                    logger.warning(f"ノートへのアクセス権限がありません: ID={note_id}, リクエストユーザー={user_id}, ノート所有者={note.user_id}")
+                    return jsonify({'error': 'このノートへのアクセス権限がありません'}), 403
+
+                etag = None
+                if conditional_get:
+                    if page_number is not None:
+                        etag = page_etag(note_id, kwargs[page_number],
+                                         page.id if page else None, page.version if page else None)
+                    else:
+                        page_versions = db.query(Page.id, Page.version).filter(
+                            Page.note_id == note_id
+                        ).all() if load_pages else []
+                        etag = note_etag(note_id, note.version, page_versions, variant)
+
+                kwargs['db'] = db
+                kwargs['note'] = note
+                if page_number is not None:
+                    kwargs['page'] = page
+                if etag is None:
+                    return f(*args, **kwargs)
+
+                response = make_response(f(*args, **kwargs))
+                if response.status_code == 200:
+                    response.set_etag(etag, weak=True)
+                return response
+            finally:
+                db.close()
+        return decorated_function
+    return decorator
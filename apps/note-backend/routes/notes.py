@@ -1,12 +1,24 @@
+import json
 from flask import jsonify, request
 from . import notes_bp
-from database import Session
-from models import Note, Page
+from database import Session, ReadSession
+from models import CategorySummary, Note, Page
 from datetime import datetime
-from sqlalchemy.orm import joinedload
+from sqlalchemy import func
 from sqlalchemy.exc import SQLAlchemyError
 from logger import logger
 from auth_middleware import require_auth, check_resource_ownership
+from .note_access import require_note_owner, page_etag
+from canvas_patch import PatchError, apply_canvas_operations, apply_json_patch, load_canvas
+from json_stream import iter_json_object, json_stream_response, stream_rows
+from page_order import append_position, ordered, page_number_of, position_for
+from page_upsert import BatchError, parse_batch, upsert_pages
+from search_index import index_note, index_pages
+from category_summary import add_to_category, move_category, remove_from_categories
+from pagination import (
+    NEXT_CURSOR_HEADER, PaginationError, apply_keyset, encode_cursor, fetch_page,
+    parse_fields, parse_page_params, parse_page_range
+)
 
 class NoteError(Exception):
     """ノート操作に関するカスタム例外クラス"""
@@ -54,6 +66,10 @@ def create_note():
                 user_id=user_id  # ユーザーIDを設定
             )
             db.add(note)
+            db.flush()
+            index_note(db, note)
+            add_to_category(db, CategorySummary.__table__, user_id,
+                            note.main_category, note.sub_category, datetime.utcnow())
             db.commit()
             
             logger.info(f"ノートを作成しました: ID={note.id}, ユーザーID={user_id}")
@@ -62,8 +78,8 @@ def create_note():
                 'title': note.title,
                 'main_category': note.main_category,
                 'sub_category': note.sub_category,
-                'created_at': note.created_at.isoformat(),
-                'updated_at': note.updated_at.isoformat(),
+                'created_at': note.created_at,
+                'updated_at': note.updated_at,
                 'user_id': note.user_id
             }), 201
             
@@ -80,134 +96,209 @@ def create_note():
             return jsonify({'error': 'サーバーエラーが発生しました'}), 500
         raise
 
+# 一括削除で一度に指定できる最大ノート数
+MAX_BULK_DELETE_NOTES = 100
+
+# 一覧で返すフィールドと列の対応（fieldsパラメータで絞り込める）
+NOTE_LIST_FIELDS = {
+    'id': Note.id,
+    'title': Note.title,
+    'main_category': Note.main_category,
+    'sub_category': Note.sub_category,
+    'created_at': Note.created_at,
+    'updated_at': Note.updated_at,
+    'user_id': Note.user_id,
+}
+
 @notes_bp.route('/notes', methods=['GET'])
 @require_auth
 def get_notes():
-    """ログインユーザーのノート一覧を取得するエンドポイント"""
+    """
+    ログインユーザーのノート一覧を取得するエンドポイント
+
+    クエリパラメータ:
+        limit: 1ページの件数（指定した場合はページネーションする）
+        cursor: 前のページのレスポンスのX-Next-Cursorヘッダーの値
+        fields: 返すフィールド（カンマ区切り、省略時は全フィールド）
+    """
     try:
         # 認証済みユーザーからユーザーIDを取得
         user_id = request.firebase_token.get('uid')
         if not user_id:
             logger.error("ユーザーIDが取得できません")
             raise NoteError('認証エラー', 401)
-            
-        with Session() as session:
-            # ログインユーザーのノートのみ取得
-            notes = session.query(Note).filter(Note.user_id == user_id).order_by(Note.created_at.desc()).all()
-            return jsonify([{
-                'id': note.id,
-                'title': note.title,
-                'main_category': note.main_category,
-                'sub_category': note.sub_category,
-                'created_at': note.created_at.isoformat(),
-                'updated_at': note.updated_at.isoformat(),
-                'user_id': note.user_id
-            } for note in notes])
+
+        try:
+            limit, cursor = parse_page_params(request.args)
+            fields = parse_fields(request.args.get('fields'), NOTE_LIST_FIELDS)
+        except PaginationError as e:
+            # require_authが例外を500にするため、ここでレスポンスを返す
+            logger.warning(f"ノート一覧のパラメータが不正です: {str(e)}")
+            return jsonify({'error': str(e)}), 400
+
+        with ReadSession() as session:
+            # 指定されたフィールドの列のみ取得（カーソル用にidとcreated_atは常に取得）
+            columns = [Note.id, Note.created_at] + [
+                NOTE_LIST_FIELDS[name] for name in fields if name not in ('id', 'created_at')
+            ]
+            query = session.query(*columns).filter(Note.user_id == user_id)
+            rows, has_more = fetch_page(apply_keyset(query, Note.created_at, Note.id, cursor), limit)
+
+            notes = [{name: row._mapping[NOTE_LIST_FIELDS[name]] for name in fields} for row in rows]
+
+            response = jsonify(notes)
+            if has_more:
+                last = rows[-1]
+                response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
+            return response
     except SQLAlchemyError as e:
         logger.error(f"Failed to fetch notes: {e}")
         raise
 
-@notes_bp.route('/notes/<int:note_id>', methods=['GET'])
+@notes_bp.route('/notes/categories', methods=['GET'])
 @require_auth
-def get_note(note_id):
-    """指定されたIDのノートを取得するエンドポイント"""
-    logger.info(f"ノート取得リクエスト: ID={note_id}")
-    
-    # 認証済みユーザーからユーザーIDを取得
+def get_note_categories():
+    """
+    ログインユーザーのカテゴリごとのノート数を取得するエンドポイント
+
+    ノートの一覧は読まず、集計テーブル（CategorySummary）だけを読みます。
+    結果はメインカテゴリ・サブカテゴリの順に並びます。
+    """
     user_id = request.firebase_token.get('uid')
     if not user_id:
         logger.error("ユーザーIDが取得できません")
         return jsonify({'error': '認証エラー'}), 401
-        
-    db = Session()
+
     try:
-        note = db.query(Note).options(joinedload(Note.pages)).filter(Note.id == note_id).first()
-        
-        if not note:
-            logger.warning(f"ノートが見つかりません: ID={note_id}")
-            raise NoteError('指定されたノートが見つかりません', 404)
-        
-        # ノートの所有者チェック
-        if note.user_id != user_id:
-            logger.warning(f"ノートへのアクセス権限がありません: ID={note_id}, リクエストユーザー={user_id}, ノート所有者={note.user_id}")
-            raise NoteError('このノートへのアクセス権限がありません', 403)
-            
-        logger.info(f"ノートを取得しました: ID={note_id}")
-        return jsonify({
+        with ReadSession() as session:
+            rows = session.query(
+                CategorySummary.main_category, CategorySummary.sub_category,
+                CategorySummary.item_count, CategorySummary.last_updated_at
+            ).filter(CategorySummary.user_id == user_id).order_by(
+                CategorySummary.main_category, CategorySummary.sub_category
+            ).all()
+    except SQLAlchemyError as e:
+        logger.error(f"データベースエラー: {str(e)}")
+        return jsonify({'error': 'データベース操作中にエラーが発生しました'}), 500
+
+    return jsonify([{
+        'main_category': main_category,
+        'sub_category': sub_category,
+        'count': item_count,
+        'last_updated_at': last_updated_at
+    } for main_category, sub_category, item_count, last_updated_at in rows])
+
+# get_noteのincludeパラメータで指定できる値
+NOTE_INCLUDE_OPTIONS = ('pages', 'pages_meta', 'none')
+
+def note_etag_variant(args):
+    """
+    get_noteのETagに含めるincludeとpagesを正規化する関数
+
+    同じノートでもincludeとpagesによってレスポンスが変わるため、ETagを分けます。
+    不正な値はそのまま含め（レスポンスは400になるため一致するETagはない）、
+    省略時と既定値の指定は同じ文字列にします。
+    """
+    include = args.get('include', 'pages')
+    try:
+        start, end = parse_page_range(args.get('pages'))
+        pages = f"{start or 1}..{end or ''}"
+    except PaginationError:
+        pages = args.get('pages', '')
+    return f'include={include};pages={pages}'
+
+@notes_bp.route('/notes/<int:note_id>', methods=['GET'])
+@require_auth
+@require_note_owner(load_pages=True, conditional=True, etag_variant=note_etag_variant)
+def get_note(note_id, db, note):
+    """
+    指定されたIDのノートを取得するエンドポイント
+
+    クエリパラメータ:
+        include: pages（デフォルト、本文を含む全項目）、pages_meta（本文を除くページ情報）、none（ページなし）
+        pages: 返すページ番号の範囲（例: 3..7）
+
+    pages_metaとnoneではページの本文の列を読み込みません。
+    page_countには範囲に関係なくノートの全ページ数を返します。
+    """
+    logger.info(f"ノート取得リクエスト: ID={note_id}")
+    include = request.args.get('include', 'pages')
+    if include not in NOTE_INCLUDE_OPTIONS:
+        logger.warning(f"不正なincludeパラメータ: {include}")
+        return jsonify({'error': f"includeは{', '.join(NOTE_INCLUDE_OPTIONS)}のいずれかで指定してください"}), 400
+    try:
+        start, end = parse_page_range(request.args.get('pages'))
+    except PaginationError as e:
+        logger.warning(f"不正なpagesパラメータ: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        result = {
             'id': note.id,
             'title': note.title,
             'main_category': note.main_category,
             'sub_category': note.sub_category,
-            'paper_size': note.paper_size,
-            'orientation': note.orientation,
-            'color': note.color,
-            'last_edited_page': note.last_edited_page,
-            'created_at': note.created_at.isoformat(),
-            'updated_at': note.updated_at.isoformat(),
+            'created_at': note.created_at,
+            'updated_at': note.updated_at,
             'user_id': note.user_id,
-            'pages': [{
-                'id': page.id,
-                'page_number': page.page_number,
-                'content': page.content,
-                'layout_settings': page.layout_settings
-            } for page in note.pages]
-        })
+            'version': note.version,
+            'page_count': db.query(func.count(Page.id)).filter(Page.note_id == note_id).scalar()
+        }
+
+        if include == 'none':
+            logger.info(f"ノートを取得しました: ID={note_id}, include={include}")
+            return jsonify(result)
+
+        columns = [Page.id, Page.version, Page.layout_settings]
+        if include == 'pages':
+            columns.append(Page.content)
+        first = start or 1
+
+        def page_query(session):
+            # ページ番号は位置の順序から計算するため、範囲はOFFSETとLIMITで指定する
+            query = ordered(session.query(*columns).filter(Page.note_id == note_id)).offset(first - 1)
+            if end is not None:
+                query = query.limit(end - first + 1)
+            return query
+
+        # ページは1行ずつ取得して書き出し、ノート全体をメモリに持たない
+        logger.info(f"ノートを取得しました: ID={note_id}, include={include}")
+        rows = stream_rows(ReadSession.session_factory, page_query, lambda row: row._asdict())
+        pages = (dict(row, page_number=number) for number, row in enumerate(rows, first))
+        return json_stream_response(iter_json_object(result, 'pages', pages))
     except Exception as e:
         logger.error(f"エラー: {str(e)}")
         if not isinstance(e, (NoteError, SQLAlchemyError)):
             return jsonify({'error': 'サーバーエラーが発生しました'}), 500
         raise
-    finally:
-        db.close()
 
 @notes_bp.route('/notes/<int:note_id>', methods=['PUT'])
 @require_auth
-def update_note(note_id):
+@require_note_owner()
+def update_note(note_id, db, note):
     """指定されたIDのノートを更新するエンドポイント"""
     try:
         logger.info(f"ノート更新リクエスト: ID={note_id}")
-        
-        # 認証済みユーザーからユーザーIDを取得
-        user_id = request.firebase_token.get('uid')
-        if not user_id:
-            logger.error("ユーザーIDが取得できません")
-            return jsonify({'error': '認証エラー'}), 401
-            
         data = request.get_json()
         
         if not data:
             logger.warning("データが必要です")
             raise NoteError('データが必要です')
             
-        db = Session()
         try:
-            note = db.query(Note).filter(Note.id == note_id).first()
-            
-            if not note:
-                logger.warning(f"ノートが見つかりません: ID={note_id}")
-                raise NoteError('指定されたノートが見つかりません', 404)
-            
-            # ノートの所有者チェック
-            if note.user_id != user_id:
-                logger.warning(f"ノートへの更新権限がありません: ID={note_id}, リクエストユーザー={user_id}, ノート所有者={note.user_id}")
-                raise NoteError('このノートへの更新権限がありません', 403)
-                
+            old_category = (note.main_category, note.sub_category)
             if 'title' in data:
                 note.title = data['title']
             if 'main_category' in data:
                 note.main_category = data['main_category']
             if 'sub_category' in data:
                 note.sub_category = data['sub_category']
-            if 'paper_size' in data:
-                note.paper_size = data['paper_size']
-            if 'orientation' in data:
-                note.orientation = data['orientation']
-            if 'color' in data:
-                note.color = data['color']
-            if 'last_edited_page' in data:
-                note.last_edited_page = data['last_edited_page']
                 
             note.updated_at = datetime.utcnow()
+            if {'title', 'main_category', 'sub_category'} & data.keys():
+                index_note(db, note)
+            move_category(db, CategorySummary.__table__, note.user_id, old_category,
+                          (note.main_category, note.sub_category), note.updated_at)
             db.commit()
             
             logger.info(f"ノートを更新しました: ID={note_id}")
@@ -216,12 +307,8 @@ def update_note(note_id):
                 'title': note.title,
                 'main_category': note.main_category,
                 'sub_category': note.sub_category,
-                'paper_size': note.paper_size,
-                'orientation': note.orientation,
-                'color': note.color,
-                'last_edited_page': note.last_edited_page,
-                'created_at': note.created_at.isoformat(),
-                'updated_at': note.updated_at.isoformat(),
+                'created_at': note.created_at,
+                'updated_at': note.updated_at,
                 'user_id': note.user_id
             })
             
@@ -229,8 +316,6 @@ def update_note(note_id):
             db.rollback()
             logger.error(f"データベースエラー: {str(e)}")
             raise
-        finally:
-            db.close()
             
     except Exception as e:
         logger.error(f"予期せぬエラー: {str(e)}")
@@ -240,31 +325,20 @@ def update_note(note_id):
 
 @notes_bp.route('/notes/<int:note_id>', methods=['DELETE'])
 @require_auth
-def delete_note(note_id):
-    """指定されたIDのノートを削除するエンドポイント"""
+@require_note_owner()
+def delete_note(note_id, db, note):
+    """
+    指定されたIDのノートを削除するエンドポイント
+
+    ページとしおりはデータベースのON DELETE CASCADEで削除されるため、
+    ページの内容を読み込まずに1つのDELETE文で削除します。
+    """
     try:
         logger.info(f"ノート削除リクエスト: ID={note_id}")
-        
-        # 認証済みユーザーからユーザーIDを取得
-        user_id = request.firebase_token.get('uid')
-        if not user_id:
-            logger.error("ユーザーIDが取得できません")
-            return jsonify({'error': '認証エラー'}), 401
-            
-        db = Session()
         try:
-            note = db.query(Note).filter(Note.id == note_id).first()
-            
-            if not note:
-                logger.warning(f"ノートが見つかりません: ID={note_id}")
-                raise NoteError('指定されたノートが見つかりません', 404)
-            
-            # ノートの所有者チェック
-            if note.user_id != user_id:
-                logger.warning(f"ノートへの削除権限がありません: ID={note_id}, リクエストユーザー={user_id}, ノート所有者={note.user_id}")
-                raise NoteError('このノートへの削除権限がありません', 403)
-                
-            db.delete(note)
+            db.query(Note).filter(Note.id == note_id).delete(synchronize_session=False)
+            remove_from_categories(db, CategorySummary.__table__, note.user_id,
+                                   [(note.main_category, note.sub_category)])
             db.commit()
             
             logger.info(f"ノートを削除しました: ID={note_id}")
@@ -274,8 +348,6 @@ def delete_note(note_id):
             db.rollback()
             logger.error(f"データベースエラー: {str(e)}")
             raise
-        finally:
-            db.close()
             
     except Exception as e:
         logger.error(f"予期せぬエラー: {str(e)}")
@@ -283,10 +355,70 @@ def delete_note(note_id):
             return jsonify({'error': 'サーバーエラーが発生しました'}), 500
         raise
 
+@notes_bp.route('/notes', methods=['DELETE'])
+@require_auth
+def delete_notes():
+    """
+    ログインユーザーの複数のノートを一括で削除するエンドポイント
+
+    リクエストボディ:
+        ids: 削除するノートIDの配列（最大MAX_BULK_DELETE_NOTES件）
+
+    ページとしおりはデータベースのON DELETE CASCADEで削除されます。
+    存在しないノートと他のユーザーのノートは削除せず、not_foundに返します。
+    """
+    user_id = request.firebase_token.get('uid')
+    if not user_id:
+        logger.error("ユーザーIDが取得できません")
+        return jsonify({'error': '認証エラー'}), 401
+
+    data = request.get_json(silent=True)
+    ids = data.get('ids') if isinstance(data, dict) else None
+    if (not isinstance(ids, list) or not ids
+            or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids)):
+        logger.warning("削除するノートIDが不正です")
+        return jsonify({'error': 'idsにノートIDの配列を指定してください'}), 400
+    if len(ids) > MAX_BULK_DELETE_NOTES:
+        logger.warning(f"削除するノートが多すぎます: {len(ids)}件")
+        return jsonify({'error': f'一度に削除できるノートは{MAX_BULK_DELETE_NOTES}件までです'}), 400
+
+    logger.info(f"ノート一括削除リクエスト: {len(ids)}件, ユーザーID={user_id}")
+    db = Session()
+    try:
+        rows = db.query(Note.id, Note.main_category, Note.sub_category).filter(
+            Note.id.in_(ids), Note.user_id == user_id
+        ).all()
+        owned = [row[0] for row in rows]
+        if owned:
+            db.query(Note).filter(Note.id.in_(owned)).delete(synchronize_session=False)
+            remove_from_categories(db, CategorySummary.__table__, user_id,
+                                   [(main_category, sub_category) for _, main_category, sub_category in rows])
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"データベースエラー: {str(e)}")
+        return jsonify({'error': 'データベース操作中にエラーが発生しました'}), 500
+    finally:
+        db.close()
+
+    deleted = set(owned)
+    logger.info(f"ノートを一括削除しました: {len(deleted)}件")
+    return jsonify({
+        'deleted': sorted(deleted),
+        'not_found': sorted(set(ids) - deleted)
+    })
+
 @notes_bp.route('/notes/<int:note_id>/pages', methods=['POST'])
 @require_auth
-def add_page(note_id):
-    """指定されたノートに新しいページを追加するエンドポイント"""
+@require_note_owner()
+def add_page(note_id, db, note):
+    """
+    指定されたノートに新しいページを追加するエンドポイント
+
+    リクエストボディのatにページ番号を指定した場合はその位置に挿入し、
+    以降のページの番号が1つずつ後ろにずれます（更新するのは追加するページの1行のみ）。
+    省略した場合は末尾に追加します。
+    """
     try:
         logger.info(f"ページ追加リクエスト: ノートID={note_id}")
         data = request.get_json()
@@ -295,33 +427,35 @@ def add_page(note_id):
             logger.warning("データが必要です")
             raise NoteError('データが必要です')
             
-        db = Session()
+        at = data.get('at')
+        if at is not None and (not isinstance(at, int) or isinstance(at, bool) or at < 1):
+            logger.warning(f"不正な挿入位置: {at}")
+            return jsonify({'error': 'atは1以上の整数で指定してください'}), 400
+
         try:
-            note = db.query(Note).filter(Note.id == note_id).first()
-            
-            if not note:
-                logger.warning(f"ノートが見つかりません: ID={note_id}")
-                raise NoteError('指定されたノートが見つかりません', 404)
-                
-            # 現在の最大ページ番号を取得
-            max_page = db.query(Page).filter(Page.note_id == note_id).order_by(Page.page_number.desc()).first()
-            next_page_number = (max_page.page_number + 1) if max_page else 1
-            
+            if at is None:
+                position = append_position(db, note_id)
+            else:
+                position = position_for(db, note_id, at)
+
             page = Page(
                 note_id=note_id,
-                page_number=next_page_number,
+                position=position,
                 content=data.get('content', ''),
                 layout_settings=data.get('layout_settings', {})
             )
             
             db.add(page)
+            db.flush()
+            index_pages(db, note, [(page.id, page.content)])
+            page_number = db.query(page_number_of()).filter(Page.id == page.id).scalar()
             db.commit()
             
-            logger.info(f"ページを追加しました: ID={page.id}")
+            logger.info(f"ページを追加しました: ID={page.id}, ページ番号={page_number}")
             return jsonify({
                 'id': page.id,
                 'note_id': page.note_id,
-                'page_number': page.page_number,
+                'page_number': page_number,
                 'content': page.content,
                 'layout_settings': page.layout_settings
             }), 201
@@ -330,8 +464,6 @@ def add_page(note_id):
             db.rollback()
             logger.error(f"データベースエラー: {str(e)}")
             raise
-        finally:
-            db.close()
             
     except Exception as e:
         logger.error(f"予期せぬエラー: {str(e)}")
@@ -341,76 +473,66 @@ def add_page(note_id):
 
 @notes_bp.route('/notes/<int:note_id>/pages/<int:page_id>', methods=['PUT'])
 @require_auth
-def update_page(note_id, page_id):
-    """指定されたページの内容を更新するエンドポイント。ページが存在しない場合は新規作成する。"""
+@require_note_owner(page_number='page_id')
+def update_page(note_id, page_id, db, note, page):
+    """
+    指定されたページの内容を更新するエンドポイント。ページ数+1のページ番号の場合は末尾に新規作成する。
+
+    ページ番号は位置の順序から計算するため、それより大きいページ番号のページは作成できず404を返します。
+    作成したページは同じページ番号になるため、同じリクエストを再送しても同じページが更新されます。
+    """
     try:
         logger.info(f"ページ更新リクエスト: ノートID={note_id}, ページID={page_id}")
-        
-        # 認証済みユーザーからユーザーIDを取得
-        user_id = request.firebase_token.get('uid')
-        if not user_id:
-            logger.error("ユーザーIDが取得できません")
-            return jsonify({'error': '認証エラー'}), 401
-            
         data = request.get_json()
         
         if not data:
             logger.warning("データが必要です")
             raise NoteError('データが必要です')
             
-        db = Session()
         try:
-            # まずノートの存在確認
-            note = db.query(Note).filter(Note.id == note_id).first()
-            if not note:
-                logger.warning(f"ノートが見つかりません: ID={note_id}")
-                raise NoteError('指定されたノートが見つかりません', 404)
-
-            # ノートの所有者チェック
-            if note.user_id != user_id:
-                logger.warning(f"ノートへの更新権限がありません: ID={note_id}, リクエストユーザー={user_id}, ノート所有者={note.user_id}")
-                raise NoteError('このノートへの更新権限がありません', 403)
-
-            # ページの取得または新規作成
-            page = db.query(Page).filter(
-                Page.note_id == note_id,
-                Page.page_number == page_id  # page_idをpage_numberとして使用
-            ).first()
-            
             if not page:
-                # ページが存在しない場合は新規作成
+                # ページが存在しない場合は、ページ数+1のページ番号のときだけ末尾に新規作成
+                page_count = db.query(func.count(Page.id)).filter(Page.note_id == note_id).scalar()
+                if page_id != page_count + 1:
+                    logger.warning(f"ページが見つかりません: ノートID={note_id}, ページ番号={page_id}, ページ数={page_count}")
+                    # require_authが例外を500にするため、ここでレスポンスを返す
+                    return jsonify({'error': '指定されたページが見つかりません'}), 404
                 page = Page(
                     note_id=note_id,
-                    page_number=page_id,
+                    position=position_for(db, note_id, page_id),
                     content=data.get('content', ''),
                     layout_settings=data.get('layout_settings', {})
                 )
                 db.add(page)
-                logger.info(f"新しいページを作成: ノートID={note_id}, ページ番号={page_id}")
+                page_number = page_id
+                logger.info(f"新しいページを作成: ノートID={note_id}, ページ番号={page_number}")
             else:
+                page_number = page_id
                 # 既存のページを更新
                 if 'content' in data:
                     page.content = data['content']
                 if 'layout_settings' in data:
                     page.layout_settings = data['layout_settings']
                 logger.info(f"既存のページを更新: ID={page.id}")
-                
+
+            if 'content' in data:
+                db.flush()
+                index_pages(db, note, [(page.id, page.content)])
             db.commit()
             
             return jsonify({
                 'id': page.id,
                 'note_id': page.note_id,
-                'page_number': page.page_number,
+                'page_number': page_number,
                 'content': page.content,
-                'layout_settings': page.layout_settings
+                'layout_settings': page.layout_settings,
+                'version': page.version
             })
             
         except SQLAlchemyError as e:
             db.rollback()
             logger.error(f"データベースエラー: {str(e)}")
             raise
-        finally:
-            db.close()
             
     except Exception as e:
         logger.error(f"予期せぬエラー: {str(e)}")
@@ -418,64 +540,147 @@ def update_page(note_id, page_id):
             return jsonify({'error': 'サーバーエラーが発生しました'}), 500
         raise
 
+@notes_bp.route('/notes/<int:note_id>/pages:batch', methods=['PUT'])
+@require_auth
+@require_note_owner()
+def batch_update_pages(note_id, db, note):
+    """
+    複数のページを1つのトランザクションで作成・更新するエンドポイント
+
+    リクエストボディ:
+        pages: [{"page_number": 1, "content": ..., "layout_settings": ...}, ...]
+
+    content、layout_settingsのうち指定されていない列は既存の値を残します。
+    新しいページはページ数+1から連続するページ番号で指定し、番号が飛んでいる場合は
+    何も書き込まずに404を返します。
+    レスポンスにはページごとのID、ページ番号、バージョン、新規作成かどうかを返します。
+    """
+    logger.info(f"ページ一括更新リクエスト: ノートID={note_id}")
+    try:
+        items = parse_batch(request.get_json(silent=True))
+    except BatchError as e:
+        logger.warning(f"一括更新のリクエストが不正です: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        results = upsert_pages(db, note_id, items)
+        # 結果はitemsと同じページ番号順
+        index_pages(db, note, [(result['id'], item['content'])
+                               for item, result in zip(items, results) if 'content' in item])
+        db.commit()
+    except BatchError as e:
+        db.rollback()
+        logger.warning(f"一括更新のページ番号が不正です: {str(e)}")
+        return jsonify({'error': str(e)}), e.status_code
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"データベースエラー: {str(e)}")
+        return jsonify({'error': 'データベース操作中にエラーが発生しました'}), 500
+
+    logger.info(f"ページを一括更新しました: ノートID={note_id}, ページ数={len(results)}")
+    return jsonify({
+        'note_id': note_id,
+        'pages': [dict(result, etag=page_etag(note_id, result['page_number'], result['id'], result['version']))
+                  for result in results]
+    })
+
+@notes_bp.route('/notes/<int:note_id>/pages/<int:page_id>', methods=['PATCH'])
+@require_auth
+@require_note_owner(page_number='page_id')
+def patch_page(note_id, page_id, db, note, page):
+    """
+    ページの内容に差分を適用するエンドポイント
+
+    リクエストボディ:
+        base_version: 差分の元にしたページのバージョン（GETのレスポンスのversion）
+        operations: キャンバス操作のリスト（append_objects, remove_objects）
+        json_patch: RFC 6902 JSON Patch（operationsの代わりに指定）
+
+    base_versionが現在のバージョンと異なる場合は409を返します。
+    レスポンスには本文を含めず、更新後のバージョンとETagを返します。
+    """
+    logger.info(f"ページ差分更新リクエスト: ノートID={note_id}, ページ番号={page_id}")
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('base_version'), int):
+        logger.warning("base_versionが指定されていません")
+        return jsonify({'error': 'base_versionは必須です'}), 400
+    if not page:
+        logger.warning(f"ページが見つかりません: ノートID={note_id}, ページ番号={page_id}")
+        return jsonify({'error': '指定されたページが見つかりません'}), 404
+
+    base_version = data['base_version']
+    if page.version != base_version:
+        logger.info(f"ページのバージョンが一致しません: ID={page.id}, base={base_version}, 現在={page.version}")
+        return jsonify({'error': 'ページが他の操作で更新されています', 'version': page.version}), 409
+
+    try:
+        document = load_canvas(page.content)
+        if 'json_patch' in data:
+            document = apply_json_patch(document, data['json_patch'])
+        else:
+            document = apply_canvas_operations(document, data.get('operations') or [])
+    except PatchError as e:
+        logger.warning(f"差分を適用できません: ID={page.id}, {str(e)}")
+        return jsonify({'error': str(e), 'version': page.version}), e.status_code
+
+    content = json.dumps(document, ensure_ascii=False, separators=(',', ':'))
+    try:
+        # 読み込んだ後に他のリクエストが更新していないことをバージョンで確認して書き込む
+        updated = db.query(Page).filter(
+            Page.id == page.id,
+            Page.version == base_version
+        ).update({Page.content: content}, synchronize_session=False)
+        if not updated:
+            db.rollback()
+            logger.info(f"ページの更新が競合しました: ID={page.id}")
+            return jsonify({'error': 'ページが他の操作で更新されています'}), 409
+        index_pages(db, note, [(page.id, content)])
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"データベースエラー: {str(e)}")
+        return jsonify({'error': 'データベース操作中にエラーが発生しました'}), 500
+
+    new_version = base_version + 1
+    logger.info(f"ページに差分を適用しました: ID={page.id}, バージョン={new_version}")
+    response = jsonify({
+        'id': page.id,
+        'note_id': note_id,
+        'page_number': page_id,
+        'version': new_version
+    })
+    response.set_etag(page_etag(note_id, page_id, page.id, new_version), weak=True)
+    return response
+
 @notes_bp.route('/notes/<int:note_id>/pages/<int:page_id>', methods=['GET'])
 @require_auth
-def get_page(note_id, page_id):
+@require_note_owner(page_number='page_id', conditional=True)
+def get_page(note_id, page_id, db, note, page):
     """指定されたページを取得するエンドポイント"""
     try:
         logger.info(f"ページ取得リクエスト: ノートID={note_id}, ページID={page_id}")
-        
-        # 認証済みユーザーからユーザーIDを取得
-        user_id = request.firebase_token.get('uid')
-        if not user_id:
-            logger.error("ユーザーIDが取得できません")
-            return jsonify({'error': '認証エラー'}), 401
-        
-        db = Session()
-        try:
-            # まずノートの存在確認
-            note = db.query(Note).filter(Note.id == note_id).first()
-            if not note:
-                logger.warning(f"ノートが見つかりません: ID={note_id}")
-                raise NoteError('指定されたノートが見つかりません', 404)
-
-            # ノートの所有者チェック
-            if note.user_id != user_id:
-                logger.warning(f"ノートへのアクセス権限がありません: ID={note_id}, リクエストユーザー={user_id}, ノート所有者={note.user_id}")
-                raise NoteError('このノートへのアクセス権限がありません', 403)
-
-            # ページの取得
-            page = db.query(Page).filter(
-                Page.note_id == note_id,
-                Page.page_number == page_id
-            ).first()
             
-            if not page:
-                logger.warning(f"ページが見つかりません: ノートID={note_id}, ページ番号={page_id}")
-                # ページが存在しない場合は空のページを返す
-                return jsonify({
-                    'id': None,
-                    'note_id': note_id,
-                    'page_number': page_id,
-                    'content': '',
-                    'layout_settings': {}
-                }), 200
-            
-            logger.info(f"ページを取得しました: ID={page.id}")
+        if not page:
+            logger.warning(f"ページが見つかりません: ノートID={note_id}, ページ番号={page_id}")
+            # ページが存在しない場合は空のページを返す
             return jsonify({
-                'id': page.id,
-                'note_id': page.note_id,
-                'page_number': page.page_number,
-                'content': page.content,
-                'layout_settings': page.layout_settings
+                'id': None,
+                'note_id': note_id,
+                'page_number': page_id,
+                'content': '',
+                'layout_settings': {},
+                'version': None
             }), 200
-            
-        except SQLAlchemyError as e:
-            db.rollback()
-            logger.error(f"データベースエラー: {str(e)}")
-            raise
-        finally:
-            db.close()
+        
+        logger.info(f"ページを取得しました: ID={page.id}")
+        return jsonify({
+            'id': page.id,
+            'note_id': page.note_id,
+            'page_number': page_id,
+            'content': page.content,
+            'layout_settings': page.layout_settings,
+            'version': page.version
+        }), 200
             
     except Exception as e:
         logger.error(f"予期せぬエラー: {str(e)}")
@@ -485,35 +690,16 @@ def get_page(note_id, page_id):
 
 @notes_bp.route('/notes/<int:note_id>/pages/<int:page_id>', methods=['DELETE'])
 @require_auth
-def delete_page(note_id, page_id):
-    """指定されたページを削除するエンドポイント"""
+@require_note_owner(page_number='page_id')
+def delete_page(note_id, page_id, db, note, page):
+    """
+    指定されたページを削除するエンドポイント
+
+    ページ番号は位置の順序から計算するため、後ろのページの番号は更新せずに詰まります。
+    """
     try:
         logger.info(f"ページ削除リクエスト: ノートID={note_id}, ページID={page_id}")
-        
-        # 認証済みユーザーからユーザーIDを取得
-        user_id = request.firebase_token.get('uid')
-        if not user_id:
-            logger.error("ユーザーIDが取得できません")
-            return jsonify({'error': '認証エラー'}), 401
-            
-        db = Session()
         try:
-            # まずノートの存在確認
-            note = db.query(Note).filter(Note.id == note_id).first()
-            if not note:
-                logger.warning(f"ノートが見つかりません: ID={note_id}")
-                raise NoteError('指定されたノートが見つかりません', 404)
-
-            # ノートの所有者チェック
-            if note.user_id != user_id:
-                logger.warning(f"ノートへの削除権限がありません: ID={note_id}, リクエストユーザー={user_id}, ノート所有者={note.user_id}")
-                raise NoteError('このノートへの削除権限がありません', 403)
-                
-            page = db.query(Page).filter(
-                Page.note_id == note_id,
-                Page.page_number == page_id
-            ).first()
-            
             if not page:
                 logger.warning(f"ページが見つかりません: ID={page_id}")
                 raise NoteError('指定されたページが見つかりません', 404)
@@ -521,17 +707,6 @@ def delete_page(note_id, page_id):
             db.delete(page)
             db.commit()
             
-            # ページ番号を再整理
-            remaining_pages = db.query(Page).filter(
-                Page.note_id == note_id,
-                Page.page_number > page_id
-            ).order_by(Page.page_number).all()
-            
-            for p in remaining_pages:
-                p.page_number -= 1
-                
-            db.commit()
-            
             logger.info(f"ページを削除しました: ID={page_id}")
             return jsonify({'message': 'ページを削除しました'})
             
@@ -539,11 +714,50 @@ def delete_page(note_id, page_id):
             db.rollback()
             logger.error(f"データベースエラー: {str(e)}")
             raise
-        finally:
-            db.close()
             
     except Exception as e:
         logger.error(f"予期せぬエラー: {str(e)}")
         if not isinstance(e, (NoteError, SQLAlchemyError)):
             return jsonify({'error': 'サーバーエラーが発生しました'}), 500
         raise
+
+@notes_bp.route('/notes/<int:note_id>/pages/<int:page_id>/move', methods=['POST'])
+@require_auth
+@require_note_owner(page_number='page_id')
+def move_page(note_id, page_id, db, note, page):
+    """
+    指定されたページを別のページ番号に移動するエンドポイント
+
+    リクエストボディ:
+        to: 移動先のページ番号（ページ数より大きい場合は末尾）
+
+    移動するページの位置だけを前後のページの間の値に更新します。
+    """
+    logger.info(f"ページ移動リクエスト: ノートID={note_id}, ページ番号={page_id}")
+    data = request.get_json(silent=True)
+    to = data.get('to') if isinstance(data, dict) else None
+    if not isinstance(to, int) or isinstance(to, bool) or to < 1:
+        logger.warning(f"不正な移動先: {to}")
+        return jsonify({'error': 'toは1以上の整数で指定してください'}), 400
+    if not page:
+        logger.warning(f"ページが見つかりません: ノートID={note_id}, ページ番号={page_id}")
+        return jsonify({'error': '指定されたページが見つかりません'}), 404
+
+    try:
+        if to != page_id:
+            page.position = position_for(db, note_id, to, exclude_id=page.id)
+            db.flush()
+        page_number = db.query(page_number_of()).filter(Page.id == page.id).scalar()
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"データベースエラー: {str(e)}")
+        return jsonify({'error': 'データベース操作中にエラーが発生しました'}), 500
+
+    logger.info(f"ページを移動しました: ID={page.id}, {page_id} -> {page_number}")
+    return jsonify({
+        'id': page.id,
+        'note_id': note_id,
+        'page_number': page_number,
+        'version': page.version
+    })
@@ -2,10 +2,13 @@ from flask import jsonify, request
 from google.cloud import vision
 import io
 import base64
+import hashlib
 from . import notes_bp
 from auth_middleware import require_auth
-from database import Session
-from models import Note
+from .note_access import require_note_owner
+from sqlalchemy.exc import IntegrityError
+from models import PageOcrResult
+from ocr_result import decode_boxes, encode_boxes, extract_boxes
 import json
 import logging
 import os
@@ -20,60 +23,120 @@ def init_vision_client():
         logger.error(f"Vision APIクライアントの初期化エラー: {str(e)}")
         raise
 
+def _ocr_response(result, cached):
+    """保存したOCR結果からレスポンスを作成する"""
+    words, lines = decode_boxes(result.boxes)
+    body = {
+        'text': result.text,
+        'words': words,
+        'lines': lines,
+        'page_version': result.page_version,
+        'cached': cached,
+        'success': bool(result.text)
+    }
+    if not result.text:
+        body['message'] = 'テキストが検出されませんでした'
+    return jsonify(body)
+
+def _decode_image(base64_data):
+    """Base64の画像（data URLも可）をデコードする（失敗した場合はNone）"""
+    logger.info("Base64デコードを開始")
+    try:
+        if base64_data.startswith('data:'):
+            base64_data = base64_data.split(',', 1)[1]
+
+        image_bytes = base64.b64decode(base64_data)
+        logger.info(f"デコードされた画像データのサイズ: {len(image_bytes)} bytes")
+
+        # デバッグ: 受信した画像を保存
+        debug_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'utils', 'debug')
+        os.makedirs(debug_dir, exist_ok=True)
+        with open(os.path.join(debug_dir, 'received_image.png'), 'wb') as f:
+            f.write(image_bytes)
+        logger.info("受信した画像を保存しました: received_image.png")
+        return image_bytes
+    except Exception as e:
+        logger.error(f"Base64デコードでエラー: {str(e)}")
+        return None
+
+def _save_ocr_result(db, page_id, page_version, image_hash, text, words, lines):
+    """OCR結果をページのバージョンと画像のハッシュとともに保存する（コミットまで行う）"""
+    result = db.get(PageOcrResult, page_id)
+    if result is None:
+        result = PageOcrResult(page_id=page_id)
+        db.add(result)
+    result.page_version = page_version
+    result.image_hash = image_hash
+    result.text = text
+    result.boxes = encode_boxes(words, lines)
+    try:
+        db.commit()
+    except IntegrityError:
+        # 同じページのOCRが同時に保存された場合は先に保存された結果を残す
+        db.rollback()
+        logger.warning(f"OCR結果は別のリクエストで保存済みです: page_id={page_id}")
+    return result
+
+@notes_bp.route('/notes/<int:note_id>/pages/<int:page_number>/ocr', methods=['GET'])
+@require_auth
+@require_note_owner(page_number='page_number')
+def get_ocr(note_id, page_number, db, note, page):
+    """
+    保存したOCR結果を取得するエンドポイント
+
+    OCRの実行後にページが更新された場合は古い結果として404を返します。
+    """
+    if page is None:
+        logger.warning(f"ページが見つかりません: note_id={note_id}, page_number={page_number}")
+        return jsonify({'error': '指定されたページが見つかりません'}), 404
+
+    result = db.get(PageOcrResult, page.id)
+    if result is None or result.page_version != page.version:
+        logger.info(f"保存されたOCR結果がありません: page_id={page.id}, stale={result is not None}")
+        return jsonify({'error': 'OCR結果がありません', 'stale': result is not None}), 404
+    return _ocr_response(result, cached=True)
+
 @notes_bp.route('/notes/<int:note_id>/pages/<int:page_number>/ocr', methods=['POST'])
 @require_auth
-def perform_ocr(note_id, page_number):
-    """画像からテキストを抽出するエンドポイント"""
+@require_note_owner(page_number='page_number')
+def perform_ocr(note_id, page_number, db, note, page):
+    """
+    画像からテキストを抽出するエンドポイント
+
+    ページが前回のOCRから更新されていない場合は、画像を送らないか前回と同じ画像を送ると
+    保存した結果を返します（保存されていない描画を含む画像は別の画像としてOCRを実行します）。
+    リクエストのJSONにforce: trueを指定すると、保存した結果があってもOCRを実行します。
+    """
     try:
         logger.info(f"OCRリクエストを受信: note_id={note_id}, page_number={page_number}")
         
-        # 認証済みユーザーからユーザーIDを取得
-        user_id = request.firebase_token.get('uid')
-        if not user_id:
-            logger.error("ユーザーIDが取得できません")
-            return jsonify({'error': '認証エラー'}), 401
-        
-        # ノートの所有権を確認
-        db = Session()
-        note = db.query(Note).filter(Note.id == note_id).first()
-        
-        if not note:
-            logger.warning(f"ノートが見つかりません: ID={note_id}")
-            return jsonify({'error': '指定されたノートが見つかりません'}), 404
-            
-        # ノートの所有者チェック
-        if note.user_id != user_id:
-            logger.warning(f"ノートへのアクセス権限がありません: ID={note_id}, リクエストユーザー={user_id}, ノート所有者={note.user_id}")
-            return jsonify({'error': 'このノートへのアクセス権限がありません'}), 403
-        
         # リクエストデータの取得
-        data = request.get_json()
-        logger.info("リクエストデータを取得")
-        
-        if not data or 'image' not in data:
+        data = request.get_json(silent=True) or {}
+        force = bool(data.get('force'))
+        image_bytes = None
+        image_hash = None
+
+        if 'image' in data:
+            image_bytes = _decode_image(data['image'])
+            if image_bytes is None:
+                return jsonify({'error': 'Base64デコードに失敗しました'}), 400
+            image_hash = hashlib.sha256(image_bytes).hexdigest()
+
+        if page is not None and not force:
+            result = db.get(PageOcrResult, page.id)
+            if result is not None and result.page_version == page.version \
+                    and (image_hash is None or result.image_hash == image_hash):
+                logger.info(f"保存されたOCR結果を返します: page_id={page.id}, version={page.version}")
+                return _ocr_response(result, cached=True)
+        
+        if image_bytes is None:
             logger.error("画像データが見つかりません")
             return jsonify({'error': '画像データが必要です'}), 400
-            
-        # Base64デコード
-        logger.info("Base64デコードを開始")
-        try:
-            base64_data = data['image']
-            if base64_data.startswith('data:'):
-                base64_data = base64_data.split(',', 1)[1]
-            
-            image_bytes = base64.b64decode(base64_data)
-            logger.info(f"デコードされた画像データのサイズ: {len(image_bytes)} bytes")
-            
-            # デバッグ: 受信した画像を保存
-            debug_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'utils', 'debug')
-            os.makedirs(debug_dir, exist_ok=True)
-            with open(os.path.join(debug_dir, 'received_image.png'), 'wb') as f:
-                f.write(image_bytes)
-            logger.info("受信した画像を保存しました: received_image.png")
-            
-        except Exception as e:
-            logger.error(f"Base64デコードでエラー: {str(e)}")
-            return jsonify({'error': 'Base64デコードに失敗しました'}), 400
+
+        # Vision APIの呼び出し中にコネクションを保持しないよう、セッションを閉じておく
+        # （結果の保存時に同じセッションで新しいトランザクションを始める）
+        page_id, page_version = (page.id, page.version) if page is not None else (None, None)
+        db.close()
 
         # Vision APIクライアントの初期化
         client = init_vision_client()
@@ -93,58 +156,26 @@ def perform_ocr(note_id, page_number):
             image=image,
             image_context=image_context
         )
-        
-        # レスポンスの詳細をログ出力
-        logger.info("Vision APIレスポンスの詳細:")
-        logger.info("1. text_annotations:")
-        if response.text_annotations:
-            logger.info(f"検出されたテキスト数: {len(response.text_annotations)}")
-            for i, text in enumerate(response.text_annotations):
-                logger.info(f"テキスト{i}: {text.description}")
-                logger.info(f"信頼度: {text.confidence if hasattr(text, 'confidence') else 'N/A'}")
-                logger.info(f"バウンディングボックス: {[(vertex.x, vertex.y) for vertex in text.bounding_poly.vertices]}")
-        else:
-            logger.info("テキストが検出されませんでした")
-        
-        logger.info("\n2. full_text_annotation:")
-        if response.full_text_annotation:
-            logger.info(f"全テキスト: {response.full_text_annotation.text}")
-            logger.info("ページ情報:")
-            for page in response.full_text_annotation.pages:
-                logger.info(f"- 信頼度: {page.confidence}")
-                logger.info(f"- 幅: {page.width}, 高さ: {page.height}")
-        else:
-            logger.info("full_text_annotationが空です")
-        
-        logger.info("\n3. エラー情報:")
+
         if response.error.message:
+            # 失敗した結果は保存しない
             logger.error(f"APIエラー: {response.error.message}")
+            return jsonify({'error': 'OCR処理に失敗しました', 'details': response.error.message}), 502
+
+        # テキスト抽出結果の処理（text_annotationsの最初の要素が全体のテキスト）
+        extracted_text = response.full_text_annotation.text or (
+            response.text_annotations[0].description if response.text_annotations else ''
+        )
+        words, lines = extract_boxes(response.full_text_annotation)
+        logger.info(f"抽出されたテキスト: {len(extracted_text)}文字, 単語数={len(words)}, 行数={len(lines)}")
+
+        if page_id is None:
+            # まだ保存されていないページは結果を保存せずに返す
+            result = PageOcrResult(page_version=None, text=extracted_text, boxes=encode_boxes(words, lines))
         else:
-            logger.info("エラーはありません")
-            
-        logger.info("\n4. 生レスポンス:")
-        logger.info(str(response))
-        
-        # テキスト抽出結果の処理
-        if response.text_annotations:
-            # 最初の要素が全体のテキスト
-            extracted_text = response.text_annotations[0].description
-            logger.info(f"抽出されたテキスト: {extracted_text}")
-            return jsonify({
-                'text': extracted_text,
-                'success': True
-            })
-        else:
-            logger.info("テキストが検出されませんでした")
-            logger.info("レスポンスの詳細:")
-            logger.info(f"- full_text_annotation: {response.full_text_annotation}")
-            logger.info(f"- text_annotations: {response.text_annotations}")
-            logger.info(f"- error: {response.error}")
-            return jsonify({
-                'text': '',
-                'success': False,
-                'message': 'テキストが検出されませんでした'
-            })
+            result = _save_ocr_result(db, page_id, page_version, image_hash, extracted_text, words, lines)
+
+        return _ocr_response(result, cached=False)
             
     except Exception as e:
         logger.error(f"OCR処理エラー: {str(e)}")
@@ -0,0 +1,70 @@
+from flask import jsonify, request
+from sqlalchemy.exc import SQLAlchemyError
+from . import notes_bp
+from database import ReadSession
+from models import Note, Page, SearchDocument
+from logger import logger
+from auth_middleware import require_auth
+from page_order import page_number_of
+from pagination import NEXT_CURSOR_HEADER, PaginationError, encode_offset_cursor, parse_offset_params
+from text_search import apply_search, parse_query
+
+@notes_bp.route('/search', methods=['GET'])
+@require_auth
+def search():
+    """
+    ログインユーザーのノートとページを全文検索するエンドポイント
+
+    クエリパラメータ:
+        q: 検索文字列（空白区切りの語をすべて含むものを検索）
+        limit: 1ページの件数
+        cursor: 前のページのレスポンスのX-Next-Cursorヘッダーの値
+
+    ノートのタイトル・カテゴリに一致した場合はpage_idとpage_numberがNoneになります。
+    結果は関連度の高い順に返します。
+    """
+    user_id = request.firebase_token.get('uid')
+    if not user_id:
+        logger.error("ユーザーIDが取得できません")
+        return jsonify({'error': '認証エラー'}), 401
+
+    terms = parse_query(request.args.get('q', ''))
+    if not terms:
+        logger.warning("検索文字列が指定されていません")
+        return jsonify({'error': 'qに検索文字列を指定してください'}), 400
+    try:
+        limit, offset = parse_offset_params(request.args)
+    except PaginationError as e:
+        # require_authが例外を500にするため、ここでレスポンスを返す
+        logger.warning(f"検索のパラメータが不正です: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+    logger.info(f"検索リクエスト: 語数={len(terms)}, ユーザーID={user_id}")
+    try:
+        with ReadSession() as session:
+            query = session.query(
+                SearchDocument.note_id, SearchDocument.page_id, Note.title,
+                Note.main_category, Note.sub_category, page_number_of()
+            ).join(Note, Note.id == SearchDocument.note_id).outerjoin(
+                Page, Page.id == SearchDocument.page_id
+            ).filter(SearchDocument.user_id == user_id)
+            query = apply_search(query, SearchDocument.__table__, terms, session.get_bind().dialect.name)
+            rows = query.offset(offset).limit(limit + 1).all()
+    except SQLAlchemyError as e:
+        logger.error(f"データベースエラー: {str(e)}")
+        return jsonify({'error': 'データベース操作中にエラーが発生しました'}), 500
+
+    results = [{
+        'note_id': note_id,
+        'page_id': page_id,
+        'page_number': page_number if page_id is not None else None,
+        'title': title,
+        'main_category': main_category,
+        'sub_category': sub_category
+    } for note_id, page_id, title, main_category, sub_category, page_number in rows[:limit]]
+
+    logger.info(f"検索結果: {len(results)}件")
+    response = jsonify(results)
+    if len(rows) > limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_offset_cursor(offset + limit)
+    return response
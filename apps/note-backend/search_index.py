@@ -0,0 +1,103 @@
+"""
+ノートとページの全文検索インデックスの更新
+
+ノートのタイトル・カテゴリと、ページのキャンバスJSONから取り出したテキストを
+SearchDocumentのtokens列に保存します。ノートとページを保存するトランザクションの中で
+呼び出すため、検索結果は保存した内容と常に一致します。
+ノートとページの削除時は外部キーのON DELETE CASCADEで削除されます。
+"""
+import json
+from sqlalchemy import bindparam, insert, or_, update
+from models import SearchDocument
+from text_search import index_tokens
+
+# 1ページから取り出す最大の文字数
+MAX_PAGE_TEXT_LENGTH = 20000
+
+def _collect_text(node, texts):
+    if isinstance(node, dict):
+        text = node.get('text')
+        if isinstance(text, str):
+            texts.append(text)
+        for child in node.get('objects') or ():
+            _collect_text(child, texts)
+    elif isinstance(node, list):
+        for child in node:
+            _collect_text(child, texts)
+
+def page_text(content):
+    """
+    ページの本文から検索対象のテキストを取り出す関数
+
+    キャンバスのJSON（fabric.jsのtoJSON形式）の場合は、テキストオブジェクトのtextを
+    グループの中も含めて取り出します。JSONではない本文はそのまま使用します。
+
+    Args:
+        content (str): ページの本文
+
+    Returns:
+        str: 検索対象のテキスト
+    """
+    if not content:
+        return ''
+    try:
+        document = json.loads(content)
+    except ValueError:
+        return content[:MAX_PAGE_TEXT_LENGTH]
+    if isinstance(document, str):
+        return document[:MAX_PAGE_TEXT_LENGTH]
+    texts = []
+    _collect_text(document, texts)
+    return '\n'.join(texts)[:MAX_PAGE_TEXT_LENGTH]
+
+def _save(db, note_id, user_id, documents):
+    # documents: {page_id（ノート自体はNone）: tokens}
+    conditions = []
+    page_ids = [page_id for page_id in documents if page_id is not None]
+    if page_ids:
+        conditions.append(SearchDocument.page_id.in_(page_ids))
+    if None in documents:
+        conditions.append(SearchDocument.page_id.is_(None))
+    existing = dict(
+        db.query(SearchDocument.page_id, SearchDocument.id)
+        .filter(SearchDocument.note_id == note_id, or_(*conditions))
+    )
+    table = SearchDocument.__table__
+    updates = [{'document_id': existing[page_id], 'new_tokens': tokens}
+               for page_id, tokens in documents.items() if page_id in existing]
+    inserts = [{'user_id': user_id, 'note_id': note_id, 'page_id': page_id, 'tokens': tokens}
+               for page_id, tokens in documents.items() if page_id not in existing]
+    if updates:
+        db.execute(
+            update(table).where(table.c.id == bindparam('document_id')).values(tokens=bindparam('new_tokens')),
+            updates
+        )
+    if inserts:
+        db.execute(insert(table), inserts)
+
+def index_note(db, note):
+    """
+    ノートのタイトルとカテゴリを検索インデックスに保存する関数
+
+    コミットは呼び出し側で行います。
+
+    Args:
+        db (Session): 使用するセッション
+        note (Note): ノート（IDが確定していること）
+    """
+    _save(db, note.id, note.user_id, {None: index_tokens(note.title, note.main_category, note.sub_category)})
+
+def index_pages(db, note, pages):
+    """
+    ページのテキストを検索インデックスに保存する関数
+
+    コミットは呼び出し側で行います。
+
+    Args:
+        db (Session): 使用するセッション
+        note (Note): ページのノート
+        pages (iterable): (ページID, 本文)の組
+    """
+    documents = {page_id: index_tokens(page_text(content)) for page_id, content in pages}
+    if documents:
+        _save(db, note.id, note.user_id, documents)
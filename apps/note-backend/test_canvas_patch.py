@@ -0,0 +1,112 @@
+"""
+ページの差分更新（PATCH）のテストスクリプト
+"""
+
+import json
+import unittest
+
+import pytest
+from flask import Flask
+
+from canvas_patch import PatchError, apply_canvas_operations, apply_json_patch
+from database import Session, init_db
+from models import Note, Page
+from routes import notes_bp
+
+class TestJsonPatch(unittest.TestCase):
+    """JSON Patchとキャンバス操作の適用のテストクラス"""
+
+    def setUp(self):
+        self.document = {'version': '5.3.0', 'objects': [{'id': 'a'}, {'id': 'b'}]}
+
+    def test_canvas_operations(self):
+        """オブジェクトの追加とidによる削除のテスト"""
+        result = apply_canvas_operations(self.document, [
+            {'op': 'append_objects', 'objects': [{'id': 'c'}]},
+            {'op': 'remove_objects', 'ids': ['a']},
+        ])
+        self.assertEqual(result['objects'], [{'id': 'b'}, {'id': 'c'}])
+        # 元のドキュメントは変更しない
+        self.assertEqual(len(self.document['objects']), 2)
+
+    def test_json_patch_operations(self):
+        """add, remove, replace, move, copy, testのテスト"""
+        result = apply_json_patch(self.document, [
+            {'op': 'test', 'path': '/objects/0/id', 'value': 'a'},
+            {'op': 'add', 'path': '/objects/-', 'value': {'id': 'c'}},
+            {'op': 'replace', 'path': '/version', 'value': '6.0.0'},
+            {'op': 'remove', 'path': '/objects/0'},
+            {'op': 'copy', 'from': '/objects/0', 'path': '/objects/0'},
+            {'op': 'move', 'from': '/version', 'path': '/background'},
+        ])
+        self.assertEqual(result, {'background': '6.0.0', 'objects': [{'id': 'b'}, {'id': 'b'}, {'id': 'c'}]})
+
+    def test_json_patch_errors(self):
+        """不正な操作と一致しないtestのテスト"""
+        with self.assertRaises(PatchError) as context:
+            apply_json_patch(self.document, [{'op': 'test', 'path': '/objects/0/id', 'value': 'x'}])
+        self.assertEqual(context.exception.status_code, 409)
+        for patch in ([{'op': 'remove', 'path': '/objects/5'}],
+                      [{'op': 'add', 'path': 'objects', 'value': 1}],
+                      [{'op': 'unknown', 'path': '/objects'}],
+                      [{'op': 'move', 'from': '/objects', 'path': '/objects/0'}]):
+            with self.assertRaises(PatchError):
+                apply_json_patch(self.document, patch)
+
+@pytest.mark.usefixtures('firebase_user')
+class TestPatchPageEndpoint(unittest.TestCase):
+    """PATCH /notes/<id>/pages/<n>のテストクラス"""
+
+    @classmethod
+    def setUpClass(cls):
+        init_db()
+        cls.app = Flask(__name__)
+        cls.app.register_blueprint(notes_bp, url_prefix='/api')
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.uid = 'patcher'
+
+        db = Session()
+        note = Note(title='テスト', main_category='その他', sub_category='', user_id='patcher', last_position=1)
+        note.pages.append(Page(position=1, content=json.dumps({'objects': [{'id': 'a'}]}), layout_settings={}))
+        db.add(note)
+        db.commit()
+        self.note_id = note.id
+        db.close()
+        self.path = f'/api/notes/{self.note_id}/pages/1'
+
+    def request(self, method, **kwargs):
+        return getattr(self.client, method)(self.path, headers={'Authorization': 'Bearer test-token'}, **kwargs)
+
+    def test_patch_applies_against_base_version(self):
+        """base_versionが一致する場合に差分を適用し、古いbase_versionは409になることのテスト"""
+        version = self.request('get').get_json()['version']
+        response = self.request('patch', json={
+            'base_version': version,
+            'operations': [{'op': 'append_objects', 'objects': [{'id': 'b'}]}]
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['version'], version + 1)
+        self.assertNotIn('content', response.get_json())
+
+        page = self.request('get').get_json()
+        self.assertEqual(json.loads(page['content'])['objects'], [{'id': 'a'}, {'id': 'b'}])
+        self.assertEqual(page['version'], version + 1)
+
+        stale = self.request('patch', json={
+            'base_version': version,
+            'json_patch': [{'op': 'remove', 'path': '/objects/0'}]
+        })
+        self.assertEqual(stale.status_code, 409)
+        self.assertEqual(stale.get_json()['version'], version + 1)
+
+    def test_patch_validation(self):
+        """不正なリクエストのテスト"""
+        self.assertEqual(self.request('patch', json={'operations': []}).status_code, 400)
+        version = self.request('get').get_json()['version']
+        response = self.request('patch', json={'base_version': version, 'operations': [{'op': 'bogus'}]})
+        self.assertEqual(response.status_code, 400)
+
+        self.path = f'/api/notes/{self.note_id}/pages/9'
+        self.assertEqual(self.request('patch', json={'base_version': 1}).status_code, 404)
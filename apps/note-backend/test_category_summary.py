@@ -0,0 +1,77 @@
+"""
+カテゴリごとのノート数の集計のテストスクリプト
+"""
+
+import unittest
+
+import pytest
+from flask import Flask
+
+from database import Session, init_db
+from models import CategorySummary, Note
+from routes import notes_bp
+
+@pytest.mark.usefixtures('firebase_user')
+class TestCategoryEndpoint(unittest.TestCase):
+    """カテゴリ一覧のエンドポイントのテストクラス"""
+
+    @classmethod
+    def setUpClass(cls):
+        init_db()
+        cls.app = Flask(__name__)
+        cls.app.register_blueprint(notes_bp, url_prefix='/api')
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.uid = 'category-user'
+
+        db = Session()
+        db.query(Note).filter(Note.user_id.in_(['category-user', 'category-other'])).delete()
+        db.query(CategorySummary).delete()
+        db.commit()
+        db.close()
+
+    def call(self, method, path, **kwargs):
+        return getattr(self.client, method)(f'/api{path}', headers={'Authorization': 'Bearer test-token'}, **kwargs)
+
+    def create_note(self, main_category, sub_category=''):
+        return self.call('post', '/notes', json={
+            'title': 'ノート', 'main_category': main_category, 'sub_category': sub_category
+        }).get_json()['id']
+
+    def counts(self):
+        response = self.call('get', '/notes/categories')
+        self.assertEqual(response.status_code, 200)
+        return [(row['main_category'], row['sub_category'], row['count']) for row in response.get_json()]
+
+    def test_counts_follow_writes(self):
+        """作成・カテゴリの変更・削除・一括削除で件数が更新されることのテスト"""
+        first = self.create_note('数学', '微分')
+        second = self.create_note('数学', '微分')
+        third = self.create_note('英語')
+        self.uid = 'category-other'
+        self.create_note('数学', '微分')
+        self.uid = 'category-user'
+        self.assertEqual(self.counts(), [('数学', '微分', 2), ('英語', '', 1)])
+
+        self.call('put', f'/notes/{second}', json={'sub_category': '積分'})
+        self.assertEqual(self.counts(), [('数学', '微分', 1), ('数学', '積分', 1), ('英語', '', 1)])
+
+        self.call('put', f'/notes/{first}', json={'title': '改題'})
+        self.assertEqual(self.counts(), [('数学', '微分', 1), ('数学', '積分', 1), ('英語', '', 1)])
+
+        self.call('delete', f'/notes/{third}')
+        self.assertEqual(self.counts(), [('数学', '微分', 1), ('数学', '積分', 1)])
+
+        self.call('delete', '/notes', json={'ids': [first, second]})
+        self.assertEqual(self.counts(), [])
+
+    def test_last_updated_at(self):
+        """カテゴリ内で最後に作成・更新したノートの日時を返すことのテスト"""
+        first = self.create_note('数学')
+        self.create_note('数学')
+        updated_at = self.call('put', f'/notes/{first}', json={'title': '更新'}).get_json()['updated_at']
+
+        categories = self.call('get', '/notes/categories').get_json()
+        self.assertEqual(len(categories), 1)
+        self.assertEqual(categories[0]['last_updated_at'], updated_at)
@@ -0,0 +1,187 @@
+"""
+署名証明書ストアのテストスクリプト
+
+証明書エンドポイントの代わりにローカルのHTTPサーバーを起動して、
+事前取得、ワーカー間のファイル共有、更新失敗時の動作を確認します。
+"""
+
+import datetime
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt
+
+from cert_store import CertificateStore, FIREBASE_ISSUER_PREFIX
+
+PROJECT_ID = 'test-project'
+
+def generate_key_and_cert():
+    """テスト用のRSA鍵と自己署名証明書を生成する"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'test')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    key_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    )
+    return key_pem, cert.public_bytes(serialization.Encoding.PEM).decode('utf-8')
+
+class CertHandler(BaseHTTPRequestHandler):
+    """証明書エンドポイントの代わりのハンドラ"""
+
+    def do_GET(self):
+        server = self.server
+        server.request_count += 1
+        if server.fail:
+            self.send_response(503)
+            self.end_headers()
+            return
+        body = json.dumps(server.certs).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Cache-Control', f'public, max-age={server.max_age}')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestCertificateStore(unittest.TestCase):
+    """CertificateStoreのテストクラス"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.key_pem, cls.cert_pem = generate_key_and_cert()
+
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), CertHandler)
+        self.server.certs = {'kid-1': self.cert_pem}
+        self.server.max_age = 3600
+        self.server.fail = False
+        self.server.request_count = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}/certs'
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_file = os.path.join(self.temp_dir.name, 'certs.json')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def make_store(self, **kwargs):
+        return CertificateStore(cert_url=self.url, cache_file=self.cache_file, **kwargs)
+
+    def make_token(self, kid='kid-1', **claims):
+        now = int(time.time())
+        payload = {
+            'iss': FIREBASE_ISSUER_PREFIX + PROJECT_ID,
+            'aud': PROJECT_ID,
+            'sub': 'user-1',
+            'iat': now,
+            'exp': now + 3600
+        }
+        payload.update(claims)
+        signer = crypt.RSASigner.from_string(self.key_pem, key_id=kid)
+        return jwt.encode(signer, payload).decode('utf-8')
+
+    def test_prefetch_and_verify(self):
+        """事前取得した証明書でトークンを検証できることのテスト"""
+        store = self.make_store()
+        store.start()
+        try:
+            claims = store.verify_id_token(self.make_token(), PROJECT_ID)
+            self.assertEqual(claims['uid'], 'user-1')
+            self.assertEqual(self.server.request_count, 1)
+        finally:
+            store.stop()
+
+    def test_wrong_issuer_rejected(self):
+        """発行者が異なるトークンを拒否することのテスト"""
+        store = self.make_store()
+        token = self.make_token(iss='https://securetoken.google.com/other')
+        with self.assertRaises(ValueError):
+            store.verify_id_token(token, PROJECT_ID)
+
+    def test_shared_file_between_workers(self):
+        """別ワーカーが取得した証明書をファイルから読み込むことのテスト"""
+        self.make_store().refresh()
+        second = self.make_store()
+        self.assertEqual(second.get_certs(), {'kid-1': self.cert_pem})
+        self.assertEqual(self.server.request_count, 1)
+        self.assertEqual(second.fetch_count, 0)
+
+    def test_serves_stale_certs_while_refresh_fails(self):
+        """更新に失敗しても直前の証明書を返し続けることのテスト"""
+        self.server.max_age = 1
+        store = self.make_store(refresh_margin=0)
+        store.refresh()
+        time.sleep(1.1)
+        self.server.fail = True
+
+        self.assertEqual(store.get_certs(), {'kid-1': self.cert_pem})
+        store.stop()
+
+    def test_unknown_kid_forces_refresh(self):
+        """未知のキーIDで証明書を強制更新することのテスト"""
+        store = self.make_store(retry_interval=0)
+        store.refresh()
+        self.server.certs = {'kid-1': self.cert_pem, 'kid-2': self.cert_pem}
+
+        claims = store.verify_id_token(self.make_token(kid='kid-2'), PROJECT_ID)
+        self.assertEqual(claims['uid'], 'user-1')
+        self.assertEqual(self.server.request_count, 2)
+
+    def write_cache_file(self, certs, expires_in, mode=0o600, age=0):
+        now = time.time()
+        with open(self.cache_file, 'w') as f:
+            json.dump({'certs': certs, 'expires_at': now + expires_in, 'max_age': expires_in}, f)
+        os.chmod(self.cache_file, mode)
+        os.utime(self.cache_file, (now - age, now - age))
+
+    def test_written_file_is_private(self):
+        """共有ファイルを他のユーザーが読み書きできない権限で作成することのテスト"""
+        self.make_store().refresh()
+        self.assertEqual(os.stat(self.cache_file).st_mode & 0o777, 0o600)
+
+    def test_tampered_file_is_ignored(self):
+        """他のユーザーが書き込める共有ファイルの証明書は使わないことのテスト"""
+        _, planted = generate_key_and_cert()
+        self.write_cache_file({'kid-1': planted}, 10 * 365 * 86400, mode=0o666)
+        self.assertEqual(self.make_store().get_certs(), {'kid-1': self.cert_pem})
+        self.assertEqual(self.server.request_count, 1)
+
+        self.write_cache_file({'kid-1': 'not a certificate'}, 3600)
+        self.assertEqual(self.make_store().get_certs(), {'kid-1': self.cert_pem})
+        self.assertEqual(self.server.request_count, 2)
+
+    def test_file_expiry_is_capped(self):
+        """共有ファイルの有効期限は更新日時から最大の期間までに制限することのテスト"""
+        self.write_cache_file({'kid-1': self.cert_pem}, 10 * 365 * 86400, age=2 * 86400)
+        store = self.make_store()
+        store.get_certs()
+        self.assertEqual(self.server.request_count, 1)
+        self.assertLess(store.stats()['expires_at'], time.time() + 3601)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+"""
+ページ本文の保存用コーデックのテストスクリプト
+"""
+
+import json
+import unittest
+
+from sqlalchemy import Column, Integer, MetaData, Table, Text, create_engine, select
+
+from content_codec import CompressedText, RAW_MARKER, ZLIB_MARKER, decode_content, encode_content, is_encoded
+
+CONFIG = {'codec': 'zlib', 'level': 6, 'min_bytes': 1024}
+
+def make_canvas(strokes=50):
+    """繰り返しの多いキャンバスのJSONを作成する"""
+    return json.dumps({
+        'objects': [{'type': 'path', 'stroke': '#000000', 'path': [['Q', i, i, i + 1, i + 1] for i in range(40)]}
+                    for _ in range(strokes)]
+    })
+
+class TestContentCodec(unittest.TestCase):
+    """content_codecのテストクラス"""
+
+    def test_round_trip(self):
+        """圧縮した本文を元に戻せることのテスト"""
+        content = make_canvas()
+        encoded = encode_content(content, CONFIG)
+        self.assertTrue(encoded.startswith(ZLIB_MARKER))
+        self.assertLess(len(encoded), len(content))
+        self.assertEqual(decode_content(encoded), content)
+
+    def test_small_and_legacy_values_unchanged(self):
+        """小さい本文と圧縮前の既存の値はそのまま扱うことのテスト"""
+        self.assertEqual(encode_content('{"objects": []}', CONFIG), '{"objects": []}')
+        self.assertEqual(decode_content('{"objects": []}'), '{"objects": []}')
+        self.assertIsNone(encode_content(None, CONFIG))
+        self.assertIsNone(decode_content(None))
+
+    def test_disabled_codec(self):
+        """圧縮を無効にした場合は圧縮しないことのテスト"""
+        content = make_canvas()
+        self.assertEqual(encode_content(content, dict(CONFIG, codec='none')), content)
+
+    def test_content_starting_with_marker(self):
+        """マーカーで始まる本文も保存して元に戻せることのテスト"""
+        encoded = encode_content(make_canvas(), CONFIG)
+        for content in (ZLIB_MARKER + 'not base64', RAW_MARKER + 'x', encoded):
+            for config in (CONFIG, dict(CONFIG, codec='none'), dict(CONFIG, min_bytes=0)):
+                stored = encode_content(content, config)
+                self.assertTrue(is_encoded(stored))
+                self.assertEqual(decode_content(stored), content)
+
+    def test_column_type(self):
+        """CompressedText列が保存時に圧縮し、読み込み時に展開することのテスト"""
+        engine = create_engine('sqlite://')
+        metadata = MetaData()
+        pages = Table('pages', metadata,
+                      Column('id', Integer, primary_key=True),
+                      Column('content', CompressedText))
+        raw_pages = Table('pages', MetaData(),
+                          Column('id', Integer, primary_key=True),
+                          Column('content', Text))
+        metadata.create_all(engine)
+
+        content = make_canvas()
+        with engine.begin() as conn:
+            conn.execute(pages.insert(), [{'id': 1, 'content': content}])
+            # 圧縮前に保存された既存の行
+            conn.execute(raw_pages.insert(), [{'id': 2, 'content': content}])
+
+        with engine.connect() as conn:
+            stored = dict(conn.execute(select(raw_pages.c.id, raw_pages.c.content)).fetchall())
+            loaded = dict(conn.execute(select(pages.c.id, pages.c.content)).fetchall())
+        self.assertTrue(is_encoded(stored[1]))
+        self.assertFalse(is_encoded(stored[2]))
+        self.assertEqual(loaded, {1: content, 2: content})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+データベースエンジン作成とプール監視のテストスクリプト
+"""
+
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+
+from db_engine import create_db_engine, load_engine_config, normalize_database_url, pool_stats
+
+class TestDbEngine(unittest.TestCase):
+    """create_db_engineとpool_statsのテストクラス"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        config = load_engine_config()
+        config.update({'pool_size': 1, 'max_overflow': 0, 'pool_timeout': 0.1})
+        self.engine = create_db_engine(
+            f"sqlite:///{os.path.join(self.temp_dir.name, 'pool.db')}", config=config
+        )
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.temp_dir.cleanup()
+
+    def test_checkout_stats(self):
+        """使用中の接続数と取得回数が記録されることのテスト"""
+        with self.engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+            stats = pool_stats(self.engine)
+            self.assertEqual(stats['checked_out'], 1)
+
+        stats = pool_stats(self.engine)
+        self.assertEqual(stats['checked_out'], 0)
+        self.assertEqual(stats['checkouts'], 1)
+        self.assertEqual(stats['timeouts'], 0)
+
+    def test_timeout_counted(self):
+        """接続の取得待ちのタイムアウトが記録されることのテスト"""
+        with self.engine.connect():
+            with self.assertRaises(PoolTimeoutError):
+                self.engine.connect()
+
+        stats = pool_stats(self.engine)
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertGreaterEqual(stats['max_wait_seconds'], 0.1)
+
+    def test_normalize_database_url(self):
+        """postgres://形式のURLが変換されることのテスト"""
+        self.assertEqual(normalize_database_url('postgres://u@h/db'), 'postgresql://u@h/db')
+        self.assertEqual(normalize_database_url('sqlite:///./notes.db'), 'sqlite:///./notes.db')
+
+class TestSqliteProfile(unittest.TestCase):
+    """SQLiteの性能プロファイルのテストクラス"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.url = f"sqlite:///{os.path.join(self.temp_dir.name, 'profile.db')}"
+        self.config = load_engine_config()
+        self.config['sqlite_profile'] = True
+        self.engine = create_db_engine(self.url, config=self.config)
+        self.read_engine = create_db_engine(self.url, config=self.config, read_only=True)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.read_engine.dispose()
+        self.temp_dir.cleanup()
+
+    def test_pragmas_applied(self):
+        """接続時にPRAGMAが設定されることのテスト"""
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(text('PRAGMA journal_mode')).scalar(), 'wal')
+            self.assertEqual(conn.execute(text('PRAGMA synchronous')).scalar(), 1)
+            self.assertEqual(conn.execute(text('PRAGMA foreign_keys')).scalar(), 1)
+            self.assertEqual(conn.execute(text('PRAGMA busy_timeout')).scalar(), self.config['sqlite_busy_timeout_ms'])
+
+    def test_read_engine_is_query_only(self):
+        """読み取り用エンジンで書き込みが拒否されることのテスト"""
+        with self.engine.begin() as conn:
+            conn.execute(text('CREATE TABLE items (id INTEGER PRIMARY KEY)'))
+            conn.execute(text('INSERT INTO items (id) VALUES (1)'))
+
+        with self.read_engine.connect() as conn:
+            self.assertEqual(conn.execute(text('SELECT COUNT(*) FROM items')).scalar(), 1)
+            with self.assertRaises(OperationalError):
+                conn.execute(text('INSERT INTO items (id) VALUES (2)'))
+
+    def test_reader_not_blocked_by_writer(self):
+        """書き込み中のトランザクションがあっても読み取れることのテスト"""
+        with self.engine.begin() as conn:
+            conn.execute(text('CREATE TABLE items (id INTEGER PRIMARY KEY)'))
+
+        with self.engine.begin() as writer:
+            writer.execute(text('INSERT INTO items (id) VALUES (1)'))
+            with self.read_engine.connect() as reader:
+                self.assertEqual(reader.execute(text('SELECT COUNT(*) FROM items')).scalar(), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+"""
+読み取り/書き込みのエンジン振り分けのテストスクリプト
+
+プライマリとレプリカを別々のSQLiteファイルで用意し、
+どちらのエンジンから読み取ったかを内容の違いで確認します。
+"""
+
+import os
+import tempfile
+import unittest
+
+from flask import Flask, jsonify, request
+from sqlalchemy import Column, Integer, String
+from sqlalchemy.orm import declarative_base, scoped_session, sessionmaker
+
+from db_engine import create_db_engine
+from db_routing import ReadWriteRouter, RoutingSession
+
+Base = declarative_base()
+
+class Item(Base):
+    __tablename__ = 'items'
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50))
+
+class FakeClock:
+    """テスト用に進め方を制御できる時計"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestDbRouting(unittest.TestCase):
+    """ReadWriteRouterとRoutingSessionのテストクラス"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.primary = create_db_engine(f"sqlite:///{os.path.join(self.tmpdir, 'primary.db')}")
+        self.replica = create_db_engine(f"sqlite:///{os.path.join(self.tmpdir, 'replica.db')}")
+        for engine, name in ((self.primary, 'primary'), (self.replica, 'replica')):
+            Base.metadata.create_all(engine)
+            with engine.begin() as conn:
+                conn.execute(Item.__table__.insert(), {'name': name})
+
+        self.clock = FakeClock()
+        self.router = ReadWriteRouter(self.primary, [self.replica], sticky_seconds=5, clock=self.clock)
+        self.read_session = scoped_session(sessionmaker(class_=RoutingSession, info={'router': self.router}))
+        self.client = self.create_app().test_client()
+
+    def tearDown(self):
+        self.read_session.remove()
+        self.primary.dispose()
+        self.replica.dispose()
+
+    def create_app(self):
+        app = Flask(__name__)
+        self.router.init_app(app)
+        read_session = self.read_session
+
+        def read_names():
+            try:
+                return jsonify(sorted(item.name for item in read_session.query(Item).all()))
+            finally:
+                read_session.close()
+
+        @app.before_request
+        def set_user():
+            request.firebase_token = {'uid': request.headers.get('X-User', 'user-1')}
+
+        @app.route('/items', methods=['GET'])
+        def list_items():
+            return read_names()
+
+        @app.route('/items', methods=['POST'])
+        def add_item():
+            return jsonify({'written': True}), 201
+
+        return app
+
+    def test_get_reads_from_replica(self):
+        """GETリクエストはレプリカから読み取ることのテスト"""
+        self.assertEqual(self.client.get('/items').get_json(), ['replica'])
+        self.assertEqual(self.router.stats()['replica_reads'], 1)
+
+    def test_read_your_writes(self):
+        """書き込んだユーザーの読み取りが一定時間プライマリに固定されることのテスト"""
+        self.assertEqual(self.client.post('/items').status_code, 201)
+        self.assertEqual(self.client.get('/items').get_json(), ['primary'])
+
+        # 他のユーザーはレプリカから読み取る
+        response = self.client.get('/items', headers={'X-User': 'user-2'})
+        self.assertEqual(response.get_json(), ['replica'])
+
+        self.clock.now += 5
+        self.assertEqual(self.client.get('/items').get_json(), ['replica'])
+
+    def test_failed_write_is_not_sticky(self):
+        """失敗した書き込みでは固定しないことのテスト"""
+        self.client.post('/missing')
+        self.assertEqual(self.client.get('/items').get_json(), ['replica'])
+
+    def test_without_replicas_reads_primary(self):
+        """レプリカがない場合は常にプライマリから読み取ることのテスト"""
+        self.router = ReadWriteRouter(self.primary, [])
+        self.read_session = scoped_session(sessionmaker(class_=RoutingSession, info={'router': self.router}))
+        client = self.create_app().test_client()
+        self.assertEqual(client.get('/items').get_json(), ['primary'])
+
+    def test_tracked_users_are_bounded(self):
+        """記録するユーザー数に上限があることのテスト"""
+        router = ReadWriteRouter(self.primary, [self.replica], max_tracked_users=2, clock=self.clock)
+        for user_id in ('a', 'b', 'c'):
+            router.mark_write(user_id)
+        self.assertFalse(router.is_sticky('a'))
+        self.assertTrue(router.is_sticky('c'))
+        self.assertEqual(router.stats()['sticky_users'], 2)
+
+if __name__ == "__main__":
+    unittest.main()
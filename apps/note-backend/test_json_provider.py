@@ -0,0 +1,95 @@
+"""
+JSONプロバイダーのテストスクリプト
+"""
+
+import decimal
+import json
+import unittest
+from datetime import date, datetime, timedelta, timezone
+from unittest import mock
+
+from flask import Flask, jsonify, request
+
+import json_provider
+from json_provider import FastJSONProvider
+from json_stream import iter_json_object, json_stream_response
+
+VALUES = {
+    'title': 'ノート',
+    'created_at': datetime(2024, 5, 1, 9, 30, 15, 123456),
+    'updated_at': datetime(2024, 5, 1, 9, 30, 15, tzinfo=timezone(timedelta(hours=9))),
+    'date': date(2024, 5, 1),
+    'price': decimal.Decimal('1.50'),
+    'layout_settings': {'grid': True, 'margin': [10, 20.5]},
+    'content': None,
+}
+
+EXPECTED = {
+    'title': 'ノート',
+    'created_at': '2024-05-01T09:30:15.123456+00:00',
+    'updated_at': '2024-05-01T09:30:15+09:00',
+    'date': '2024-05-01',
+    'price': '1.50',
+    'layout_settings': {'grid': True, 'margin': [10, 20.5]},
+    'content': None,
+}
+
+def create_test_app():
+    """テスト用のFlaskアプリケーションを作成する"""
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+
+    @app.route('/values')
+    def values():
+        return jsonify(VALUES)
+
+    @app.route('/echo', methods=['POST'])
+    def echo():
+        return jsonify(request.get_json())
+
+    @app.route('/stream')
+    def stream():
+        return json_stream_response(iter_json_object({'id': 1}, 'pages', iter([VALUES])))
+
+    return app
+
+class TestFastJSONProvider(unittest.TestCase):
+    """FastJSONProviderのテストクラス"""
+
+    def setUp(self):
+        self.app = create_test_app()
+        self.client = self.app.test_client()
+
+    def test_jsonify(self):
+        """日時、Decimal、layout_settingsを一貫した形式で返すことのテスト"""
+        response = self.client.get('/values')
+        self.assertEqual(response.get_json(), EXPECTED)
+        # 非ASCII文字はエスケープしない
+        self.assertIn('ノート'.encode('utf-8'), response.data)
+
+    def test_stdlib_fallback_matches(self):
+        """orjsonがない場合も同じ出力になることのテスト"""
+        provider = self.app.json
+        with_orjson = provider.dumps_bytes(VALUES)
+        with mock.patch.object(json_provider, 'orjson', None):
+            self.assertEqual(provider.dumps_bytes(VALUES), with_orjson)
+            self.assertEqual(provider.loads(with_orjson), EXPECTED)
+
+    def test_unsupported_values_fall_back(self):
+        """orjsonで扱えない値は標準のjsonでエンコードすることのテスト"""
+        self.assertEqual(json.loads(self.app.json.dumps({'big': 2 ** 70})), {'big': 2 ** 70})
+        with self.assertRaises(TypeError):
+            self.app.json.dumps({'value': object()})
+
+    def test_request_body_and_stream(self):
+        """リクエストボディの読み込みとストリーミングのレスポンスのテスト"""
+        response = self.client.post('/echo', json={'objects': [{'type': 'path'}]})
+        self.assertEqual(response.get_json(), {'objects': [{'type': 'path'}]})
+        self.assertEqual(self.client.post('/echo', data='{bad', content_type='application/json').status_code, 400)
+
+        response = self.client.get('/stream')
+        self.assertEqual(response.get_json(), {'id': 1, 'pages': [EXPECTED]})
+        response.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+JSONレスポンスのストリーミングのテストスクリプト
+"""
+
+import json
+import unittest
+from unittest import mock
+
+import pytest
+from flask import Flask
+
+from database import Session, init_db
+from json_stream import iter_json_array, iter_json_object, stream_rows
+from models import Note, Page
+from routes import notes_bp
+
+class TestJsonFragments(unittest.TestCase):
+    """JSONの断片の組み立てのテストクラス"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+
+    def test_object_with_array(self):
+        """断片をつなげると元のJSONになることのテスト"""
+        with self.app.app_context():
+            text = ''.join(iter_json_object({'id': 1, 'title': 'ノート'}, 'pages', iter([{'a': 1}, {'a': 2}])))
+            self.assertEqual(json.loads(text), {'id': 1, 'title': 'ノート', 'pages': [{'a': 1}, {'a': 2}]})
+            self.assertEqual(json.loads(''.join(iter_json_object({}, 'pages', iter([])))), {'pages': []})
+            self.assertEqual(json.loads(''.join(iter_json_array(iter([])))), [])
+
+    def test_session_closed_on_disconnect(self):
+        """途中でジェネレータを閉じてもセッションが閉じられることのテスト"""
+        session = mock.MagicMock()
+        factory = mock.MagicMock(return_value=session)
+        session.__enter__.return_value = session
+        query = mock.MagicMock()
+        query.yield_per.return_value = iter([1, 2, 3])
+
+        rows = stream_rows(factory, lambda s: query, lambda row: row)
+        self.assertEqual(next(rows), 1)
+        rows.close()
+        session.__exit__.assert_called_once()
+        query.yield_per.assert_called_once()
+
+@pytest.mark.usefixtures('firebase_user')
+class TestStreamedNote(unittest.TestCase):
+    """ノート取得のストリーミングのテストクラス"""
+
+    @classmethod
+    def setUpClass(cls):
+        init_db()
+        cls.app = Flask(__name__)
+        cls.app.register_blueprint(notes_bp, url_prefix='/api')
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.uid = 'streamer'
+
+        db = Session()
+        note = Note(title='テスト', main_category='その他', sub_category='', user_id='streamer', last_position=50)
+        for number in range(1, 51):
+            note.pages.append(Page(position=number, content='x' * number, layout_settings={}))
+        db.add(note)
+        db.commit()
+        self.note_id = note.id
+        db.close()
+
+    def test_note_is_streamed(self):
+        """ページをストリーミングで返し、ETagも付くことのテスト"""
+        response = self.client.get(f'/api/notes/{self.note_id}', headers={'Authorization': 'Bearer test-token'})
+        self.assertTrue(response.is_streamed)
+        self.assertIn('ETag', response.headers)
+        body = response.get_json()
+        response.close()
+        self.assertEqual(body['page_count'], 50)
+        self.assertEqual([len(page['content']) for page in body['pages']], list(range(1, 51)))
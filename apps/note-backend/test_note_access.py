@@ -0,0 +1,396 @@
+"""
+所有権チェック付きローダーのテストスクリプト
+
+一時ファイルのSQLiteデータベースを使用し、Firebaseのトークン検証は
+モックに置き換えてエンドポイントを呼び出します。
+"""
+
+import unittest
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+import database
+from database import Session, engine, read_engines, init_db, init_session_lifecycle
+from models import Bookmark, Note, Page
+from routes import notes_bp, bookmarks_bp
+
+def create_test_app():
+    """テスト用のFlaskアプリケーションを作成する"""
+    app = Flask(__name__)
+    app.register_blueprint(notes_bp, url_prefix='/api')
+    app.register_blueprint(bookmarks_bp, url_prefix='/api')
+    init_session_lifecycle(app)
+    return app
+
+class QueryCounter:
+    """実行されたSQLの数を数えるコンテキストマネージャ"""
+
+    def __init__(self):
+        self.count = 0
+
+    def _count(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        for target in {engine, *read_engines}:
+            event.listen(target, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, *args):
+        for target in {engine, *read_engines}:
+            event.remove(target, 'before_cursor_execute', self._count)
+
+@pytest.mark.usefixtures('firebase_user')
+class TestRequireNoteOwner(unittest.TestCase):
+    """require_note_ownerのテストクラス"""
+
+    @classmethod
+    def setUpClass(cls):
+        init_db()
+        cls.app = create_test_app()
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.uid = 'owner'
+
+        db = Session()
+        note = Note(title='テスト', main_category='その他', sub_category='', user_id='owner', last_position=1)
+        note.pages.append(Page(position=1, content='{"objects": []}', layout_settings={}))
+        db.add(note)
+        db.commit()
+        self.note_id = note.id
+        db.close()
+
+    def get(self, path):
+        return self.client.get(path, headers={'Authorization': 'Bearer test-token'})
+
+    def test_get_page_single_query(self):
+        """ノート、所有権、ページを1回のクエリで取得することのテスト"""
+        with QueryCounter() as counter:
+            response = self.get(f'/api/notes/{self.note_id}/pages/1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['content'], '{"objects": []}')
+        self.assertEqual(counter.count, 1)
+
+    def test_missing_page_returns_empty_page(self):
+        """存在しないページは空のページとして返すことのテスト"""
+        response = self.get(f'/api/notes/{self.note_id}/pages/5')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.get_json()['id'])
+
+    def test_other_user_forbidden(self):
+        """他ユーザーのノートには403を返すことのテスト"""
+        self.uid = 'someone-else'
+        response = self.get(f'/api/notes/{self.note_id}/pages/1')
+        self.assertEqual(response.status_code, 403)
+
+        response = self.get(f'/api/notes/{self.note_id}/bookmarks')
+        self.assertEqual(response.status_code, 403)
+
+    def test_missing_note_not_found(self):
+        """存在しないノートには404を返すことのテスト"""
+        response = self.get('/api/notes/999999/pages/1')
+        self.assertEqual(response.status_code, 404)
+
+    def test_delete_page_renumbers_later_pages(self):
+        """ページ削除後に後続のページ番号が詰められ、他の行は更新されないことのテスト"""
+        db = Session()
+        # IDの順序と位置の順序を逆にしてページ番号が位置から計算されることを確認する
+        db.add_all([
+            Page(note_id=self.note_id, position=3, content='3'),
+            Page(note_id=self.note_id, position=2, content='2'),
+        ])
+        db.commit()
+        db.close()
+
+        response = self.client.delete(
+            f'/api/notes/{self.note_id}/pages/1',
+            headers={'Authorization': 'Bearer test-token'}
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.get(f'/api/notes/{self.note_id}/pages/1').get_json()['content'], '2')
+        self.assertEqual(self.get(f'/api/notes/{self.note_id}/pages/2').get_json()['content'], '3')
+        db = Session()
+        pages = db.query(Page).filter(Page.note_id == self.note_id).order_by(Page.position).all()
+        self.assertEqual([(p.position, p.version) for p in pages], [(2, 1), (3, 1)])
+        db.close()
+
+@pytest.mark.usefixtures('firebase_user')
+class TestConditionalGet(unittest.TestCase):
+    """ETagによる条件付き取得のテストクラス"""
+
+    @classmethod
+    def setUpClass(cls):
+        init_db()
+        cls.app = create_test_app()
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.uid = 'owner'
+
+        db = Session()
+        note = Note(title='テスト', main_category='その他', sub_category='', user_id='owner', last_position=2)
+        note.pages.append(Page(position=1, content='1', layout_settings={}))
+        note.pages.append(Page(position=2, content='2', layout_settings={}))
+        db.add(note)
+        db.commit()
+        self.note_id = note.id
+        db.close()
+
+    def request(self, method, path, etag=None, **kwargs):
+        headers = {'Authorization': 'Bearer test-token'}
+        if etag:
+            headers['If-None-Match'] = etag
+        response = getattr(self.client, method)(path, headers=headers, **kwargs)
+        # ストリーミングのレスポンスは本文を読み終えてから閉じ、リクエストのコンテキストを順に破棄する
+        response.get_data()
+        response.close()
+        return response
+
+    def test_not_modified_without_content(self):
+        """ETagが一致する場合は本文の列を読まずに304を返すことのテスト"""
+        path = f'/api/notes/{self.note_id}/pages/1'
+        etag = self.request('get', path).headers['ETag']
+
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        for target in {engine, *read_engines}:
+            event.listen(target, 'before_cursor_execute', record)
+        try:
+            response = self.request('get', path, etag=etag)
+        finally:
+            for target in {engine, *read_engines}:
+                event.remove(target, 'before_cursor_execute', record)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+        self.assertEqual(len(statements), 1)
+        self.assertNotIn('pages.content', statements[0])
+
+    def test_etag_changes_on_update(self):
+        """ページの更新でETagが変わることのテスト"""
+        path = f'/api/notes/{self.note_id}/pages/2'
+        etag = self.request('get', path).headers['ETag']
+        self.request('put', path, json={'content': '更新'})
+
+        response = self.request('get', path, etag=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_etag_changes_on_renumber(self):
+        """削除によるページ番号の変更でもETagが変わることのテスト"""
+        etag = self.request('get', f'/api/notes/{self.note_id}/pages/1').headers['ETag']
+        self.request('delete', f'/api/notes/{self.note_id}/pages/1')
+
+        # 2ページ目が1ページ目に繰り上がる（繰り上がったページの行は更新されない）
+        response = self.request('get', f'/api/notes/{self.note_id}/pages/1', etag=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['content'], '2')
+        page_id = response.get_json()['id']
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual(response.headers['ETag'], f'W/"page-{page_id}-1"')
+
+    def test_note_etag_varies_by_query(self):
+        """includeとpagesが異なる場合はETagが一致しても304を返さないことのテスト"""
+        path = f'/api/notes/{self.note_id}'
+        etag = self.request('get', path, query_string={'include': 'none'}).headers['ETag']
+
+        for params in ({'include': 'pages'}, {'include': 'pages_meta'}, {'include': 'none', 'pages': '1..1'}, {}):
+            response = self.request('get', path, etag=etag, query_string=params)
+            self.assertEqual(response.status_code, 200, params)
+            self.assertNotEqual(response.headers['ETag'], etag)
+
+        self.assertEqual(self.request('get', path, etag=etag, query_string={'include': 'none'}).status_code, 304)
+
+        # 省略時と既定値の指定は同じETagになる
+        etag = self.request('get', path, query_string={'pages': '1..1'}).headers['ETag']
+        response = self.request('get', path, etag=etag, query_string={'include': 'pages', 'pages': '1..1'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.request('get', path, etag=etag, query_string={'pages': '1..2'}).status_code, 200)
+
+    def test_other_user_does_not_get_not_modified(self):
+        """他ユーザーにはETagが一致しても304を返さないことのテスト"""
+        path = f'/api/notes/{self.note_id}/pages/1'
+        etag = self.request('get', path).headers['ETag']
+        self.uid = 'someone-else'
+        self.assertEqual(self.request('get', path, etag=etag).status_code, 403)
+
+@pytest.mark.usefixtures('firebase_user')
+class TestSelectiveNoteFetch(unittest.TestCase):
+    """ノート取得のincludeとpagesパラメータのテストクラス"""
+
+    @classmethod
+    def setUpClass(cls):
+        init_db()
+        cls.app = create_test_app()
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.uid = 'owner'
+
+        db = Session()
+        note = Note(title='テスト', main_category='その他', sub_category='', user_id='owner', last_position=5)
+        for number in range(1, 6):
+            note.pages.append(Page(position=number, content=str(number), layout_settings={}))
+        db.add(note)
+        db.commit()
+        self.note_id = note.id
+        db.close()
+
+    def get(self, query=''):
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        for target in {engine, *read_engines}:
+            event.listen(target, 'before_cursor_execute', record)
+        try:
+            response = self.client.get(f'/api/notes/{self.note_id}{query}',
+                                       headers={'Authorization': 'Bearer test-token'})
+            # 本文の列はストリーミング中に読むため、本文を読み終えるまでのクエリを記録して閉じる
+            response.get_data()
+            response.close()
+        finally:
+            for target in {engine, *read_engines}:
+                event.remove(target, 'before_cursor_execute', record)
+        return response, statements
+
+    def test_default_includes_content(self):
+        """デフォルトでは全ページの本文を返すことのテスト"""
+        response, _ = self.get()
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual(body['page_count'], 5)
+        self.assertEqual([page['content'] for page in body['pages']], ['1', '2', '3', '4', '5'])
+
+    def test_pages_meta_skips_content(self):
+        """pages_metaでは本文の列を読まないことのテスト"""
+        response, statements = self.get('?include=pages_meta')
+        pages = response.get_json()['pages']
+        self.assertEqual([page['page_number'] for page in pages], [1, 2, 3, 4, 5])
+        self.assertNotIn('content', pages[0])
+        self.assertTrue(all('pages.content' not in statement for statement in statements))
+
+    def test_none_and_range(self):
+        """includeにnone、pagesに範囲を指定した場合のテスト"""
+        response, statements = self.get('?include=none')
+        self.assertNotIn('pages', response.get_json())
+        self.assertEqual(response.get_json()['page_count'], 5)
+        self.assertTrue(all('pages.content' not in statement for statement in statements))
+
+        response, _ = self.get('?pages=2..3')
+        self.assertEqual([page['content'] for page in response.get_json()['pages']], ['2', '3'])
+        response, _ = self.get('?include=pages_meta&pages=4..')
+        self.assertEqual([page['page_number'] for page in response.get_json()['pages']], [4, 5])
+
+    def test_invalid_parameters(self):
+        """不正なパラメータは400を返すことのテスト"""
+        for query in ('?include=all', '?pages=3..1', '?pages=a..b', '?pages=0'):
+            self.assertEqual(self.get(query)[0].status_code, 400, query)
+
+@pytest.mark.usefixtures('firebase_user')
+class TestSessionLifecycle(unittest.TestCase):
+    """リクエスト単位のセッション管理のテストクラス"""
+
+    @classmethod
+    def setUpClass(cls):
+        init_db()
+        cls.app = create_test_app()
+
+        @cls.app.route('/leaky')
+        def leaky():
+            # セッションを閉じずに終了するハンドラー
+            Session().query(Note).count()
+            return 'ok'
+
+    def test_leaked_session_is_released_and_counted(self):
+        """閉じ忘れたセッションが破棄され、エンドポイントごとに数えられることのテスト"""
+        before = database.leaked_sessions['leaky']
+        with self.assertLogs('noteapp', level='WARNING') as logs:
+            response = self.app.test_client().get('/leaky')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(database.leaked_sessions['leaky'], before + 1)
+        self.assertIn('エンドポイント=leaky', logs.output[0])
+        self.assertEqual(engine.pool.checkedout(), 0)
+        self.assertEqual(database.get_pool_stats()['leaked_sessions']['leaky'], before + 1)
+
+    def test_closed_session_is_not_counted(self):
+        """ハンドラー内で閉じたセッションは数えないことのテスト"""
+        self.app.test_client().get('/api/notes', headers={'Authorization': 'Bearer test-token'})
+        self.assertNotIn('notes.get_notes', database.leaked_sessions)
+
+@pytest.mark.usefixtures('firebase_user')
+class TestNoteDeletion(unittest.TestCase):
+    """ノート削除（データベースのON DELETE CASCADE）のテストクラス"""
+
+    @classmethod
+    def setUpClass(cls):
+        init_db()
+        cls.app = create_test_app()
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.uid = 'deleter'
+
+        db = Session()
+        notes = []
+        for user_id in ('deleter', 'deleter', 'other'):
+            note = Note(title='テスト', main_category='その他', sub_category='', user_id=user_id,
+                        last_position=200)
+            for number in range(1, 201):
+                note.pages.append(Page(position=number, content='x' * 100, layout_settings={}))
+            db.add(note)
+            notes.append(note)
+        db.commit()
+        self.note_ids = [note.id for note in notes]
+        page = db.query(Page).filter(Page.note_id == self.note_ids[0]).first()
+        db.add(Bookmark(note_id=self.note_ids[0], page_id=page.id, page_number=1))
+        db.commit()
+        db.close()
+
+    def remaining(self, note_ids):
+        db = Session()
+        try:
+            return (db.query(Note).filter(Note.id.in_(note_ids)).count(),
+                    db.query(Page).filter(Page.note_id.in_(note_ids)).count(),
+                    db.query(Bookmark).filter(Bookmark.note_id.in_(note_ids)).count())
+        finally:
+            db.close()
+
+    def test_delete_does_not_load_pages(self):
+        """ページを読み込まずに1つのDELETE文でノートを削除することのテスト"""
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            response = self.client.delete(f'/api/notes/{self.note_ids[0]}',
+                                          headers={'Authorization': 'Bearer test-token'})
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([s for s in statements if 'FROM pages' in s])
+        self.assertEqual(len([s for s in statements if s.startswith('DELETE FROM notes')]), 1)
+        self.assertFalse([s for s in statements if s.startswith(('DELETE FROM pages', 'DELETE FROM bookmarks'))])
+        self.assertEqual(self.remaining(self.note_ids[:1]), (0, 0, 0))
+
+    def test_bulk_delete(self):
+        """所有するノートだけを一括で削除することのテスト"""
+        missing = max(self.note_ids) + 1000
+        response = self.client.delete('/api/notes', json={'ids': self.note_ids + [missing]},
+                                      headers={'Authorization': 'Bearer test-token'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), {
+            'deleted': self.note_ids[:2],
+            'not_found': sorted([self.note_ids[2], missing])
+        })
+        self.assertEqual(self.remaining(self.note_ids[:2]), (0, 0, 0))
+        self.assertEqual(self.remaining(self.note_ids[2:]), (1, 200, 0))
+
+        for body in ({'ids': []}, {'ids': ['1']}, {'ids': list(range(1, 102))}, None):
+            response = self.client.delete('/api/notes', json=body,
+                                          headers={'Authorization': 'Bearer test-token'})
+            self.assertEqual(response.status_code, 400)
@@ -0,0 +1,154 @@
+"""
+OCR結果の保存のテストスクリプト
+"""
+
+import base64
+import unittest
+from unittest import mock
+
+import pytest
+from flask import Flask
+from google.cloud import vision
+
+from database import Session, init_db
+from models import PageOcrResult
+from ocr_result import decode_boxes, encode_boxes, extract_boxes
+from routes import notes_bp
+
+IMAGE = base64.b64encode(b'fake image').decode('ascii')
+
+def symbol(text, detected_break=0):
+    return {'text': text, 'property': {'detected_break': {'type_': detected_break}}}
+
+def word(text, x, detected_break=0):
+    symbols = [symbol(char) for char in text[:-1]] + [symbol(text[-1], detected_break)]
+    vertices = [{'x': x, 'y': 10}, {'x': x + 10 * len(text), 'y': 10},
+                {'x': x + 10 * len(text), 'y': 30}, {'x': x, 'y': 30}]
+    return {'symbols': symbols, 'bounding_box': {'vertices': vertices}}
+
+def vision_response(text='数学 の\nノート'):
+    """「数学 の」「ノート」の2行を含むVision APIのレスポンスを作成する"""
+    words = [word('数学', 0, 1), word('の', 30, 5), word('ノート', 0)]
+    return vision.AnnotateImageResponse(full_text_annotation={
+        'text': text,
+        'pages': [{'blocks': [{'paragraphs': [{'words': words}]}]}],
+    })
+
+class TestExtractBoxes(unittest.TestCase):
+    """単語と行の取り出しのテストクラス"""
+
+    def test_extract_boxes(self):
+        """区切りで行を分け、単語の矩形を行にまとめることのテスト"""
+        words, lines = extract_boxes(vision_response().full_text_annotation)
+        self.assertEqual(words, [['数学', 0, 10, 20, 30], ['の', 30, 10, 40, 30], ['ノート', 0, 10, 30, 30]])
+        self.assertEqual(lines, [['数学 の', 0, 10, 40, 30], ['ノート', 0, 10, 30, 30]])
+        self.assertEqual(decode_boxes(encode_boxes(words, lines)), (words, lines))
+
+@pytest.mark.usefixtures('firebase_user')
+class TestOcrEndpoint(unittest.TestCase):
+    """OCRエンドポイントのテストクラス"""
+
+    @classmethod
+    def setUpClass(cls):
+        init_db()
+        cls.app = Flask(__name__)
+        cls.app.register_blueprint(notes_bp, url_prefix='/api')
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.uid = 'ocr-user'
+        self.patcher = mock.patch('routes.ocr.init_vision_client')
+        self.vision = self.patcher.start().return_value
+        self.vision.document_text_detection.return_value = vision_response()
+
+        self.note_id = self.call('post', '/notes', json={'title': 'OCR', 'main_category': '数学'}).get_json()['id']
+        self.call('post', f'/notes/{self.note_id}/pages', json={'content': '{"objects": []}'})
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def call(self, method, path, **kwargs):
+        return getattr(self.client, method)(f'/api{path}', headers={'Authorization': 'Bearer test-token'}, **kwargs)
+
+    def ocr(self, page_number=1, **body):
+        return self.call('post', f'/notes/{self.note_id}/pages/{page_number}/ocr', json=body)
+
+    def test_result_is_reused_until_page_changes(self):
+        """ページが変わるまではVision APIを呼ばずに保存した結果を返すことのテスト"""
+        self.assertEqual(self.call('get', f'/notes/{self.note_id}/pages/1/ocr').status_code, 404)
+
+        data = self.ocr(image=IMAGE).get_json()
+        self.assertEqual(data['text'], '数学 の\nノート')
+        self.assertEqual(data['lines'], [['数学 の', 0, 10, 40, 30], ['ノート', 0, 10, 30, 30]])
+        self.assertFalse(data['cached'])
+
+        self.assertTrue(self.ocr().get_json()['cached'])
+        response = self.call('get', f'/notes/{self.note_id}/pages/1/ocr')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['words'], data['words'])
+        self.assertEqual(self.vision.document_text_detection.call_count, 1)
+
+        self.ocr(image=IMAGE, force=True)
+        self.assertEqual(self.vision.document_text_detection.call_count, 2)
+
+        self.call('put', f'/notes/{self.note_id}/pages/1', json={'content': '{"objects": [{}]}'})
+        response = self.call('get', f'/notes/{self.note_id}/pages/1/ocr')
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(response.get_json()['stale'])
+        self.assertEqual(self.ocr().status_code, 400)
+
+        self.vision.document_text_detection.return_value = vision_response('更新後')
+        self.assertEqual(self.ocr(image=IMAGE).get_json()['text'], '更新後')
+        self.assertEqual(self.call('get', f'/notes/{self.note_id}/pages/1/ocr').get_json()['text'], '更新後')
+
+    def test_new_image_is_not_served_from_cache(self):
+        """ページが更新されていなくても、前回と異なる画像はOCRを実行することのテスト"""
+        self.ocr(image=IMAGE)
+        self.assertTrue(self.ocr(image=IMAGE).get_json()['cached'])
+
+        # 保存されていない描画を含む画像
+        self.vision.document_text_detection.return_value = vision_response('追記')
+        other_image = base64.b64encode(b'fake image with strokes').decode('ascii')
+        data = self.ocr(image=other_image).get_json()
+        self.assertFalse(data['cached'])
+        self.assertEqual(data['text'], '追記')
+        self.assertEqual(self.vision.document_text_detection.call_count, 2)
+
+        self.assertTrue(self.ocr(image=other_image).get_json()['cached'])
+        self.assertFalse(self.ocr(image=IMAGE).get_json()['cached'])
+
+    def test_session_released_during_vision_call(self):
+        """Vision APIの呼び出し中はデータベースのトランザクションを保持しないことのテスト"""
+        def detect(**kwargs):
+            self.assertFalse(Session().in_transaction())
+            return vision_response()
+
+        self.vision.document_text_detection.side_effect = detect
+        self.assertFalse(self.ocr(image=IMAGE).get_json()['cached'])
+        self.assertEqual(self.call('get', f'/notes/{self.note_id}/pages/1/ocr').status_code, 200)
+
+    def test_missing_page_and_api_error_are_not_stored(self):
+        """存在しないページとAPIのエラーの結果は保存しないことのテスト"""
+        self.assertEqual(self.ocr(page_number=5, image=IMAGE).get_json()['text'], '数学 の\nノート')
+
+        self.vision.document_text_detection.return_value = vision.AnnotateImageResponse(
+            error={'message': 'quota exceeded'}
+        )
+        self.assertEqual(self.ocr(image=IMAGE).status_code, 502)
+
+        db = Session()
+        try:
+            self.assertEqual(db.query(PageOcrResult).count(), 0)
+        finally:
+            db.close()
+
+    def test_deleted_with_page(self):
+        """ページを削除すると保存したOCR結果も削除されることのテスト"""
+        self.ocr(image=IMAGE)
+        self.call('delete', f'/notes/{self.note_id}/pages/1')
+
+        db = Session()
+        try:
+            self.assertEqual(db.query(PageOcrResult).count(), 0)
+        finally:
+            db.close()
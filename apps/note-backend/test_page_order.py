@@ -0,0 +1,158 @@
+"""
+ページの並び順（挿入・移動・削除）のテストスクリプト
+"""
+
+import re
+import unittest
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from database import Session, engine, init_db
+from models import Note, Page
+from page_order import POSITION_GAP, append_position, compact_positions, ordered, position_for
+from routes import notes_bp, bookmarks_bp
+
+@pytest.mark.usefixtures('firebase_user')
+class TestPageOrder(unittest.TestCase):
+    """ページの挿入・移動・削除のテストクラス"""
+
+    @classmethod
+    def setUpClass(cls):
+        init_db()
+        cls.app = Flask(__name__)
+        cls.app.register_blueprint(notes_bp, url_prefix='/api')
+        cls.app.register_blueprint(bookmarks_bp, url_prefix='/api')
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.uid = 'orderer'
+
+        db = Session()
+        note = Note(title='テスト', main_category='その他', sub_category='', user_id='orderer',
+                    last_position=5 * POSITION_GAP)
+        for number in range(1, 6):
+            note.pages.append(Page(position=number * POSITION_GAP, content=str(number), layout_settings={}))
+        db.add(note)
+        db.commit()
+        self.note_id = note.id
+        db.close()
+
+    def request(self, method, path, **kwargs):
+        response = getattr(self.client, method)(f'/api/notes/{self.note_id}{path}',
+                                                headers={'Authorization': 'Bearer test-token'}, **kwargs)
+        # ストリーミングのレスポンスは本文を読み終えてから閉じ、リクエストのコンテキストを順に破棄する
+        response.get_data()
+        response.close()
+        return response
+
+    def contents(self):
+        response = self.request('get', '?include=pages')
+        return [(page['page_number'], page['content']) for page in response.get_json()['pages']]
+
+    def write_statements(self, method, path, **kwargs):
+        # ノートとページへの書き込み（検索インデックスの更新を除く）
+        statements = []
+        def record(conn, cursor, statement, *args):
+            if re.match(r'(INSERT INTO|UPDATE|DELETE FROM) (notes|pages)\b', statement):
+                statements.append(statement)
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            response = self.request(method, path, **kwargs)
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+        return response, statements
+
+    def test_insert_at(self):
+        """指定したページ番号に1行の挿入だけでページを追加することのテスト"""
+        response, statements = self.write_statements('post', '/pages', json={'content': 'new', 'at': 2})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json()['page_number'], 2)
+        self.assertEqual(len(statements), 1)
+        self.assertEqual([content for _, content in self.contents()], ['1', 'new', '2', '3', '4', '5'])
+
+        # 末尾への追加
+        self.request('post', '/pages', json={'content': 'last'})
+        self.assertEqual(self.contents()[-1], (7, 'last'))
+
+    def test_append_uses_counter(self):
+        """末尾への追加はノートの位置カウンターを進めて位置を割り当てることのテスト"""
+        response, statements = self.write_statements('post', '/pages', json={'content': 'last'})
+        self.assertEqual(response.get_json()['page_number'], 6)
+        self.assertEqual(len(statements), 2)
+        self.assertIn('RETURNING', statements[0])
+
+        # 別のセッションで割り当てた位置は重ならない
+        first, second = Session(), Session()
+        try:
+            positions = [append_position(first, self.note_id)]
+            first.commit()
+            positions.append(append_position(second, self.note_id, count=2))
+            second.commit()
+            self.assertEqual(positions, [7 * POSITION_GAP, 8 * POSITION_GAP])
+            self.assertEqual(second.get(Note, self.note_id).last_position, 9 * POSITION_GAP)
+        finally:
+            first.close()
+            second.close()
+
+    def test_put_missing_page_is_idempotent(self):
+        """存在しないページへのPUTは次のページ番号だけ作成し、再送しても同じページを更新することのテスト"""
+        first = self.request('put', '/pages/6', json={'content': 'autosave'})
+        second = self.request('put', '/pages/6', json={'content': 'autosave'})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(first.get_json()['page_number'], 6)
+        self.assertEqual(second.get_json()['page_number'], 6)
+        self.assertEqual(first.get_json()['id'], second.get_json()['id'])
+
+        self.assertEqual(self.request('put', '/pages/9', json={'content': 'gap'}).status_code, 404)
+        self.assertEqual([content for _, content in self.contents()], ['1', '2', '3', '4', '5', 'autosave'])
+
+    def test_move(self):
+        """移動するページの1行だけを更新することのテスト"""
+        response, statements = self.write_statements('post', '/pages/5/move', json={'to': 2})
+        self.assertEqual(response.get_json()['page_number'], 2)
+        self.assertEqual(len(statements), 1)
+        self.assertEqual([content for _, content in self.contents()], ['1', '5', '2', '3', '4'])
+
+        self.request('post', '/pages/1/move', json={'to': 99})
+        self.assertEqual([content for _, content in self.contents()], ['5', '2', '3', '4', '1'])
+        self.assertEqual(self.request('post', '/pages/9/move', json={'to': 1}).status_code, 404)
+        self.assertEqual(self.request('post', '/pages/1/move', json={'to': 0}).status_code, 400)
+
+    def test_delete(self):
+        """削除は1行だけで、後ろのページ番号は読み込み時に詰まることのテスト"""
+        response, statements = self.write_statements('delete', '/pages/2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(self.contents(), [(1, '1'), (2, '3'), (3, '4'), (4, '5')])
+        self.assertEqual(self.request('get', '/pages/2').get_json()['content'], '3')
+
+    def test_compaction_when_gap_exhausted(self):
+        """位置の間に空きがなくなった場合に振り直して挿入することのテスト"""
+        for _ in range(12):
+            self.request('post', '/pages', json={'content': 'x', 'at': 2})
+        contents = [content for _, content in self.contents()]
+        self.assertEqual(contents, ['1'] + ['x'] * 12 + ['2', '3', '4', '5'])
+
+        db = Session()
+        try:
+            positions = [row[0] for row in ordered(db.query(Page.position).filter(Page.note_id == self.note_id))]
+            self.assertEqual(len(set(positions)), len(positions))
+            compact_positions(db, self.note_id)
+            positions = [row[0] for row in ordered(db.query(Page.position).filter(Page.note_id == self.note_id))]
+            self.assertEqual(positions, [POSITION_GAP * n for n in range(1, 18)])
+            self.assertEqual(db.get(Note, self.note_id).last_position, 17 * POSITION_GAP)
+            self.assertEqual(position_for(db, self.note_id, 2), POSITION_GAP + POSITION_GAP // 2)
+            db.rollback()
+        finally:
+            db.close()
+
+    def test_bookmark_follows_page(self):
+        """しおりのページ番号はページの移動に追従することのテスト"""
+        bookmark = self.request('post', '/bookmarks', json={'page_number': 4}).get_json()
+        self.assertEqual(bookmark['page_number'], 4)
+        self.request('post', '/pages/4/move', json={'to': 1})
+        bookmarks = self.request('get', '/bookmarks').get_json()
+        self.assertEqual([(b['id'], b['page_number']) for b in bookmarks], [(bookmark['id'], 1)])
@@ -0,0 +1,116 @@
+"""
+ページの一括更新のテストスクリプト
+"""
+
+import unittest
+
+import pytest
+from flask import Flask
+
+from database import Session, init_db
+from models import Note, Page
+from page_upsert import BatchError, parse_batch
+from routes import notes_bp
+
+class TestParseBatch(unittest.TestCase):
+    """リクエストボディの検証のテストクラス"""
+
+    def test_sorted_by_page_number(self):
+        """ページ番号順に並べ替えることのテスト"""
+        items = parse_batch({'pages': [{'page_number': 3}, {'page_number': 1}]})
+        self.assertEqual([item['page_number'] for item in items], [1, 3])
+
+    def test_invalid(self):
+        """不正なボディはBatchErrorになることのテスト"""
+        for data in (None, {}, {'pages': []}, {'pages': [{'page_number': 0}]},
+                     {'pages': [{'page_number': '1'}]},
+                     {'pages': [{'page_number': 1}, {'page_number': 1}]},
+                     {'pages': [{'page_number': n} for n in range(1, 200)]}):
+            with self.assertRaises(BatchError):
+                parse_batch(data)
+
+@pytest.mark.usefixtures('firebase_user')
+class TestBatchUpdatePages(unittest.TestCase):
+    """PUT /notes/<id>/pages:batchのテストクラス"""
+
+    @classmethod
+    def setUpClass(cls):
+        init_db()
+        cls.app = Flask(__name__)
+        cls.app.register_blueprint(notes_bp, url_prefix='/api')
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.uid = 'batcher'
+
+        db = Session()
+        note = Note(title='テスト', main_category='その他', sub_category='', user_id='batcher', last_position=1)
+        note.pages.append(Page(position=1, content='old', layout_settings={'grid': True}))
+        db.add(note)
+        db.commit()
+        self.note_id = note.id
+        db.close()
+
+    def put_batch(self, pages):
+        return self.client.put(f'/api/notes/{self.note_id}/pages:batch', json={'pages': pages},
+                               headers={'Authorization': 'Bearer test-token'})
+
+    def load_pages(self):
+        db = Session()
+        try:
+            pages = db.query(Page).filter(Page.note_id == self.note_id).order_by(Page.position).all()
+            return [(number, p.content, p.layout_settings, p.version) for number, p in enumerate(pages, 1)]
+        finally:
+            db.close()
+
+    def test_upsert(self):
+        """既存ページの更新と新規ページの作成を1回で行うことのテスト"""
+        response = self.put_batch([
+            {'page_number': 2, 'content': 'new', 'layout_settings': {}},
+            {'page_number': 1, 'content': 'updated'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.get_json()['pages']
+        self.assertEqual([(r['page_number'], r['version'], r['created']) for r in results],
+                         [(1, 2, False), (2, 1, True)])
+        self.assertTrue(all(r['etag'] for r in results))
+        # 指定されていないlayout_settingsは既存の値を残す
+        self.assertEqual(self.load_pages(), [(1, 'updated', {'grid': True}, 2), (2, 'new', {}, 1)])
+
+    def test_append_contiguous_pages(self):
+        """ページ数+1から連続するページ番号は末尾に追加することのテスト"""
+        response = self.put_batch([
+            {'page_number': 3, 'content': 'b'},
+            {'page_number': 2, 'content': 'a'},
+            {'page_number': 1, 'layout_settings': {'grid': False}},
+        ])
+        results = response.get_json()['pages']
+        self.assertEqual([(r['page_number'], r['created']) for r in results], [(1, False), (2, True), (3, True)])
+        self.assertEqual(self.load_pages(), [(1, 'old', {'grid': False}, 2), (2, 'a', {}, 1), (3, 'b', {}, 1)])
+
+    def test_gap_is_rejected(self):
+        """ページ番号が飛んでいる場合は何も書き込まずに404を返すことのテスト"""
+        for pages in ([{'page_number': 3, 'content': 'x'}],
+                      [{'page_number': 1, 'content': 'x'}, {'page_number': 2}, {'page_number': 4}]):
+            self.assertEqual(self.put_batch(pages).status_code, 404)
+        self.assertEqual(self.load_pages(), [(1, 'old', {'grid': True}, 1)])
+
+    def test_retry_does_not_duplicate_pages(self):
+        """同じリクエストを再送してもページが重複して追加されないことのテスト"""
+        pages = [{'page_number': 2, 'content': 'a'}, {'page_number': 3, 'content': 'b'}]
+        results = [self.put_batch(pages).get_json()['pages'] for _ in range(3)]
+        self.assertEqual([[r['created'] for r in result] for result in results],
+                         [[True, True], [False, False], [False, False]])
+        self.assertEqual(self.load_pages(), [(1, 'old', {'grid': True}, 1), (2, 'a', {}, 3), (3, 'b', {}, 3)])
+
+    def test_invalid_request(self):
+        """不正なリクエストは何も書き込まないことのテスト"""
+        response = self.put_batch([{'page_number': 2, 'content': 'x'}, {'page_number': -1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(self.load_pages()), 1)
+
+    def test_other_user(self):
+        """他のユーザーのノートは更新できないことのテスト"""
+        self.uid = 'other'
+        response = self.put_batch([{'page_number': 1, 'content': 'x'}])
+        self.assertEqual(response.status_code, 403)
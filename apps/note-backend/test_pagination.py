@@ -0,0 +1,79 @@
+"""
+ノート一覧のキーセットページネーションのテストスクリプト
+"""
+
+import unittest
+from datetime import datetime
+
+import pytest
+from flask import Flask
+
+from database import Session, init_db
+from models import Note
+from pagination import PaginationError, decode_cursor, encode_cursor, parse_fields
+from routes import notes_bp
+
+@pytest.mark.usefixtures('firebase_user')
+class TestNotesPagination(unittest.TestCase):
+    """get_notesのページネーションのテストクラス"""
+
+    @classmethod
+    def setUpClass(cls):
+        init_db()
+        cls.app = Flask(__name__)
+        cls.app.register_blueprint(notes_bp, url_prefix='/api')
+
+        # 作成日時が同じノートを含めてIDとの組み合わせで順序が決まることを確認する
+        db = Session()
+        same_time = datetime(2024, 1, 1, 12, 0, 0)
+        for i in range(5):
+            db.add(Note(title=f'ノート{i}', main_category='その他', sub_category='',
+                        user_id='pager', created_at=same_time if i < 3 else datetime(2024, 1, 2, i)))
+        db.commit()
+        cls.expected_ids = [note.id for note in db.query(Note).filter(Note.user_id == 'pager')
+                            .order_by(Note.created_at.desc(), Note.id.desc())]
+        db.close()
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.uid = 'pager'
+
+    def get(self, query):
+        return self.client.get(f'/api/notes{query}', headers={'Authorization': 'Bearer test-token'})
+
+    def test_pages_follow_cursor(self):
+        """カーソルを辿ると全件を重複なく取得できることのテスト"""
+        seen = []
+        response = self.get('?limit=2')
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen += [note['id'] for note in response.get_json()]
+            cursor = response.headers.get('X-Next-Cursor')
+            if not cursor:
+                break
+            response = self.get(f'?limit=2&cursor={cursor}')
+        self.assertEqual(seen, self.expected_ids)
+
+    def test_without_params_returns_all(self):
+        """パラメータがない場合は全件を返すことのテスト"""
+        response = self.get('')
+        self.assertEqual([note['id'] for note in response.get_json()], self.expected_ids)
+        self.assertNotIn('X-Next-Cursor', response.headers)
+
+    def test_fields_projection(self):
+        """fieldsで指定したフィールドのみ返すことのテスト"""
+        response = self.get('?limit=1&fields=title,id')
+        self.assertEqual(set(response.get_json()[0]), {'title', 'id'})
+
+    def test_invalid_params(self):
+        """不正なパラメータには400を返すことのテスト"""
+        self.assertEqual(self.get('?fields=content').status_code, 400)
+        self.assertEqual(self.get('?limit=0').status_code, 400)
+        self.assertEqual(self.get('?cursor=invalid').status_code, 400)
+
+    def test_cursor_round_trip(self):
+        """カーソルの作成と読み取りが対応することのテスト"""
+        created_at = datetime(2024, 1, 1, 12, 0, 0, 123456)
+        self.assertEqual(decode_cursor(encode_cursor(created_at, 42)), (created_at, 42))
+        with self.assertRaises(PaginationError):
+            parse_fields('id,unknown', {'id': None})
@@ -0,0 +1,80 @@
+"""
+圧縮されたリクエストボディの展開のテストスクリプト
+"""
+
+import gzip
+import io
+import json
+import unittest
+
+from flask import Flask, jsonify, request
+
+import request_decompression
+from request_decompression import DecompressedTooLarge, RequestDecompressor, decompress_stream
+
+CONFIG = {'enabled': True, 'max_bytes': 64 * 1024}
+
+def create_test_app():
+    """テスト用のFlaskアプリケーションを作成する"""
+    app = Flask(__name__)
+    RequestDecompressor(app, config=CONFIG)
+
+    @app.route('/echo', methods=['PUT'])
+    def echo():
+        data = request.get_json()
+        return jsonify({'length': len(data['content'])})
+
+    return app
+
+class TestRequestDecompression(unittest.TestCase):
+    """RequestDecompressorのテストクラス"""
+
+    def setUp(self):
+        self.client = create_test_app().test_client()
+        self.body = json.dumps({'content': 'x' * 10000}).encode('utf-8')
+
+    def put(self, data, encoding):
+        return self.client.put('/echo', data=data, content_type='application/json',
+                               headers={'Content-Encoding': encoding})
+
+    def test_gzip_body(self):
+        """gzipで圧縮されたボディをget_jsonで読めることのテスト"""
+        response = self.put(gzip.compress(self.body), 'gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['length'], 10000)
+
+    @unittest.skipIf(request_decompression.zstandard is None, "zstandardがインストールされていません")
+    def test_zstd_body(self):
+        """zstdで圧縮されたボディをget_jsonで読めることのテスト"""
+        data = request_decompression.zstandard.ZstdCompressor().compress(self.body)
+        response = self.put(data, 'zstd')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['length'], 10000)
+
+    def test_uncompressed_body(self):
+        """圧縮されていないボディはそのまま読めることのテスト"""
+        response = self.client.put('/echo', data=self.body, content_type='application/json')
+        self.assertEqual(response.get_json()['length'], 10000)
+
+    def test_zip_bomb_rejected(self):
+        """展開後のサイズが上限を超える場合は413を返すことのテスト"""
+        bomb = gzip.compress(b'0' * (10 * 1024 * 1024))
+        response = self.put(bomb, 'gzip')
+        self.assertEqual(response.status_code, 413)
+
+    def test_invalid_body(self):
+        """壊れたボディや未対応のエンコーディングはエラーを返すことのテスト"""
+        self.assertEqual(self.put(b'not gzip', 'gzip').status_code, 400)
+        self.assertEqual(self.put(gzip.compress(self.body)[:-10], 'gzip').status_code, 400)
+        self.assertEqual(self.put(self.body, 'compress').status_code, 415)
+
+    def test_decompression_stops_at_limit(self):
+        """上限を超えた時点で展開を止めることのテスト"""
+        stream = io.BytesIO(gzip.compress(b'0' * (100 * 1024 * 1024)))
+        with self.assertRaises(DecompressedTooLarge):
+            decompress_stream('gzip', stream, 1024 * 1024)
+        # 圧縮されたデータをすべて読む前に止まっている
+        self.assertLess(stream.tell(), len(stream.getvalue()))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+"""
+レスポンスの圧縮のテストスクリプト
+"""
+
+import gzip
+import json
+import unittest
+
+from flask import Flask, Response, jsonify
+
+import response_compression
+from response_compression import ResponseCompressor
+from routes.note_access import not_modified_response
+
+CONFIG = {'enabled': True, 'min_bytes': 1024, 'gzip_level': 6, 'brotli_quality': 4}
+
+def create_test_app(config=CONFIG):
+    """テスト用のFlaskアプリケーションを作成する"""
+    app = Flask(__name__)
+    compressor = ResponseCompressor(app, config=config)
+
+    @app.route('/large')
+    def large():
+        response = not_modified_response('page-1-1')
+        if response is not None:
+            return response
+        response = jsonify({'objects': [{'type': 'path', 'x': i} for i in range(500)]})
+        response.set_etag('page-1-1')
+        return response
+
+    @app.route('/small')
+    def small():
+        return jsonify({'ok': True})
+
+    @app.route('/stream')
+    def stream():
+        def generate():
+            yield '['
+            for i in range(500):
+                yield ('' if i == 0 else ',') + json.dumps({'page': i})
+            yield ']'
+        return Response(generate(), mimetype='application/json')
+
+    @app.route('/binary')
+    def binary():
+        return Response(b'\x00' * 4096, mimetype='image/png')
+
+    return app, compressor
+
+class TestResponseCompression(unittest.TestCase):
+    """ResponseCompressorのテストクラス"""
+
+    def setUp(self):
+        self.app, self.compressor = create_test_app()
+        self.client = self.app.test_client()
+
+    def test_gzip(self):
+        """gzipを受け付けるクライアントには圧縮して返すことのテスト"""
+        response = self.client.get('/large', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        body = json.loads(gzip.decompress(response.data))
+        self.assertEqual(len(body['objects']), 500)
+        # 圧縮したレスポンスのETagは弱いETagになる
+        self.assertEqual(response.headers['ETag'], 'W/"page-1-1"')
+
+    def test_conditional_get_after_compressed_response(self):
+        """圧縮したレスポンスのETagで条件付き取得すると同じ弱いETagの304を返すことのテスト"""
+        etag = self.client.get('/large', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+        response = self.client.get('/large', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    @unittest.skipIf(response_compression.brotli is None, "brotliがインストールされていません")
+    def test_brotli_preferred(self):
+        """brotliを受け付けるクライアントにはbrotliを優先することのテスト"""
+        response = self.client.get('/large', headers={'Accept-Encoding': 'gzip, br'})
+        self.assertEqual(response.headers['Content-Encoding'], 'br')
+        body = json.loads(response_compression.brotli.decompress(response.data))
+        self.assertEqual(len(body['objects']), 500)
+
+    def test_q_values_respected(self):
+        """q=0で拒否されたエンコーディングは使わないことのテスト"""
+        response = self.client.get('/large', headers={'Accept-Encoding': 'br;q=0, gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+
+    def test_skipped_responses(self):
+        """小さいレスポンス、対象外の型、未対応のクライアントは圧縮しないことのテスト"""
+        for path, headers in (('/small', {'Accept-Encoding': 'gzip'}),
+                              ('/binary', {'Accept-Encoding': 'gzip'}),
+                              ('/large', {})):
+            response = self.client.get(path, headers=headers)
+            self.assertNotIn('Content-Encoding', response.headers, path)
+
+    def test_streamed_response(self):
+        """ストリーミングのレスポンスをチャンクごとに圧縮することのテスト"""
+        response = self.client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.data))), 500)
+
+    def test_ratio_metrics(self):
+        """エンドポイントごとの圧縮率を記録することのテスト"""
+        self.client.get('/large', headers={'Accept-Encoding': 'gzip'})
+        # ストリーミングのレスポンスは読み終えた時点で記録される
+        self.client.get('/stream', headers={'Accept-Encoding': 'gzip'}).get_data()
+        stats = self.compressor.stats()
+        self.assertEqual(stats['large']['responses'], 1)
+        self.assertLess(stats['large']['ratio'], 0.5)
+        self.assertGreater(stats['stream']['bytes_in'], stats['stream']['bytes_out'])
+
+    def test_disabled(self):
+        """無効にした場合は圧縮しないことのテスト"""
+        app, _ = create_test_app(dict(CONFIG, enabled=False))
+        response = app.test_client().get('/large', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+
+if __name__ == "__main__":
+    unittest.main()
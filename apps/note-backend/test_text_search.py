@@ -0,0 +1,141 @@
+"""
+全文検索のテストスクリプト
+"""
+
+import json
+import unittest
+
+import pytest
+from flask import Flask
+
+from database import Session, init_db
+from models import SearchDocument
+from routes import notes_bp
+from search_index import page_text
+from text_search import index_tokens, parse_query
+
+def canvas(*texts):
+    """テキストオブジェクトを含むキャンバスのJSONを作成する"""
+    return json.dumps({'objects': [
+        {'type': 'path', 'path': [['M', 0, 0]]},
+        {'type': 'group', 'objects': [{'type': 'textbox', 'text': text} for text in texts]},
+    ]}, ensure_ascii=False)
+
+class TestTokenize(unittest.TestCase):
+    """n-gramのトークン化のテストクラス"""
+
+    def test_index_tokens(self):
+        """日本語はbigramと末尾の1文字、英数字は小文字の単語になることのテスト"""
+        self.assertEqual(index_tokens('数学のノート'), '数学 学の のノ ノー ート ト')
+        self.assertEqual(index_tokens('Ｆｏｏ Bar-2', None, 'ｶﾅ'), 'foo bar 2 カナ ナ')
+
+    def test_parse_query(self):
+        """2文字以上の日本語はフレーズ、1文字と英数字は前方一致になることのテスト"""
+        self.assertEqual(parse_query('微分積分 x 数'), [
+            ('phrase', ['微分', '分積', '積分']), ('prefix', ['x']), ('prefix', ['数'])
+        ])
+        self.assertEqual(parse_query(' 、。 '), [])
+
+    def test_page_text(self):
+        """キャンバスのJSONからグループ内も含めてテキストを取り出すことのテスト"""
+        self.assertEqual(page_text(canvas('一行目', '二行目')), '一行目\n二行目')
+        self.assertEqual(page_text('ただのテキスト'), 'ただのテキスト')
+        self.assertEqual(page_text(''), '')
+
+@pytest.mark.usefixtures('firebase_user')
+class TestSearchEndpoint(unittest.TestCase):
+    """検索エンドポイントのテストクラス"""
+
+    @classmethod
+    def setUpClass(cls):
+        init_db()
+        cls.app = Flask(__name__)
+        cls.app.register_blueprint(notes_bp, url_prefix='/api')
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.uid = 'searcher'
+
+        db = Session()
+        db.query(SearchDocument).delete()
+        db.commit()
+        db.close()
+
+    def call(self, method, path, **kwargs):
+        return getattr(self.client, method)(f'/api{path}', headers={'Authorization': 'Bearer test-token'}, **kwargs)
+
+    def search(self, q, **params):
+        response = self.call('get', '/search', query_string=dict(params, q=q))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def hits(self, q):
+        return [(hit['note_id'], hit['page_number']) for hit in self.search(q).get_json()]
+
+    def create_note(self, title, *pages):
+        note_id = self.call('post', '/notes', json={'title': title, 'main_category': '数学'}).get_json()['id']
+        for content in pages:
+            self.call('post', f'/notes/{note_id}/pages', json={'content': content})
+        return note_id
+
+    def test_search_notes_and_pages(self):
+        """タイトル・カテゴリとページのテキストを検索できることのテスト"""
+        note_id = self.create_note('微分積分の復習', canvas('テイラー展開'), canvas('Fourier series'))
+        other_id = self.create_note('英語', canvas('微分方程式'))
+
+        self.assertEqual(self.hits('微分積分'), [(note_id, None)])
+        self.assertEqual(self.hits('展開'), [(note_id, 1)])
+        self.assertEqual(self.hits('four'), [(note_id, 2)])
+        self.assertEqual(sorted(self.hits('微分')), sorted([(note_id, None), (other_id, 1)]))
+        self.assertIn((note_id, None), self.hits('積'))
+        self.assertIn((other_id, 1), self.hits('程'))
+        self.assertEqual(self.hits('数学 英語'), [(other_id, None)])
+        self.assertEqual(self.hits('存在しない'), [])
+        self.assertEqual(self.call('get', '/search', query_string={'q': ' '}).status_code, 400)
+
+    def test_index_follows_updates(self):
+        """ページとノートの更新・削除が検索結果に反映されることのテスト"""
+        note_id = self.create_note('メモ', canvas('古い内容'))
+        self.call('put', f'/notes/{note_id}/pages/1', json={'content': canvas('新しい内容')})
+        self.assertEqual(self.hits('古い'), [])
+        self.assertEqual(self.hits('新しい'), [(note_id, 1)])
+
+        version = self.call('get', f'/notes/{note_id}/pages/1').get_json()['version']
+        self.call('patch', f'/notes/{note_id}/pages/1', json={
+            'base_version': version,
+            'operations': [{'op': 'append_objects', 'objects': [{'type': 'textbox', 'text': '追記'}]}]
+        })
+        self.assertEqual(self.hits('追記'), [(note_id, 1)])
+
+        self.call('put', f'/notes/{note_id}/pages:batch', json={'pages': [
+            {'page_number': 1, 'content': canvas('一括')}, {'page_number': 2, 'content': canvas('二枚目')}
+        ]})
+        self.assertEqual(self.hits('一括'), [(note_id, 1)])
+        self.assertEqual(self.hits('二枚目'), [(note_id, 2)])
+
+        self.call('put', f'/notes/{note_id}', json={'title': '改題'})
+        self.assertEqual(self.hits('改題'), [(note_id, None)])
+
+        self.call('delete', f'/notes/{note_id}/pages/1')
+        self.assertEqual(self.hits('一括'), [])
+        self.assertEqual(self.hits('二枚目'), [(note_id, 1)])
+
+        self.call('delete', f'/notes/{note_id}')
+        self.assertEqual(self.hits('改題'), [])
+        self.assertEqual(self.hits('二枚目'), [])
+
+    def test_scoped_to_user_and_paginated(self):
+        """他のユーザーのノートは返さず、カーソルで続きを取得できることのテスト"""
+        self.uid = 'someone-else'
+        self.create_note('共通の単語')
+        self.uid = 'searcher'
+        note_ids = [self.create_note(f'共通の単語 {number}') for number in range(5)]
+
+        response = self.search('共通', limit=3)
+        first = [hit['note_id'] for hit in response.get_json()]
+        self.assertEqual(len(first), 3)
+        cursor = response.headers['X-Next-Cursor']
+        response = self.search('共通', limit=3, cursor=cursor)
+        second = [hit['note_id'] for hit in response.get_json()]
+        self.assertNotIn('X-Next-Cursor', response.headers)
+        self.assertEqual(sorted(first + second), note_ids)
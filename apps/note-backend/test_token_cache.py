@@ -0,0 +1,72 @@
+"""
+検証済みトークンキャッシュのテストスクリプト
+"""
+
+import unittest
+
+from token_cache import TokenCache
+
+class FakeClock:
+    """テスト用の時計"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+class TestTokenCache(unittest.TestCase):
+    """TokenCacheのテストクラス"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TokenCache(max_size=2, ttl=300, clock=self.clock)
+
+    def test_hit_and_miss(self):
+        """ヒット/ミスのカウントのテスト"""
+        self.assertIsNone(self.cache.get('token-a'))
+        self.cache.put('token-a', {'uid': 'user-a', 'exp': 2000})
+        self.assertEqual(self.cache.get('token-a'), {'uid': 'user-a', 'exp': 2000})
+
+        stats = self.cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_expires_at_exp_claim(self):
+        """expクレームより長く保持しないことのテスト"""
+        self.cache.put('token-a', {'uid': 'user-a', 'exp': 1010})
+        self.clock.now = 1010
+        self.assertIsNone(self.cache.get('token-a'))
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_expires_at_ttl(self):
+        """TTLを超えたエントリが破棄されることのテスト"""
+        self.cache.put('token-a', {'uid': 'user-a', 'exp': 5000})
+        self.clock.now = 1301
+        self.assertIsNone(self.cache.get('token-a'))
+
+    def test_expired_token_not_stored(self):
+        """期限切れのトークンを保存しないことのテスト"""
+        self.cache.put('token-a', {'uid': 'user-a', 'exp': 999})
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_lru_eviction(self):
+        """容量超過時に最も古いエントリが破棄されることのテスト"""
+        self.cache.put('token-a', {'uid': 'a', 'exp': 2000})
+        self.cache.put('token-b', {'uid': 'b', 'exp': 2000})
+        self.cache.get('token-a')
+        self.cache.put('token-c', {'uid': 'c', 'exp': 2000})
+
+        self.assertIsNotNone(self.cache.get('token-a'))
+        self.assertIsNone(self.cache.get('token-b'))
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_disabled(self):
+        """無効化したキャッシュが何も保持しないことのテスト"""
+        cache = TokenCache(enabled=False, clock=self.clock)
+        cache.put('token-a', {'uid': 'a', 'exp': 2000})
+        self.assertIsNone(cache.get('token-a'))
+        self.assertEqual(cache.stats()['size'], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+"""
+memo-backendに複製しているモジュールが同じ内容であることのテストスクリプト
+
+以下のモジュールはnote-backendを正とし、memo-backendに同じ内容で複製しています
+（両アプリはそれぞれのディレクトリだけでビルドされるため、パッケージとしては共有していません）。
+変更する場合はnote-backendで修正してからmemo-backendにコピーしてください。
+"""
+
+import filecmp
+import os
+import unittest
+
+NOTE_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+MEMO_BACKEND_DIR = os.path.join(os.path.dirname(NOTE_BACKEND_DIR), 'memo-backend')
+
+# memo-backendに複製しているモジュール
+VENDORED_MODULES = (
+    'category_summary.py',
+    'cert_store.py',
+    'content_codec.py',
+    'db_engine.py',
+    'db_routing.py',
+    'json_provider.py',
+    'json_stream.py',
+    'pagination.py',
+    'request_decompression.py',
+    'response_compression.py',
+    'text_search.py',
+    'token_cache.py',
+)
+
+class TestVendoredModules(unittest.TestCase):
+    """複製したモジュールのテストクラス"""
+
+    def test_copies_are_identical(self):
+        """memo-backendの複製がnote-backendと同じ内容であることのテスト"""
+        for name in VENDORED_MODULES:
+            with self.subTest(module=name):
+                self.assertTrue(
+                    filecmp.cmp(os.path.join(NOTE_BACKEND_DIR, name), os.path.join(MEMO_BACKEND_DIR, name), shallow=False),
+                    f"{name}がnote-backendとmemo-backendで異なります。note-backendの内容をコピーしてください"
+                )
+
+if __name__ == "__main__":
+    unittest.main()
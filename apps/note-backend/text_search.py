@@ -0,0 +1,144 @@
+"""
+全文検索のn-gramトークン化とデータベースごとの検索インデックス
+
+日本語は単語の区切りがないため、アプリケーション側でテキストをトークンに分けて
+スペース区切りで保存し、データベースの全文検索はそのトークンに対して行います。
+
+- 漢字・ひらがな・カタカナの連続は2文字ずつ（bigram）に分け、末尾の1文字も加える
+  （1文字の検索語は前方一致で探すため、すべての文字がいずれかのトークンの先頭になるようにする）
+- 英数字の連続は小文字の単語として1つのトークンにする
+
+トークンを保存するテーブル（tokens列）には、attach_search_index()で次のインデックスを作成します。
+
+- SQLite: FTS5の外部コンテンツテーブル（{テーブル名}_fts）と同期用のトリガー
+- PostgreSQL: to_tsvector('simple', tokens)のGINインデックス
+"""
+import re
+import unicodedata
+from sqlalchemy import DDL, column, event, func, literal_column, table as table_clause
+
+# 検索語として使用する最大の語数
+MAX_QUERY_TERMS = 16
+
+# 分かち書きしない文字（々・ひらがな・カタカナ・漢字）。半角カナはNFKCの正規化で全角になる
+_CJK = r'\u3005\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+_TOKEN_PATTERN = re.compile(f'[{_CJK}]+|[^\\W_{_CJK}]+')
+_CJK_PATTERN = re.compile(f'[{_CJK}]')
+
+def _runs(text):
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return _TOKEN_PATTERN.findall(text)
+
+def _is_cjk(run):
+    return bool(_CJK_PATTERN.match(run))
+
+def index_tokens(*texts):
+    """
+    テキストを検索インデックスに保存するトークン列に変換する関数
+
+    Args:
+        *texts (str): 対象のテキスト（Noneは無視する）
+
+    Returns:
+        str: スペース区切りのトークン
+    """
+    tokens = []
+    for text in texts:
+        for run in _runs(text):
+            if _is_cjk(run):
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+                tokens.append(run[-1])
+            else:
+                tokens.append(run)
+    return ' '.join(tokens)
+
+def parse_query(text):
+    """
+    検索文字列を検索語のリストに変換する関数
+
+    日本語の2文字以上の連続は連続するbigramのフレーズ、
+    1文字の日本語と英数字の単語は前方一致の語になります。
+    すべての語を含む文書が検索結果になります。
+
+    Args:
+        text (str): 検索文字列
+
+    Returns:
+        list: (種類, トークンのリスト)のリスト。種類は'phrase'または'prefix'
+    """
+    terms = []
+    for run in _runs(text)[:MAX_QUERY_TERMS]:
+        if _is_cjk(run) and len(run) > 1:
+            terms.append(('phrase', [run[i:i + 2] for i in range(len(run) - 1)]))
+        else:
+            terms.append(('prefix', [run]))
+    return terms
+
+def _fts5_query(terms):
+    parts = []
+    for kind, tokens in terms:
+        phrase = '"' + ' '.join(tokens) + '"'
+        parts.append(phrase + '*' if kind == 'prefix' else phrase)
+    return ' '.join(parts)
+
+def _tsquery(terms):
+    parts = []
+    for kind, tokens in terms:
+        if kind == 'prefix':
+            parts.append(f"'{tokens[0]}':*")
+        else:
+            parts.append('(' + ' <-> '.join(f"'{token}'" for token in tokens) + ')')
+    return ' & '.join(parts)
+
+def attach_search_index(table):
+    """
+    tokens列を持つテーブルの作成時に全文検索インデックスを作成するように登録する関数
+
+    SQLiteではtokens列の変更をトリガーでFTS5のテーブルに反映するため、
+    アプリケーションはテーブルのtokens列を更新するだけでインデックスが更新されます。
+
+    Args:
+        table (Table): id列とtokens列を持つテーブル
+    """
+    name = table.name
+    fts = f'{name}_fts'
+    statements = [
+        ('sqlite', f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                   f"tokens, content='{name}', content_rowid='id', tokenize='unicode61')"),
+        ('sqlite', f"CREATE TRIGGER IF NOT EXISTS {name}_ai AFTER INSERT ON {name} BEGIN "
+                   f"INSERT INTO {fts}(rowid, tokens) VALUES (new.id, new.tokens); END"),
+        ('sqlite', f"CREATE TRIGGER IF NOT EXISTS {name}_ad AFTER DELETE ON {name} BEGIN "
+                   f"INSERT INTO {fts}({fts}, rowid, tokens) VALUES ('delete', old.id, old.tokens); END"),
+        ('sqlite', f"CREATE TRIGGER IF NOT EXISTS {name}_au AFTER UPDATE OF tokens ON {name} BEGIN "
+                   f"INSERT INTO {fts}({fts}, rowid, tokens) VALUES ('delete', old.id, old.tokens); "
+                   f"INSERT INTO {fts}(rowid, tokens) VALUES (new.id, new.tokens); END"),
+        ('postgresql', f"CREATE INDEX IF NOT EXISTS idx_{name}_tokens ON {name} "
+                       f"USING gin (to_tsvector('simple', tokens))"),
+    ]
+    for dialect, statement in statements:
+        event.listen(table, 'after_create', DDL(statement).execute_if(dialect=dialect))
+    event.listen(table, 'before_drop', DDL(f'DROP TABLE IF EXISTS {fts}').execute_if(dialect='sqlite'))
+
+def apply_search(query, table, terms, dialect_name):
+    """
+    クエリに全文検索の条件と関連度順の並び替えを適用する関数
+
+    Args:
+        query (Query): tableを含むクエリ
+        table (Table): attach_search_index()を登録したテーブル
+        terms (list): parse_query()の結果（空でないこと）
+        dialect_name (str): データベースの種類（engine.dialect.name）
+
+    Returns:
+        Query: 検索条件を適用し、関連度の高い順に並べたクエリ
+    """
+    if dialect_name == 'sqlite':
+        fts = table_clause(f'{table.name}_fts', column('rowid'))
+        fts_name = literal_column(fts.name)
+        query = query.join(fts, fts.c.rowid == table.c.id).filter(fts_name.op('MATCH')(_fts5_query(terms)))
+        # bm25は関連度が高いほど小さい値を返す
+        return query.order_by(func.bm25(fts_name), table.c.id)
+
+    vector = func.to_tsvector('simple', table.c.tokens)
+    tsquery = func.to_tsquery('simple', _tsquery(terms))
+    return query.filter(vector.op('@@')(tsquery)).order_by(func.ts_rank(vector, tsquery).desc(), table.c.id)
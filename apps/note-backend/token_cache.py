@@ -0,0 +1,144 @@
+"""
+検証済みFirebase IDトークンのプロセス内キャッシュ
+
+同じトークンでの連続リクエスト（キャンバスの自動保存など）で
+RSA署名の検証を繰り返さないよう、検証結果をLRUで保持します。
+キャッシュのキーはトークン文字列そのものではなくSHA-256ハッシュです。
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+class TokenCache:
+    """
+    @docs
+    デコード済みトークンを保持する上限付きLRUキャッシュ
+
+    エントリの有効期限はトークンの`exp`クレームと`ttl`の早い方になり、
+    `exp`を過ぎたトークンが返されることはありません。
+
+    Attributes:
+        max_size (int): 保持する最大エントリ数
+        ttl (int): エントリの最大保持秒数
+        enabled (bool): Falseの場合はキャッシュを使用しない
+        hits (int): キャッシュヒット数
+        misses (int): キャッシュミス数
+        evictions (int): 容量超過または期限切れで破棄したエントリ数
+    """
+
+    def __init__(self, max_size=1024, ttl=300, enabled=True, clock=time.time):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.enabled = enabled
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self, token):
+        """
+        キャッシュからデコード済みトークンを取得する
+
+        Args:
+            token (str): IDトークン
+
+        Returns:
+            dict: デコード済みトークン、キャッシュにない場合はNone
+        """
+        if not self.enabled:
+            return None
+
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, decoded_token = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return decoded_token
+
+    def put(self, token, decoded_token):
+        """
+        デコード済みトークンをキャッシュに保存する
+
+        Args:
+            token (str): IDトークン
+            decoded_token (dict): 検証済みのデコード結果
+        """
+        if not self.enabled or self.max_size <= 0:
+            return
+
+        now = self._clock()
+        expires_at = now + self.ttl
+        exp = decoded_token.get('exp')
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        if expires_at <= now:
+            return
+
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, decoded_token)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """キャッシュを空にする"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        キャッシュの統計情報を取得する
+
+        Returns:
+            dict: サイズとヒット/ミス/破棄の各カウンタ
+        """
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+def create_token_cache_from_env():
+    """
+    環境変数の設定からTokenCacheを作成する関数
+
+    TOKEN_CACHE_ENABLED: 'false'でキャッシュを無効化（デフォルト: true）
+    TOKEN_CACHE_MAX_SIZE: 最大エントリ数（デフォルト: 1024）
+    TOKEN_CACHE_TTL: 最大保持秒数（デフォルト: 300）
+
+    Returns:
+        TokenCache: 設定済みのキャッシュ
+    """
+    return TokenCache(
+        max_size=int(os.getenv('TOKEN_CACHE_MAX_SIZE', '1024')),
+        ttl=int(os.getenv('TOKEN_CACHE_TTL', '300')),
+        enabled=os.getenv('TOKEN_CACHE_ENABLED', 'true').lower() == 'true'
+    )
+
+# アプリケーション全体で共有するキャッシュ
+token_cache = create_token_cache_from_env()